@@ -4,11 +4,26 @@ frontend - シンプルなFlask Webアプリケーション
 filtered_master_toranomon_common_2k.csv を単一のマスターデータとして使用
 CSVのカラム名をそのまま使用（変換なし）
 """
-from flask import Flask, render_template, jsonify, request
-import pandas as pd
-import os
+from flask import Flask, Response, render_template, jsonify, request
+from dataset_registry import DatasetRegistry
+from office_commute import OfficeCommuteStore
+from wire_format import (
+    FORMAT_JSON,
+    FORMAT_COLUMNS,
+    FORMAT_BINARY,
+    MIMETYPES,
+    COMPRESS_MIN_BYTES,
+    negotiate_format,
+    encode_columns,
+    encode_binary,
+    choose_encoding,
+    compress
+)
 from config import (
     CSV_PATH,
+    OFFICES,
+    ROOM_TYPES,
+    DEFAULT_ROOM_TYPE,
     DEFAULT_MAX_PRICE,
     DEFAULT_MAX_TIME,
     DEFAULT_MAX_TRANS,
@@ -17,61 +32,96 @@ from config import (
     DEBUG,
     MAP_CENTER_LAT,
     MAP_CENTER_LNG,
-    MAP_ZOOM
+    MAP_ZOOM,
+    WHATIF_MAX_WALK_MIN,
+    WHATIF_MAX_WALK_MIN_LIMIT
 )
 
 app = Flask(__name__)
 
-def load_station_data():
+# データセットは初回アクセス時に1回だけ読み込み、CSV更新時のみ再読み込みする
+datasets = DatasetRegistry()
+datasets.get()  # 既定のデータセット（CSV_PATH）は起動時に読み込んでおく
+
+# 任意のオフィス位置への通勤時間（経路行列は初回アクセス時に読み込む）
+office_commutes = OfficeCommuteStore()
+
+# bbox 未指定時の表示範囲（全世界）
+WORLD_BBOX = (-180.0, -85.0, 180.0, 85.0)
+
+
+def parse_bbox(value):
     """
-    駅データをCSVから読み込み
+    "west,south,east,north" 形式の文字列をタプルに変換
+
+    Returns:
+    --------
+    tuple or None : (west, south, east, north)。未指定・不正な場合は None
+    """
+    if not value:
+        return None
+    try:
+        west, south, east, north = (float(v) for v in value.split(','))
+    except ValueError:
+        return None
+    return (west, south, east, north)
 
-    CSVカラム: line, from, to, trans, min, lat, lng, price, walk_min
-    追加計算: total_min = min + walk_min
+
+def get_snapshot():
+    """
+    リクエストの office / room_type に対応するデータセットを取得
 
     Returns:
     --------
-    list : 駅データの辞書リスト
+    StationSnapshot or None : データセットが存在しない場合は None
     """
-    if not os.path.exists(CSV_PATH):
-        print(f"エラー: CSVファイルが見つかりません: {CSV_PATH}")
-        return []
+    return datasets.get(request.args.get('office'), request.args.get('room_type'))
 
-    try:
-        # CSVを読み込み
-        df = pd.read_csv(CSV_PATH)
-
-        # total_min を計算（電車時間 + 徒歩時間）
-        df['total_min'] = df['min'] + df['walk_min']
-
-        # NaNを適切な値に置換
-        df['price'] = df['price'].fillna(0)
-
-        # 辞書のリストに変換
-        stations = []
-        for _, row in df.iterrows():
-            station = {
-                'line': row['line'],
-                'from': row['from'],          # カラム名そのまま
-                'to': row['to'],              # カラム名そのまま
-                'lat': float(row['lat']),
-                'lng': float(row['lng']),
-                'price': float(row['price']) if row['price'] > 0 else None,
-                'trans': int(row['trans']),
-                'min': int(row['min']),       # 電車移動時間
-                'walk_min': int(row['walk_min']),
-                'total_min': int(row['total_min'])  # 合計時間
-            }
-            stations.append(station)
-
-        print(f"データ読み込み完了: {len(stations)}駅")
-        return stations
-
-    except Exception as e:
-        print(f"データ読み込みエラー: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+
+def stations_response(snapshot):
+    """
+    スナップショットをフィルタ・表示範囲・レスポンス形式に応じて返す（/api/stations と /api/whatif 共通）
+    """
+    # クエリパラメータを取得（デフォルト値なし = フィルタなし）
+    max_price = request.args.get('max_price', type=float)
+    max_time = request.args.get('max_time', type=int)
+    max_trans = request.args.get('max_trans', type=int)
+    bbox = parse_bbox(request.args.get('bbox'))
+    zoom = request.args.get('zoom', type=int)
+
+    fmt = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+
+    # 表示範囲・ズームレベルの指定があればクラスタリングして返す（クラスタは json 形式だけ）
+    if bbox is not None or zoom is not None:
+        if fmt != FORMAT_JSON:
+            return jsonify({
+                'error': f'bbox / zoom を指定した場合、format={fmt} は使えません（json だけ）',
+                'format': fmt
+            }), 400
+        return jsonify(snapshot.viewport(bbox or WORLD_BBOX, zoom, max_price, max_time, max_trans))
+
+    # フィルタリング（レンジインデックスによる二分探索）
+    rows = snapshot.query(max_price, max_time, max_trans)
+
+    if fmt == FORMAT_COLUMNS:
+        response = Response(encode_columns(snapshot, rows), mimetype=MIMETYPES[fmt])
+    elif fmt == FORMAT_BINARY:
+        response = Response(encode_binary(snapshot, rows), mimetype=MIMETYPES[fmt])
+    else:
+        response = jsonify(snapshot.to_records(rows))
+    response.vary.add('Accept')
+    return response
+
+
+def dataset_not_found():
+    """
+    データセットが存在しない場合のエラーレスポンス
+    """
+    return jsonify({
+        'error': 'データセットが見つかりません',
+        'office': request.args.get('office'),
+        'room_type': request.args.get('room_type')
+    }), 404
 
 @app.route('/')
 def index():
@@ -85,7 +135,10 @@ def index():
         map_zoom=MAP_ZOOM,
         default_max_price=DEFAULT_MAX_PRICE,
         default_max_time=DEFAULT_MAX_TIME,
-        default_max_trans=DEFAULT_MAX_TRANS
+        default_max_trans=DEFAULT_MAX_TRANS,
+        offices=OFFICES,
+        room_types=ROOM_TYPES,
+        default_room_type=DEFAULT_ROOM_TYPE
     )
 
 @app.route('/api/stations')
@@ -94,64 +147,118 @@ def get_stations():
     駅データをJSON形式で返すAPI
 
     クエリパラメータ:
+    - office: オフィス（toranomon / tokyo / otsuka）。未指定なら既定のデータセット（room_type だけを指定した場合は DEFAULT_OFFICE）
+    - room_type: 部屋タイプ（one_room / 1k / 2k）。未指定なら DEFAULT_ROOM_TYPE
     - max_price: 最大家賃（万円）
     - max_time: 最大所要時間（分、電車+徒歩）
     - max_trans: 最大乗り換え回数
+    - bbox: 表示範囲 "west,south,east,north"（Leaflet の toBBoxString() 形式）
+    - zoom: ズームレベル
+    - format: レスポンス形式 json（デフォルト）/ columns / binary
+      （Accept ヘッダの application/vnd.stations.columns+json 等でも指定可）。
+      bbox / zoom と組み合わせられるのは json だけ（columns / binary は 400）
 
     Returns:
     --------
     JSON : フィルタリングされた駅データ
+        bbox または zoom を指定した場合は {"stations": [...], "clusters": [...]}
+        format=columns / binary の場合は列指向の形式（wire_format.py 参照）
+    """
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return dataset_not_found()
+    return stations_response(snapshot)
+
+@app.route('/api/stats')
+def get_stats():
+    """
+    フィルタ条件を満たす駅の統計情報を返すAPI
+
+    クエリパラメータ: /api/stations と同じ（office, room_type, max_price, max_time, max_trans）
+
+    Returns:
+    --------
+    JSON : 統計情報
+        - total: 全駅数、count: 条件を満たす駅数、with_price: うち家賃情報あり
+        - avg_price, avg_time: 平均家賃・平均所要時間
+        - price, total_min: 平均・中央値・最小・最大・パーセンタイル（p10〜p90）
+        - line_counts: 路線ごとの駅数
     """
-    # クエリパラメータを取得（デフォルト値なし = フィルタなし）
     max_price = request.args.get('max_price', type=float)
     max_time = request.args.get('max_time', type=int)
     max_trans = request.args.get('max_trans', type=int)
 
-    # データを読み込み
-    stations = load_station_data()
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return dataset_not_found()
+    return jsonify(snapshot.stats(max_price, max_time, max_trans))
 
-    # フィルタリング
-    if max_price is not None:
-        stations = [s for s in stations if s['price'] is None or s['price'] <= max_price]
-
-    if max_time is not None:
-        stations = [s for s in stations if s['total_min'] <= max_time]
-
-    if max_trans is not None:
-        stations = [s for s in stations if s['trans'] <= max_trans]
+@app.route('/api/whatif')
+def get_whatif():
+    """
+    任意のオフィス位置への通勤時間を返すAPI（APIキー・外部呼び出しなし）
 
-    return jsonify(stations)
+    オフィスから徒歩圏内の目的駅を探し、各駅からの 電車時間 + 徒歩時間 が
+    最小になる目的駅を選ぶ。徒歩時間は直線距離から見積もる。
 
-@app.route('/api/stats')
-def get_stats():
-    """
-    データの統計情報を返すAPI
+    クエリパラメータ:
+    - lat, lng: オフィスの緯度経度（必須）
+    - max_walk_min: 目的駅を探す徒歩時間の上限（分）。未指定なら WHATIF_MAX_WALK_MIN、
+      0〜WHATIF_MAX_WALK_MIN_LIMIT に切り詰める
+    - room_type: 部屋タイプ（one_room / 1k / 2k）。未指定なら DEFAULT_ROOM_TYPE
+    - max_price, max_time, max_trans, bbox, zoom, format: /api/stations と同じ
 
     Returns:
     --------
-    JSON : 統計情報（全駅数、家賃情報あり駅数、平均家賃、平均所要時間）
+    JSON : /api/stations と同じ形式の駅データ（to は選ばれた目的駅、walk_min はその駅からの徒歩時間）
     """
-    stations = load_station_data()
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    max_walk_min = request.args.get('max_walk_min', default=WHATIF_MAX_WALK_MIN, type=int)
+    room_type = request.args.get('room_type') or DEFAULT_ROOM_TYPE
+    if lat is None or lng is None or room_type not in ROOM_TYPES:
+        return jsonify({'error': 'lat, lng（数値）と正しい room_type を指定してください'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({'error': 'lat は -90〜90、lng は -180〜180 の範囲で指定してください', 'lat': lat, 'lng': lng}), 400
+    max_walk_min = min(max(max_walk_min, 0), WHATIF_MAX_WALK_MIN_LIMIT)
 
-    if not stations:
+    model = office_commutes.get(room_type)
+    if model is None:
+        return dataset_not_found()
+
+    snapshot = model.commute(lat, lng, max_walk_min)
+    if snapshot is None:
         return jsonify({
-            'total': 0,
-            'with_price': 0,
-            'avg_price': 0,
-            'avg_time': 0
-        })
+            'error': '徒歩圏内に目的駅がありません',
+            'lat': lat,
+            'lng': lng,
+            'max_walk_min': max_walk_min
+        }), 404
+    return stations_response(snapshot)
+
+@app.after_request
+def compress_response(response):
+    """
+    APIレスポンスを Accept-Encoding に応じて gzip / brotli で圧縮
+    """
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.mimetype not in MIMETYPES.values()):
+        return response
 
-    # 統計計算
-    with_price = [s for s in stations if s['price'] is not None]
-    avg_price = sum(s['price'] for s in with_price) / len(with_price) if with_price else 0
-    avg_time = sum(s['total_min'] for s in stations) / len(stations)
+    # 圧縮するかどうかは Accept-Encoding とサイズで決まるため、圧縮しない場合も Vary を付ける
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None or 'Content-Encoding' in response.headers:
+        return response
 
-    return jsonify({
-        'total': len(stations),
-        'with_price': len(with_price),
-        'avg_price': round(avg_price, 1),
-        'avg_time': round(avg_time, 1)
-    })
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
 
 if __name__ == '__main__':
     print("=" * 60)
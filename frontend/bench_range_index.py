@@ -0,0 +1,114 @@
+"""
+frontend - レンジインデックスのベンチマーク
+
+frontend_master_toranomon_2k.csv を 1倍・10倍・100倍に複製したデータで、
+/api/stations のフィルタ処理を次の3方式で比較する。
+
+- list: 辞書リストに対するリスト内包表記（旧実装）
+- mask: 列配列に対するブールマスク（全行走査）
+- index: RangeIndex による二分探索
+
+3方式の結果が一致することも確認する。
+
+使い方:
+    cd frontend
+    python bench_range_index.py
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from station_store import StationSnapshot
+
+SOURCE_CSV = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "data",
+    "frontend_master",
+    "frontend_master_toranomon_2k.csv"
+)
+
+SCALES = [1, 10, 100]
+
+# (max_price, max_time, max_trans) の代表的な組み合わせ
+QUERIES = [
+    (12.0, 60, 2),
+    (8.0, 40, 1),
+    (None, 30, None),
+    (20.0, None, None),
+]
+
+REPEAT = 5
+
+
+def make_scaled_df(df, scale):
+    """
+    データを scale 倍に複製する（所要時間と家賃を少しずらして分布を保つ）
+    """
+    if scale == 1:
+        return df.copy()
+    rng = np.random.default_rng(0)
+    scaled = pd.concat([df] * scale, ignore_index=True)
+    scaled['min'] = (scaled['min'] + rng.integers(-3, 4, len(scaled))).clip(lower=1)
+    scaled['price'] = (scaled['price'] + rng.integers(-5, 6, len(scaled)) / 10).round(1)
+    return scaled
+
+
+def list_scan(stations, max_price, max_time, max_trans):
+    """
+    旧実装と同じリスト内包表記によるフィルタ
+    """
+    if max_price is not None:
+        stations = [s for s in stations if s['price'] is None or s['price'] <= max_price]
+    if max_time is not None:
+        stations = [s for s in stations if s['total_min'] <= max_time]
+    if max_trans is not None:
+        stations = [s for s in stations if s['trans'] <= max_trans]
+    return stations
+
+
+def measure(func):
+    """
+    REPEAT 回実行した中央値（ミリ秒）と最後の結果を返す
+    """
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def main():
+    base_df = pd.read_csv(SOURCE_CSV)
+
+    print("=" * 72)
+    print("レンジインデックス ベンチマーク（中央値、ミリ秒）")
+    print("=" * 72)
+    print(f"{'倍率':>4} {'行数':>9} {'クエリ':<18} {'件数':>8} "
+          f"{'list':>9} {'mask':>8} {'index':>8} {'mask/index':>10}")
+
+    for scale in SCALES:
+        snapshot = StationSnapshot(make_scaled_df(base_df, scale))
+        stations = snapshot.to_records()
+        all_rows = np.arange(len(snapshot))
+
+        for max_price, max_time, max_trans in QUERIES:
+            t_list, listed = measure(lambda: list_scan(stations, max_price, max_time, max_trans))
+            t_mask, masked = measure(lambda: all_rows[snapshot.filter_mask(max_price, max_time, max_trans)])
+            t_index, indexed = measure(lambda: snapshot.query(max_price, max_time, max_trans))
+
+            if not np.array_equal(masked, indexed) or len(listed) != len(indexed):
+                raise AssertionError(f"結果が一致しません: {(max_price, max_time, max_trans)}")
+
+            label = f"{max_price}/{max_time}/{max_trans}"
+            print(f"{scale:>4} {len(snapshot):>9} {label:<18} {len(indexed):>8} "
+                  f"{t_list:>9.2f} {t_mask:>8.3f} {t_index:>8.3f} {t_mask / t_index:>9.1f}x")
+
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
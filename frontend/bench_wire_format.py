@@ -0,0 +1,72 @@
+"""
+frontend - レスポンス形式のベンチマーク
+
+同梱のフロントエンド用CSVそれぞれについて、全行を返す場合の
+レスポンスサイズ（非圧縮・gzip・brotli）とエンコード時間を形式ごとに比較する。
+
+使い方:
+    cd frontend
+    python bench_wire_format.py
+"""
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from station_store import StationSnapshot
+from wire_format import brotli, compress, encode_binary, encode_columns
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "frontend_master")
+
+REPEAT = 5
+
+
+def encode_json(snapshot, rows):
+    """
+    従来形式（辞書リスト）のエンコード。jsonify と同じ区切り文字で比較する
+    """
+    return json.dumps(snapshot.to_records(rows), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+ENCODERS = {
+    'json': encode_json,
+    'columns': encode_columns,
+    'binary': encode_binary,
+}
+
+
+def main():
+    paths = sorted(glob.glob(os.path.join(DATA_DIR, "*.csv")) +
+                   glob.glob(os.path.join(DATA_DIR, "filtered", "*.csv")))
+
+    print("=" * 80)
+    print("レスポンス形式 ベンチマーク（全行、サイズはバイト、時間はミリ秒の中央値）")
+    print("=" * 80)
+    print(f"{'ファイル':<44} {'形式':<8} {'raw':>9} {'gzip':>8} {'br':>8} {'encode':>8}")
+
+    for path in paths:
+        snapshot = StationSnapshot(pd.read_csv(path))
+        rows = np.arange(len(snapshot))
+        name = f"{os.path.basename(path)} ({len(snapshot)}行)"
+
+        for fmt, encoder in ENCODERS.items():
+            times = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                body = encoder(snapshot, rows)
+                times.append((time.perf_counter() - start) * 1000)
+
+            gzip_size = len(compress(body, 'gzip'))
+            br_size = len(compress(body, 'br')) if brotli is not None else float('nan')
+            print(f"{name:<44} {fmt:<8} {len(body):>9} {gzip_size:>8} {br_size:>8} "
+                  f"{float(np.median(times)):>8.2f}")
+            name = ""
+
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,11 +16,62 @@ CSV_PATH = os.path.join(
     "filtered_master_toranomon_common_2k.csv"
 )
 
+# オフィス・部屋タイプ別のデータセット（/api/stations の office / room_type で選択）
+# office / room_type を指定しない場合は CSV_PATH を使う。room_type だけを指定した場合は DEFAULT_OFFICE
+DATASET_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "data",
+    "frontend_master"
+)
+DATASET_FILENAME = "frontend_master_{office}_{room_type}.csv"
+OFFICES = {
+    'toranomon': '虎ノ門',
+    'tokyo': '東京',
+    'otsuka': '大塚'
+}
+ROOM_TYPES = {
+    'one_room': 'ワンルーム',
+    '1k': '1K',
+    '2k': '2K'
+}
+DEFAULT_OFFICE = 'toranomon'
+DEFAULT_ROOM_TYPE = '2k'
+
+# 読み込み済みデータセットに使うメモリの上限（MB）。超えたら最後に使ったのが古いものから破棄
+DATASET_MEMORY_BUDGET_MB = 256
+
+# 任意のオフィス位置への通勤時間（/api/whatif）
+# src/make_base_data.py が保存する経路行列と、駅の座標・家賃CSVを使う
+ROUTE_MATRIX_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "route_matrix")
+STATION_COORD_PRICE_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "data",
+    "station_coord_price",
+    "station_coord_price_{room_type}.csv"
+)
+WHATIF_WALK_SPEED_M_PER_MIN = 80  # 徒歩の速さ（不動産広告の基準 80m/分）
+WHATIF_DETOUR_FACTOR = 1.3        # 直線距離に対する道のりの比
+WHATIF_MAX_WALK_MIN = 15          # 目的駅を探す徒歩時間の上限（分、max_walk_min の既定値）
+WHATIF_MAX_WALK_MIN_LIMIT = 60    # max_walk_min に指定できる最大値（分、これより大きい値は切り詰める）
+WHATIF_GRID_DEG = 0.01            # 目的駅の空間インデックスのセルの大きさ（度、約1km）
+WHATIF_CACHE_SIZE = 32            # オフィス位置ごとの計算結果のキャッシュ数
+
 # フィルタリングのデフォルト値
 DEFAULT_MAX_PRICE = 12.0  # 最大家賃（万円）
 DEFAULT_MAX_TIME = 60     # 最大所要時間（分、電車+徒歩）
 DEFAULT_MAX_TRANS = 2     # 最大乗り換え回数
 
+# 駅クラスタリングの設定（/api/stations に bbox・zoom を指定した場合）
+CLUSTER_CELL_PX = 60       # クラスタにまとめるグリッドセルの大きさ（ピクセル）
+CLUSTER_MIN_ZOOM = 5       # クラスタを前計算する最小ズームレベル
+CLUSTER_MAX_ZOOM = 14      # これより拡大した場合はクラスタにせず個別の駅を返す
+CLUSTER_CACHE_SIZE = 64    # フィルタ条件×ズームレベルごとのクラスタ集計キャッシュ数
+
+# /api/stats の集計結果をフィルタ条件ごとにキャッシュする件数
+STATS_CACHE_SIZE = 256
+
 # サーバー設定
 HOST = '0.0.0.0'
 PORT = 5002  # nxt_genの5001と被らないように5002を使用
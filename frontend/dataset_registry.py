@@ -0,0 +1,116 @@
+"""
+frontend - オフィス・部屋タイプ別データセットの遅延読み込みとLRU管理
+
+1つのプロセスで全てのオフィス×部屋タイプの組み合わせを提供する。
+データセットは初回アクセス時に読み込み、使用メモリの合計が
+DATASET_MEMORY_BUDGET_MB を超えたら最後に使われたのが古いものから破棄する。
+読み込みはデータセットごとのロックで行い、読み込み中も他のデータセットへのリクエストは待たせない。
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from config import (
+    CSV_PATH,
+    DATASET_DIR,
+    DATASET_FILENAME,
+    OFFICES,
+    ROOM_TYPES,
+    DEFAULT_OFFICE,
+    DEFAULT_ROOM_TYPE,
+    DATASET_MEMORY_BUDGET_MB
+)
+from station_store import StationStore
+from table_reader import resolve_path
+
+
+class DatasetRegistry:
+    """
+    (office, room_type) をキーに StationStore を保持するLRU
+
+    office が None の場合は既定のデータセット（CSV_PATH）を表す。
+    """
+
+    def __init__(self, memory_budget_mb=DATASET_MEMORY_BUDGET_MB):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def dataset_path(self, office, room_type):
+        """
+        データセットのCSVパスを返す
+
+        office だけを指定した場合は DEFAULT_ROOM_TYPE、room_type だけを指定した場合は DEFAULT_OFFICE を使う
+
+        Returns:
+        --------
+        str or None : CSVパス。office / room_type が不正な場合は None
+        """
+        if office is None and room_type is None:
+            return CSV_PATH
+        office = office or DEFAULT_OFFICE
+        room_type = room_type or DEFAULT_ROOM_TYPE
+        if office not in OFFICES or room_type not in ROOM_TYPES:
+            return None
+        return os.path.join(DATASET_DIR, DATASET_FILENAME.format(office=office, room_type=room_type))
+
+    def get(self, office=None, room_type=None):
+        """
+        データセットの最新スナップショットを取得（未読み込みなら読み込む）
+
+        Returns:
+        --------
+        StationSnapshot or None : データセットが存在しない場合は None
+        """
+        path = self.dataset_path(office, room_type)
+        # CSVがなくても列指向ファイル（.arrow / .parquet）があれば読める
+        if path is None or not os.path.exists(resolve_path(path)):
+            return None
+
+        with self._lock:
+            store = self._stores.get(path)
+            if store is not None:
+                self._stores.move_to_end(path)
+                return store.get()
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        # 読み込みはレジストリ全体のロックの外で、同じデータセットの読み込みだけを直列にする
+        with load_lock:
+            with self._lock:
+                store = self._stores.get(path)
+            if store is None:
+                store = StationStore(path)
+                with self._lock:
+                    self._stores[path] = store
+                    self._load_locks.pop(path, None)
+                self._evict(keep=path)
+        return store.get()
+
+    def memory_usage(self):
+        """
+        読み込み済みデータセットのメモリ使用量（バイト、ファイルの確認・再読み込みはしない）
+
+        Returns:
+        --------
+        dict : {CSVパス: バイト数}
+        """
+        with self._lock:
+            stores = list(self._stores.items())
+        return {path: store.snapshot.nbytes for path, store in stores}
+
+    def _evict(self, keep):
+        """
+        メモリ上限を超えている間、最後に使われたのが古いデータセットから破棄（データセットの読み込み後に呼ぶ）
+        """
+        usage = self.memory_usage()
+        total = sum(usage.values())
+        with self._lock:
+            for path in list(self._stores):
+                if total <= self.memory_budget:
+                    break
+                if path == keep:
+                    continue
+                del self._stores[path]
+                total -= usage.get(path, 0)
+                print(f"データセットを破棄しました（メモリ上限）: {path}")
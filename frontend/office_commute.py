@@ -0,0 +1,240 @@
+"""
+frontend - 任意のオフィス位置への通勤時間（what-if）
+
+src/make_base_data.py が保存する経路行列（data/route_matrix/）と
+駅の座標・家賃（data/station_coord_price/）だけを使い、APIを呼ばずに計算する。
+
+1. オフィスの緯度経度から、徒歩圏内の目的駅（経路行列の列）をグリッドの空間インデックスで探す
+2. 徒歩時間は直線距離 × 迂回係数 ÷ 歩行速度で見積もる
+3. 各出発駅の通勤時間 = 目的駅ごとの (電車時間 + 徒歩時間) の最小値（目的駅の軸に沿った縮約）
+
+結果は frontend_master と同じ列の StationSnapshot として返すため、
+/api/stations と同じフィルタ・表示範囲・レスポンス形式がそのまま使える。
+
+経路行列のファイル形式:
+    minutes.npy (int16), trans.npy (int8), missing.npy (bool): (駅数, 目的駅数)
+    index.json: stations（駅IDごとの駅名）, destination_ids（各列の駅ID）
+"""
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    ROUTE_MATRIX_DIR,
+    STATION_COORD_PRICE_PATH,
+    WHATIF_WALK_SPEED_M_PER_MIN,
+    WHATIF_DETOUR_FACTOR,
+    WHATIF_GRID_DEG,
+    WHATIF_CACHE_SIZE
+)
+from station_store import StationSnapshot
+from table_reader import read_table, resolve_path
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """
+    2点間の大円距離（メートル、配列可）
+    """
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def walk_minutes(meters):
+    """
+    直線距離から徒歩時間（分、切り上げ）を見積もる
+    """
+    return np.ceil(np.asarray(meters) * WHATIF_DETOUR_FACTOR / WHATIF_WALK_SPEED_M_PER_MIN).astype(np.int32)
+
+
+class DestinationIndex:
+    """
+    目的駅の座標を WHATIF_GRID_DEG 度四方のセルに振り分けたグリッド
+
+    半径検索は、半径を覆う範囲にある（駅を含む）セルの駅だけ距離を計算する。
+    走査するのは存在するセルだけのため、半径や緯度が大きくても目的駅の数を超えて回らない。
+    """
+
+    def __init__(self, lat, lng):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        cells = {}
+        for i in np.flatnonzero(np.isfinite(self.lat) & np.isfinite(self.lng)):
+            key = (int(self.lat[i] // WHATIF_GRID_DEG), int(self.lng[i] // WHATIF_GRID_DEG))
+            cells.setdefault(key, []).append(i)
+        self.cells = {key: np.array(ids, dtype=np.int64) for key, ids in cells.items()}
+
+    def within(self, lat, lng, radius_m):
+        """
+        (lat, lng) から radius_m 以内の目的駅
+
+        Returns:
+        --------
+        tuple : (目的駅のインデックス配列, 距離（メートル）の配列)
+        """
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        rows = range(int((lat - dlat) // WHATIF_GRID_DEG), int((lat + dlat) // WHATIF_GRID_DEG) + 1)
+        cols = range(int((lng - dlng) // WHATIF_GRID_DEG), int((lng + dlng) // WHATIF_GRID_DEG) + 1)
+        candidates = [ids for (r, c), ids in self.cells.items() if r in rows and c in cols]
+        if not candidates:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ids = np.concatenate(candidates)
+        dist = distance_m(lat, lng, self.lat[ids], self.lng[ids])
+        near = dist <= radius_m
+        return ids[near], dist[near]
+
+
+class OfficeCommute:
+    """
+    経路行列と駅の座標・家賃から、任意のオフィス位置への通勤時間を計算する
+
+    Parameters:
+    -----------
+    matrix_dir : str
+        経路行列のディレクトリ
+    station_csv : str
+        駅の座標・家賃CSV（line, station, lat, lng, price）
+    """
+
+    def __init__(self, matrix_dir, station_csv, signature=None):
+        self.signature = signature
+        with open(os.path.join(matrix_dir, 'index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        self.minutes = np.load(os.path.join(matrix_dir, 'minutes.npy'), mmap_mode='r')
+        self.trans = np.load(os.path.join(matrix_dir, 'trans.npy'), mmap_mode='r')
+        self.missing = np.load(os.path.join(matrix_dir, 'missing.npy'), mmap_mode='r')
+        stations = index['stations']
+        self.destinations = np.array([stations[i] for i in index['destination_ids']], dtype=object)
+
+        # 出発駅: 経路行列にある駅の (路線, 駅) 行
+        station_id = {name: i for i, name in enumerate(stations)}
+        df = read_table(station_csv)
+        df = df[df['station'].isin(station_id)].drop_duplicates(subset=['line', 'station'])
+        df = df.assign(
+            lat=df['lat'].where(df['lat'] != 0),
+            lng=df['lng'].where(df['lng'] != 0)
+        )
+        self.origins = df[['line', 'station', 'lat', 'lng', 'price']].reset_index(drop=True)
+        self.origin_ids = df['station'].map(station_id).to_numpy(dtype=np.int64)
+
+        # 目的駅の座標: 同じ駅名の行の中央値（路線ごとの座標のばらつきを抑える）
+        coords = df.groupby('station')[['lat', 'lng']].median()
+        coords = coords.reindex(self.destinations)
+        self.index = DestinationIndex(coords['lat'].to_numpy(), coords['lng'].to_numpy())
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def nearby(self, lat, lng, max_walk_min):
+        """
+        オフィスから徒歩 max_walk_min 分以内の目的駅
+
+        Returns:
+        --------
+        tuple : (目的駅の列インデックス配列, 徒歩時間（分）の配列)。徒歩時間の短い順
+        """
+        radius_m = max_walk_min * WHATIF_WALK_SPEED_M_PER_MIN / WHATIF_DETOUR_FACTOR
+        cols, dist = self.index.within(lat, lng, radius_m)
+        order = np.argsort(dist, kind='stable')
+        return cols[order], walk_minutes(dist[order])
+
+    def commute(self, lat, lng, max_walk_min):
+        """
+        オフィス位置への通勤時間を frontend_master と同じ列のスナップショットとして返す
+
+        同じ位置（小数点以下5桁）・徒歩上限の結果は WHATIF_CACHE_SIZE 件までキャッシュする。
+
+        Returns:
+        --------
+        StationSnapshot or None : 徒歩圏内に目的駅がない場合は None
+        """
+        key = (round(lat, 5), round(lng, 5), int(max_walk_min))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        cols, walk = self.nearby(lat, lng, max_walk_min)
+        if len(cols) == 0:
+            return None
+
+        cells = np.ix_(self.origin_ids, cols)
+        minutes = self.minutes[cells].astype(np.int64)
+        trans = self.trans[cells].astype(np.int64)
+        missing = np.asarray(self.missing[cells])
+
+        # 合計時間が最小、同じなら乗り換えが少ない目的駅を選ぶ
+        total = minutes + walk
+        best = np.argmin(np.where(missing, np.iinfo(np.int64).max, total * 256 + trans), axis=1)
+        rows = np.flatnonzero(~missing.all(axis=1))
+        best = best[rows]
+
+        origins = self.origins.iloc[rows]
+        df = pd.DataFrame({
+            'line': origins['line'].to_numpy(),
+            'from': origins['station'].to_numpy(),
+            'to': self.destinations[cols[best]],
+            'trans': trans[rows, best],
+            'min': minutes[rows, best],
+            'lat': origins['lat'].to_numpy(),
+            'lng': origins['lng'].to_numpy(),
+            'price': origins['price'].to_numpy(),
+            'walk_min': walk[best],
+        })
+        snapshot = StationSnapshot(df)
+
+        with self._lock:
+            self._cache[key] = snapshot
+            while len(self._cache) > WHATIF_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return snapshot
+
+
+class OfficeCommuteStore:
+    """
+    部屋タイプごとの OfficeCommute を保持し、経路行列・駅CSVが更新されたら作り直す
+    """
+
+    def __init__(self, matrix_dir=ROUTE_MATRIX_DIR, station_csv_pattern=STATION_COORD_PRICE_PATH):
+        self.matrix_dir = matrix_dir
+        self.station_csv_pattern = station_csv_pattern
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _signature(self, station_csv):
+        try:
+            paths = [os.path.join(self.matrix_dir, 'index.json'), resolve_path(station_csv)]
+            return tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+        except OSError:
+            return None
+
+    def get(self, room_type):
+        """
+        部屋タイプの OfficeCommute を取得（未読み込み・更新時は読み込む）
+
+        Returns:
+        --------
+        OfficeCommute or None : 経路行列または駅CSVがない場合は None
+        """
+        station_csv = self.station_csv_pattern.format(room_type=room_type)
+        signature = self._signature(station_csv)
+        if signature is None:
+            return None
+
+        model = self._models.get(room_type)
+        if model is not None and model.signature == signature:
+            return model
+        with self._lock:
+            model = self._models.get(room_type)
+            if model is None or model.signature != signature:
+                model = OfficeCommute(self.matrix_dir, station_csv, signature)
+                self._models[room_type] = model
+            return model
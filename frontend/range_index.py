@@ -0,0 +1,135 @@
+"""
+frontend - フィルタ条件（乗換回数・家賃・所要時間）用の多属性レンジインデックス
+
+行を (trans, 家賃ランク, total_min) の複合キーで1回だけソートしておく。
+同じ (trans, 家賃ランク) の行は連続したグループになり、グループ内は
+total_min 昇順に並ぶため、クエリは次の手順で解決できる。
+
+1. 乗換回数・家賃の条件を満たすグループをグループ単位のマスクで選ぶ
+2. 各グループ内で total_min の上限を二分探索し、先頭からの区間を得る
+3. 区間を連結して行インデックスを返す
+
+計算量はグループ数を G、結果件数を k として O(G log n + k log k)。
+全行を走査するブールマスク方式（O(n)）と違い、結果が小さいほど速い。
+手順2の時点で k が分かるため、k が大きいクエリは全行走査に切り替える。
+"""
+import numpy as np
+
+# 結果件数 k が n / SCAN_THRESHOLD_RATIO を超えたら全行走査に切り替える
+SCAN_THRESHOLD_RATIO = 8
+
+
+class RangeIndex:
+    """
+    trans / price / total_min に対するレンジインデックス
+
+    家賃ランク 0 は「家賃情報なし」を表し、家賃上限に関係なく常に結果に含まれる
+    （StationSnapshot.filter_mask と同じ意味）。
+    """
+
+    def __init__(self, trans, total_min, price, has_price):
+        n = len(total_min)
+
+        # 全行走査に切り替えるときのために元の列を参照で保持
+        self.trans = trans
+        self.total_min = total_min
+        self.price = price
+        self.has_price = has_price
+
+        trans = np.asarray(trans, dtype=np.int64)
+        total_min = np.asarray(total_min, dtype=np.int64)
+
+        # 家賃を昇順のランクに変換（0 = 家賃情報なし）
+        self.price_values = np.unique(price[has_price])
+        price_rank = np.zeros(n, dtype=np.int64)
+        price_rank[has_price] = np.searchsorted(self.price_values, price[has_price]) + 1
+
+        self.min_time = int(total_min.min()) if n else 0
+        self.time_span = int(total_min.max()) - self.min_time + 1 if n else 1
+        self.trans_min = int(trans.min()) if n else 0
+        self.rank_count = len(self.price_values) + 1
+
+        group_id = (trans - self.trans_min) * self.rank_count + price_rank
+        keys = group_id * self.time_span + (total_min - self.min_time)
+
+        # 複合キーで安定ソート（同一キー内は元の行順を維持）
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+        # 連続グループの境界
+        sorted_groups = group_id[self.order]
+        self.group_ids, self.group_start = np.unique(sorted_groups, return_index=True)
+        self.group_end = np.append(self.group_start[1:], n)
+        self.group_trans = self.group_ids // self.rank_count + self.trans_min
+        self.group_rank = self.group_ids % self.rank_count
+
+    def __len__(self):
+        return len(self.order)
+
+    def query(self, max_price=None, max_time=None, max_trans=None):
+        """
+        フィルタ条件を満たす行インデックスを返す
+
+        Parameters:
+        -----------
+        max_price : float or None
+            最大家賃（万円）
+        max_time : int or None
+            最大所要時間（分、電車+徒歩）
+        max_trans : int or None
+            最大乗り換え回数
+
+        Returns:
+        --------
+        np.ndarray : 条件を満たす行インデックス（元の行順）
+        """
+        groups = np.ones(len(self.group_ids), dtype=bool)
+
+        if max_trans is not None:
+            groups &= self.group_trans <= max_trans
+
+        if max_price is not None:
+            max_rank = np.searchsorted(self.price_values, max_price, side='right')
+            groups &= self.group_rank <= max_rank
+
+        start = self.group_start[groups]
+        end = self.group_end[groups]
+
+        if max_time is not None:
+            offset = int(max_time) - self.min_time
+            if offset < 0:
+                return np.empty(0, dtype=np.int64)
+            if offset < self.time_span:
+                upper = self.group_ids[groups] * self.time_span + offset
+                end = np.searchsorted(self.keys, upper, side='right')
+
+        lengths = end - start
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        if total * SCAN_THRESHOLD_RATIO > len(self.order):
+            return np.flatnonzero(self._scan_mask(max_price, max_time, max_trans))
+
+        # 区間 [start, end) を連結したソート済み位置を作る
+        nonempty = lengths > 0
+        start, lengths = start[nonempty], lengths[nonempty]
+        steps = np.ones(total, dtype=np.int64)
+        boundaries = np.cumsum(lengths)[:-1]
+        steps[0] = start[0]
+        steps[boundaries] = start[1:] - (start[:-1] + lengths[:-1] - 1)
+        positions = np.cumsum(steps)
+
+        return np.sort(self.order[positions])
+
+    def _scan_mask(self, max_price, max_time, max_trans):
+        """
+        全行走査によるフィルタ（結果件数が多いクエリ用）
+        """
+        mask = np.ones(len(self.order), dtype=bool)
+        if max_price is not None:
+            mask &= ~self.has_price | (self.price <= max_price)
+        if max_time is not None:
+            mask &= self.total_min <= max_time
+        if max_trans is not None:
+            mask &= self.trans <= max_trans
+        return mask
@@ -0,0 +1,190 @@
+"""
+frontend - 表示範囲（bbox）とズームレベルに応じた駅クラスタリング
+
+各駅の座標を Web メルカトルのピクセル座標に変換し、ズームレベルごとに
+CLUSTER_CELL_PX 四方のグリッドセルへ割り当てる。セル割り当てはデータ読み込み時に
+全ズームレベル分を前計算し、フィルタなしのクラスタ集計も同時に作っておく。
+
+フィルタ条件ごとのクラスタ集計は初回クエリ時に1回だけ計算してキャッシュするため、
+同じ条件での地図のパン・ズームはセルの範囲検索（ルックアップ）だけで済む。
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import CLUSTER_CELL_PX, CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM, CLUSTER_CACHE_SIZE
+
+TILE_SIZE = 256
+
+
+def project(lat, lng, zoom):
+    """
+    緯度経度を Web メルカトルのピクセル座標に変換（Leaflet と同じ投影）
+
+    Returns:
+    --------
+    tuple : (x, y) ピクセル座標の配列
+    """
+    scale = TILE_SIZE * (2.0 ** zoom)
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    sin_lat = np.sin(np.radians(lat))
+    x = (np.asarray(lng, dtype=np.float64) + 180.0) / 360.0 * scale
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)) * scale
+    return x, y
+
+
+class SpatialGrid:
+    """
+    ズームレベルごとのグリッドセル割り当てとクラスタ集計を保持する
+
+    クラスタ集計（セル単位）:
+    - cx, cy: セル座標
+    - count: 駅数
+    - lat, lng: 駅座標の重心
+    - min_price, avg_price: 家賃の最小値・平均値（家賃情報なしのみのセルは NaN）
+    - min_total_min: 所要時間の最小値
+    - first_row: セル内の先頭行（駅が1つだけのセルを個別表示するために使う）
+    """
+
+    def __init__(self, lat, lng, price, has_price, total_min):
+        self.lat = lat
+        self.lng = lng
+        self.price = price
+        self.has_price = has_price
+        self.total_min = total_min
+
+        # 座標のない駅は地図に置けないため、グリッドには含めない
+        self.located = np.isfinite(lat) & np.isfinite(lng)
+
+        self.zooms = range(CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM + 1)
+        self.cell_x = {}
+        self.cell_y = {}
+        for zoom in self.zooms:
+            x, y = project(np.where(self.located, lat, 0), np.where(self.located, lng, 0), zoom)
+            self.cell_x[zoom] = (x // CLUSTER_CELL_PX).astype(np.int32)
+            self.cell_y[zoom] = (y // CLUSTER_CELL_PX).astype(np.int32)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        # フィルタなしのクラスタは読み込み時に全ズームレベル分を前計算
+        all_rows = np.flatnonzero(self.located)
+        for zoom in self.zooms:
+            self._cache[(None, zoom)] = self._aggregate(all_rows, zoom)
+
+    def clamp_zoom(self, zoom):
+        """
+        前計算済みの範囲にズームレベルを丸める
+        """
+        return min(max(int(zoom), CLUSTER_MIN_ZOOM), CLUSTER_MAX_ZOOM)
+
+    def _aggregate(self, rows, zoom):
+        """
+        指定行をセル単位に集計する
+        """
+        rows = rows[self.located[rows]]
+        cx = self.cell_x[zoom][rows]
+        cy = self.cell_y[zoom][rows]
+        cell_id = (cx.astype(np.int64) << 32) | cy.astype(np.int64)
+
+        # セルごとに連続するよう並べ替え、reduceat で集計する
+        order = np.argsort(cell_id, kind='stable')
+        sorted_rows = rows[order]
+        sorted_ids = cell_id[order]
+        if len(sorted_ids):
+            starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        else:
+            starts = np.empty(0, dtype=np.int64)
+        counts = np.diff(np.r_[starts, len(sorted_ids)])
+
+        def reduce(ufunc, values):
+            if len(starts) == 0:
+                return np.empty(0, dtype=np.float64)
+            return ufunc.reduceat(values, starts)
+
+        has_price = self.has_price[sorted_rows]
+        price = self.price[sorted_rows].astype(np.float64)
+        price_count = reduce(np.add, has_price.astype(np.float64))
+        price_sum = reduce(np.add, np.where(has_price, price, 0.0))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_price = np.where(price_count > 0, price_sum / price_count, np.nan)
+
+        return {
+            'cx': cx[order][starts],
+            'cy': cy[order][starts],
+            'count': counts,
+            'lat': reduce(np.add, self.lat[sorted_rows].astype(np.float64)) / np.maximum(counts, 1),
+            'lng': reduce(np.add, self.lng[sorted_rows].astype(np.float64)) / np.maximum(counts, 1),
+            'min_price': reduce(np.fmin, price),
+            'avg_price': avg_price,
+            'min_total_min': reduce(np.minimum, self.total_min[sorted_rows]),
+            'first_row': sorted_rows[starts],
+        }
+
+    def clusters(self, filter_key, rows, zoom):
+        """
+        フィルタ条件ごとのクラスタ集計を取得（未計算なら計算してキャッシュ）
+
+        Parameters:
+        -----------
+        filter_key : tuple or None
+            正規化したフィルタ条件。None はフィルタなし
+        rows : callable
+            フィルタ条件を満たす行インデックスを返す関数（キャッシュミス時のみ呼ぶ）
+        zoom : int
+            ズームレベル
+
+        Returns:
+        --------
+        dict : セル単位の集計結果
+        """
+        key = (filter_key, zoom)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        table = self._aggregate(rows(), zoom)
+
+        with self._lock:
+            self._cache[key] = table
+            # フィルタなしの前計算分は残し、それ以外を古い順に破棄
+            evictable = [k for k in self._cache if k[0] is not None]
+            for old_key in evictable[:max(0, len(evictable) - CLUSTER_CACHE_SIZE)]:
+                del self._cache[old_key]
+        return table
+
+    def cells_in_bbox(self, table, bbox, zoom):
+        """
+        表示範囲に含まれるセルのマスクを返す
+
+        Parameters:
+        -----------
+        table : dict
+            clusters() の集計結果
+        bbox : tuple
+            (west, south, east, north)
+        zoom : int
+            ズームレベル
+
+        Returns:
+        --------
+        np.ndarray : セルのブールマスク
+        """
+        west, south, east, north = bbox
+        x0, y0 = project(north, west, zoom)
+        x1, y1 = project(south, east, zoom)
+        return ((table['cx'] >= int(x0 // CLUSTER_CELL_PX)) & (table['cx'] <= int(x1 // CLUSTER_CELL_PX)) &
+                (table['cy'] >= int(y0 // CLUSTER_CELL_PX)) & (table['cy'] <= int(y1 // CLUSTER_CELL_PX)))
+
+    def rows_in_bbox(self, rows, bbox):
+        """
+        行インデックスのうち表示範囲に含まれるものを返す
+        """
+        west, south, east, north = bbox
+        lat = self.lat[rows]
+        lng = self.lng[rows]
+        inside = (lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)
+        return rows[inside]
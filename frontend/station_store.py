@@ -0,0 +1,397 @@
+"""
+frontend - 駅データのインメモリ列ストア
+
+CSVを起動時に1回だけ読み込み、型付きのNumPy列配列として保持する。
+リクエストごとのCSVパースをなくし、フィルタリングをブールマスクで行う。
+CSVより新しい列指向ファイル（.arrow / .parquet）があればそちらを読む（table_reader.py）。
+
+読むファイルの mtime / size が変わったときだけ再読み込みし、
+新しいスナップショットを参照の差し替えでアトミックに入れ替える。
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from config import CLUSTER_MAX_ZOOM, STATS_CACHE_SIZE
+from range_index import RangeIndex
+from spatial_index import SpatialGrid
+from table_reader import read_table, resolve_path
+
+
+# /api/stats で返すパーセンタイル（中央値は median として別に返す）
+STATS_PERCENTILES = (10, 25, 75, 90)
+
+
+def _summary(values):
+    """
+    数値配列の平均・中央値・パーセンタイルをまとめる
+
+    Returns:
+    --------
+    dict or None : 値が空の場合は None
+    """
+    if len(values) == 0:
+        return None
+    values = values.astype(np.float64)
+    percentiles = np.percentile(values, STATS_PERCENTILES)
+    summary = {
+        'mean': round(float(values.mean()), 1),
+        'median': round(float(np.median(values)), 1),
+        'min': round(float(values.min()), 1),
+        'max': round(float(values.max()), 1),
+    }
+    for q, value in zip(STATS_PERCENTILES, percentiles.tolist()):
+        summary[f'p{q}'] = round(value, 1)
+    return summary
+
+
+def _factorize(values):
+    """
+    文字列列をカテゴリコードとカテゴリ配列に変換
+
+    Returns:
+    --------
+    tuple : (コード配列, カテゴリ配列)
+    """
+    codes, categories = pd.factorize(values, sort=True)
+    code_dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+    return codes.astype(code_dtype), np.asarray(categories, dtype=object)
+
+
+class StationSnapshot:
+    """
+    ある時点のCSV内容を列配列として保持する読み取り専用スナップショット
+
+    列:
+    - line / from / to: カテゴリコード（*_codes）とカテゴリ配列（*_categories）
+    - lat, lng: float32
+    - trans: int8
+    - min, walk_min, total_min: int16
+    - price: float32（家賃情報なしは NaN、has_price で判定）
+    """
+
+    def __init__(self, df=None, mtime_ns=None, size=None):
+        if df is None:
+            df = pd.DataFrame(columns=['line', 'from', 'to', 'trans', 'min',
+                                       'lat', 'lng', 'price', 'walk_min'])
+
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+        self.line_codes, self.line_categories = _factorize(df['line'])
+        self.from_codes, self.from_categories = _factorize(df['from'])
+        self.to_codes, self.to_categories = _factorize(df['to'])
+
+        self.lat = df['lat'].to_numpy(dtype=np.float32)
+        self.lng = df['lng'].to_numpy(dtype=np.float32)
+        self.trans = df['trans'].to_numpy(dtype=np.int8)
+        self.min = df['min'].to_numpy(dtype=np.int16)
+        self.walk_min = df['walk_min'].to_numpy(dtype=np.int16)
+        # total_min を計算（電車時間 + 徒歩時間）
+        self.total_min = (self.min + self.walk_min).astype(np.int16)
+
+        # 0以下・NaNは「家賃情報なし」として扱う
+        price = df['price'].to_numpy(dtype=np.float32)
+        self.has_price = np.isfinite(price) & (price > 0)
+        self.price = np.where(self.has_price, price, np.float32(np.nan)).astype(np.float32)
+
+        # フィルタクエリ用のレンジインデックス（読み込み時に1回だけ構築）
+        self.range_index = RangeIndex(self.trans, self.total_min, self.price, self.has_price)
+
+        # 地図表示用のグリッド（全ズームレベルのクラスタを読み込み時に前計算）
+        self.spatial_grid = SpatialGrid(self.lat, self.lng, self.price, self.has_price, self.total_min)
+
+        self._stats_cache = OrderedDict()
+        self._stats_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.total_min)
+
+    @cached_property
+    def nbytes(self):
+        """
+        スナップショットが使うおおよそのメモリ量（バイト）
+
+        列配列・インデックス・グリッドの配列と、カテゴリ文字列の大きさを合計する。
+        スナップショットは読み取り専用のため、初回に1回だけ計算する。
+        """
+        total = 0
+        objects = [self.__dict__, self.range_index.__dict__, self.spatial_grid.__dict__]
+        objects += [self.spatial_grid.cell_x, self.spatial_grid.cell_y]
+        seen = set()
+        for obj in objects:
+            for value in obj.values():
+                if isinstance(value, np.ndarray) and id(value) not in seen:
+                    seen.add(id(value))
+                    total += value.nbytes
+        for categories in (self.line_categories, self.from_categories, self.to_categories):
+            total += sum(sys.getsizeof(name) for name in categories)
+        return total
+
+    def filter_mask(self, max_price=None, max_time=None, max_trans=None):
+        """
+        フィルタ条件をブールマスクとして評価
+
+        Parameters:
+        -----------
+        max_price : float or None
+            最大家賃（万円）。家賃情報なしの駅は常に残す
+        max_time : int or None
+            最大所要時間（分、電車+徒歩）
+        max_trans : int or None
+            最大乗り換え回数
+
+        Returns:
+        --------
+        np.ndarray : 条件を満たす行のブールマスク
+        """
+        mask = np.ones(len(self), dtype=bool)
+
+        if max_price is not None:
+            mask &= ~self.has_price | (self.price <= max_price)
+
+        if max_time is not None:
+            mask &= self.total_min <= max_time
+
+        if max_trans is not None:
+            mask &= self.trans <= max_trans
+
+        return mask
+
+    def normalize_filter(self, max_price=None, max_time=None, max_trans=None):
+        """
+        フィルタ条件を正規化（データの範囲を超える上限は「条件なし」とみなす）
+
+        結果が同じになる条件を同じキーにまとめ、キャッシュのヒット率を上げる。
+
+        Returns:
+        --------
+        tuple : (max_price, max_time, max_trans)
+        """
+        if len(self) == 0:
+            return (None, None, None)
+        if max_price is not None and (not self.has_price.any() or max_price >= self.price[self.has_price].max()):
+            max_price = None
+        if max_time is not None and max_time >= self.total_min.max():
+            max_time = None
+        if max_trans is not None and max_trans >= self.trans.max():
+            max_trans = None
+        return (
+            None if max_price is None else float(max_price),
+            None if max_time is None else int(max_time),
+            None if max_trans is None else int(max_trans)
+        )
+
+    def stats(self, max_price=None, max_time=None, max_trans=None):
+        """
+        フィルタ条件を満たす駅の統計情報（フィルタ条件ごとにキャッシュ）
+
+        Returns:
+        --------
+        dict : count, with_price, price / total_min の要約統計, 路線ごとの駅数 など
+        """
+        key = self.normalize_filter(max_price, max_time, max_trans)
+        with self._stats_lock:
+            if key in self._stats_cache:
+                self._stats_cache.move_to_end(key)
+                return self._stats_cache[key]
+
+        mask = self.filter_mask(*key)
+        has_price = mask & self.has_price
+        price_summary = _summary(self.price[has_price])
+        time_summary = _summary(self.total_min[mask])
+
+        line_counts = np.bincount(self.line_codes[mask], minlength=len(self.line_categories))
+        used = np.flatnonzero(line_counts)
+
+        result = {
+            'total': len(self),
+            'count': int(mask.sum()),
+            'with_price': int(has_price.sum()),
+            'avg_price': price_summary['mean'] if price_summary else 0,
+            'avg_time': time_summary['mean'] if time_summary else 0,
+            'price': price_summary,
+            'total_min': time_summary,
+            'line_counts': dict(zip(self.line_categories[used].tolist(), line_counts[used].tolist()))
+        }
+
+        with self._stats_lock:
+            self._stats_cache[key] = result
+            while len(self._stats_cache) > STATS_CACHE_SIZE:
+                self._stats_cache.popitem(last=False)
+        return result
+
+    def query(self, max_price=None, max_time=None, max_trans=None):
+        """
+        レンジインデックスでフィルタ条件を満たす行を検索
+
+        filter_mask と同じ条件を、全行走査せずに二分探索で解決する。
+
+        Returns:
+        --------
+        np.ndarray : 条件を満たす行インデックス（元の行順）
+        """
+        return self.range_index.query(max_price, max_time, max_trans)
+
+    def viewport(self, bbox, zoom=None, max_price=None, max_time=None, max_trans=None):
+        """
+        表示範囲内の駅を、ズームレベルに応じて個別の駅またはクラスタとして返す
+
+        Parameters:
+        -----------
+        bbox : tuple
+            (west, south, east, north)
+        zoom : int or None
+            ズームレベル。None または CLUSTER_MAX_ZOOM より大きい場合は全駅を個別に返す
+        max_price, max_time, max_trans :
+            query と同じフィルタ条件
+
+        Returns:
+        --------
+        dict : {'stations': 駅データの辞書リスト, 'clusters': クラスタの辞書リスト}
+        """
+        grid = self.spatial_grid
+
+        if zoom is None or zoom > CLUSTER_MAX_ZOOM:
+            rows = grid.rows_in_bbox(self.query(max_price, max_time, max_trans), bbox)
+            return {'stations': self.to_records(rows), 'clusters': []}
+
+        # stats と同じく、結果が同じになるフィルタ条件は同じキーでクラスタ集計をキャッシュする
+        normalized = self.normalize_filter(max_price, max_time, max_trans)
+        filter_key = None if normalized == (None, None, None) else normalized
+
+        zoom = grid.clamp_zoom(zoom)
+        table = grid.clusters(filter_key, lambda: self.query(*normalized), zoom)
+        cells = grid.cells_in_bbox(table, bbox, zoom)
+
+        # 駅が1つだけのセルはクラスタにせず、そのまま駅として返す
+        single = cells & (table['count'] == 1)
+        multi = cells & (table['count'] > 1)
+
+        def nullable(values, digits):
+            return [None if np.isnan(v) else round(v, digits) for v in values[multi].tolist()]
+
+        columns = {
+            'lat': np.round(table['lat'][multi], 6).tolist(),
+            'lng': np.round(table['lng'][multi], 6).tolist(),
+            'count': table['count'][multi].tolist(),
+            'min_price': nullable(table['min_price'], 2),
+            'avg_price': nullable(table['avg_price'], 1),
+            'min_total_min': table['min_total_min'][multi].tolist(),
+        }
+        keys = list(columns.keys())
+
+        return {
+            'stations': self.to_records(np.sort(table['first_row'][single])),
+            'clusters': [dict(zip(keys, values)) for values in zip(*columns.values())]
+        }
+
+    def to_records(self, selector=None):
+        """
+        指定行を従来のAPIと同じ形式の辞書リストに変換
+
+        Parameters:
+        -----------
+        selector : np.ndarray or None
+            ブールマスクまたは行インデックス。None の場合は全行
+
+        Returns:
+        --------
+        list : 駅データの辞書リスト
+        """
+        if selector is None:
+            selector = slice(None)
+
+        has_price = self.has_price[selector]
+        # float32 の丸め誤差がJSONに出ないよう、元CSVの桁数に丸めて返す
+        prices = np.round(self.price[selector].astype(np.float64), 2)
+        price_list = [p if h else None for p, h in zip(prices.tolist(), has_price.tolist())]
+
+        columns = {
+            'line': self.line_categories[self.line_codes[selector]].tolist(),
+            'from': self.from_categories[self.from_codes[selector]].tolist(),  # カラム名そのまま
+            'to': self.to_categories[self.to_codes[selector]].tolist(),        # カラム名そのまま
+            'lat': np.round(self.lat[selector].astype(np.float64), 6).tolist(),
+            'lng': np.round(self.lng[selector].astype(np.float64), 6).tolist(),
+            'price': price_list,
+            'trans': self.trans[selector].tolist(),
+            'min': self.min[selector].tolist(),            # 電車移動時間
+            'walk_min': self.walk_min[selector].tolist(),
+            'total_min': self.total_min[selector].tolist()  # 合計時間
+        }
+        keys = list(columns.keys())
+        return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+class StationStore:
+    """
+    CSVファイルを監視し、最新のスナップショットを返すストア
+
+    get() はファイルの mtime / size を確認し、変化があった場合のみ再読み込みする。
+    読み込み中も他のリクエストは直前のスナップショットを使い続ける。
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self._snapshot = StationSnapshot()
+        self._lock = threading.Lock()
+        self.get()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(resolve_path(self.csv_path))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def snapshot(self):
+        """
+        読み込み済みのスナップショット（ファイルの確認・再読み込みはしない）
+
+        Returns:
+        --------
+        StationSnapshot : 駅データのスナップショット
+        """
+        return self._snapshot
+
+    def get(self):
+        """
+        最新のスナップショットを取得（必要なら再読み込み）
+
+        Returns:
+        --------
+        StationSnapshot : 駅データのスナップショット
+        """
+        signature = self._file_signature()
+        snapshot = self._snapshot
+        if signature is None:
+            if snapshot.mtime_ns is None:
+                print(f"エラー: CSVファイルが見つかりません: {self.csv_path}")
+            return snapshot
+        if (snapshot.mtime_ns, snapshot.size) == signature:
+            return snapshot
+
+        with self._lock:
+            # 他スレッドが既に読み込み済みなら何もしない
+            snapshot = self._snapshot
+            if (snapshot.mtime_ns, snapshot.size) == signature:
+                return snapshot
+            try:
+                df = read_table(self.csv_path)
+                new_snapshot = StationSnapshot(df, *signature)
+            except Exception as e:
+                print(f"データ読み込みエラー: {e}")
+                import traceback
+                traceback.print_exc()
+                return snapshot
+
+            # 参照の差し替えはアトミックなので、読み手はロック不要
+            self._snapshot = new_snapshot
+            print(f"データ読み込み完了: {len(new_snapshot)}駅")
+            return new_snapshot
@@ -0,0 +1,74 @@
+"""
+frontend - 駅データの表の読み込み（列指向ファイルを優先）
+
+src/ のデータパイプラインは、CSVと同じ名前で拡張子が .arrow（Arrow IPC）または
+.parquet の列指向ファイルも保存する（line / from / to などの文字列列は辞書エンコード）。
+CSVより新しい列指向ファイルがあればそれを読み（Arrow IPC はメモリマップ）、なければCSVを読む。
+
+pyarrow は任意。インストールされていなければ常にCSVを読む。
+"""
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa  # 任意: 列指向ファイルの読み込み
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNAR_EXTENSIONS = ('.arrow', '.parquet')
+
+
+def resolve_path(csv_path):
+    """
+    実際に読むファイルのパスを返す
+
+    CSVより新しい（またはCSVがない）列指向ファイルがあればそのパス、なければCSVのパス
+
+    Returns:
+    --------
+    str : 読むファイルのパス
+    """
+    if pa is None:
+        return csv_path
+    try:
+        csv_mtime = os.stat(csv_path).st_mtime_ns
+    except OSError:
+        csv_mtime = None
+    base = os.path.splitext(csv_path)[0]
+    for ext in COLUMNAR_EXTENSIONS:
+        path = base + ext
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if csv_mtime is None or mtime >= csv_mtime:
+            return path
+    return csv_path
+
+
+def read_table(csv_path):
+    """
+    表を DataFrame として読み込む
+
+    辞書エンコードの列は文字列に戻すため、CSVから読んだ場合と同じ値になる
+
+    Returns:
+    --------
+    pd.DataFrame : 表
+    """
+    path = resolve_path(csv_path)
+    if path.endswith('.arrow'):
+        table = feather.read_table(path, memory_map=True)
+    elif path.endswith('.parquet'):
+        table = pq.read_table(path)
+    else:
+        return pd.read_csv(path)
+
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, pc.cast(table.column(i), field.type.value_type))
+    return table.to_pandas()
@@ -0,0 +1,97 @@
+"""
+frontend - /api/stations・/api/whatif のテスト
+
+同梱のデータ（data/frontend_master/）を使う。
+
+使い方:
+    cd frontend
+    python -m pytest test_app.py
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import dataset_registry
+from app import app, datasets
+from config import CSV_PATH, DATASET_DIR, DEFAULT_OFFICE, DEFAULT_ROOM_TYPE
+from dataset_registry import DatasetRegistry
+from office_commute import DestinationIndex
+from wire_format import brotli, choose_encoding
+
+
+def test_dataset_path_room_type_only_uses_default_office():
+    assert datasets.dataset_path(None, '1k') == os.path.join(DATASET_DIR, f"frontend_master_{DEFAULT_OFFICE}_1k.csv")
+    assert datasets.dataset_path(None, None) == CSV_PATH
+    assert datasets.dataset_path('unknown', DEFAULT_ROOM_TYPE) is None
+
+
+def test_stations_room_type_only():
+    client = app.test_client()
+    response = client.get(f'/api/stations?room_type={DEFAULT_ROOM_TYPE}')
+    assert response.status_code == 200
+
+    expected = client.get(f'/api/stations?office={DEFAULT_OFFICE}&room_type={DEFAULT_ROOM_TYPE}')
+    assert response.get_json() == expected.get_json()
+    assert response.get_json() != client.get('/api/stations').get_json()
+
+
+def test_stations_viewport_rejects_columnar_format():
+    client = app.test_client()
+    for fmt in ('columns', 'binary'):
+        response = client.get(f'/api/stations?bbox=139,35,140.5,36.5&zoom=10&format={fmt}')
+        assert response.status_code == 400
+        assert response.get_json()['format'] == fmt
+
+    response = client.get('/api/stations?bbox=139,35,140.5,36.5&zoom=10&format=json')
+    assert response.status_code == 200
+    assert set(response.get_json()) == {'stations', 'clusters'}
+
+
+def test_whatif_rejects_out_of_range_coordinates():
+    client = app.test_client()
+    for query in ('lat=95&lng=139.75', 'lat=35.67&lng=200', 'lat=nan&lng=139.75'):
+        assert client.get(f'/api/whatif?{query}').status_code == 400
+
+
+def test_destination_index_large_radius_near_pole():
+    # 存在するセルだけを走査するため、半径・緯度が大きくても目的駅の数だけで終わる
+    index = DestinationIndex([35.67, 35.68, 35.73], [139.75, 139.77, 139.73])
+    ids, dist = index.within(89.999999, 139.75, 2.0e7)
+    assert sorted(ids.tolist()) == [0, 1, 2]
+    ids, _ = index.within(35.6705, 139.7505, 200)
+    assert ids.tolist() == [0]
+
+
+def test_registry_loads_columnar_only_dataset(tmp_path, monkeypatch):
+    # CSVがなく .arrow だけがあるデータセットも読み込める
+    feather = pytest.importorskip('pyarrow.feather')
+    monkeypatch.setattr(dataset_registry, 'DATASET_DIR', str(tmp_path))
+    registry = DatasetRegistry()
+    path = registry.dataset_path(DEFAULT_OFFICE, DEFAULT_ROOM_TYPE)
+    feather.write_feather(pd.read_csv(CSV_PATH), os.path.splitext(path)[0] + '.arrow')
+
+    snapshot = registry.get(DEFAULT_OFFICE, DEFAULT_ROOM_TYPE)
+    assert snapshot is not None and len(snapshot) > 0
+    assert registry.get(DEFAULT_OFFICE, DEFAULT_ROOM_TYPE) is snapshot
+    assert registry.memory_usage() == {path: snapshot.nbytes}
+
+
+def test_choose_encoding_respects_q_values():
+    assert choose_encoding('gzip, br;q=0') == 'gzip'
+    assert choose_encoding('br;q=0, gzip;q=0') is None
+    assert choose_encoding('*;q=0') is None
+    assert choose_encoding('identity') is None
+    assert choose_encoding('gzip;q=1.0, br;q=0.5') == 'gzip'
+    assert choose_encoding('gzip, br') == ('br' if brotli is not None else 'gzip')
+    assert choose_encoding('*') == ('br' if brotli is not None else 'gzip')
+
+
+def test_api_responses_vary_on_accept_encoding():
+    client = app.test_client()
+    for accept_encoding in ('gzip', 'identity', 'br;q=0, gzip;q=0'):
+        response = client.get('/api/stations', headers={'Accept-Encoding': accept_encoding})
+        assert response.status_code == 200
+        assert 'Accept-Encoding' in response.vary
+    response = client.get('/api/stations', headers={'Accept-Encoding': 'gzip, br;q=0'})
+    assert response.headers['Content-Encoding'] == 'gzip'
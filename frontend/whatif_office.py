@@ -0,0 +1,68 @@
+"""
+frontend - 任意のオフィス位置への通勤時間（what-if）のコマンドライン版
+
+/api/whatif と同じ計算を行い、徒歩圏内の目的駅と、通勤時間の短い駅を表示する。
+--output を指定すると frontend_master と同じ列のCSVに保存する。
+
+使い方:
+    cd frontend
+    python whatif_office.py 35.6700 139.7500 --max-walk-min 12 --max-time 45 --top 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_ROOM_TYPE, WHATIF_MAX_WALK_MIN
+from office_commute import OfficeCommuteStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任意のオフィス位置への通勤時間を計算する")
+    parser.add_argument('lat', type=float, help="オフィスの緯度")
+    parser.add_argument('lng', type=float, help="オフィスの経度")
+    parser.add_argument('--max-walk-min', type=int, default=WHATIF_MAX_WALK_MIN,
+                        help="目的駅を探す徒歩時間の上限（分）")
+    parser.add_argument('--room-type', default=DEFAULT_ROOM_TYPE, help="部屋タイプ（one_room / 1k / 2k）")
+    parser.add_argument('--max-price', type=float, help="最大家賃（万円）")
+    parser.add_argument('--max-time', type=int, help="最大所要時間（分、電車+徒歩）")
+    parser.add_argument('--max-trans', type=int, help="最大乗り換え回数")
+    parser.add_argument('--top', type=int, default=20, help="表示する駅数")
+    parser.add_argument('--output', help="結果を保存するCSVパス")
+    args = parser.parse_args()
+
+    model = OfficeCommuteStore().get(args.room_type)
+    if model is None:
+        print("経路行列または駅の座標・家賃CSVが見つかりません（src/make_base_data.py を実行してください）")
+        return
+
+    start = time.perf_counter()
+    cols, walk = model.nearby(args.lat, args.lng, args.max_walk_min)
+    snapshot = model.commute(args.lat, args.lng, args.max_walk_min)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if snapshot is None:
+        print(f"徒歩{args.max_walk_min}分以内に目的駅がありません")
+        return
+
+    print(f"徒歩圏内の目的駅（{elapsed:.1f}ms）:")
+    for name, minutes in zip(model.destinations[cols], walk):
+        print(f"  {name}: 徒歩{minutes}分")
+
+    rows = snapshot.query(args.max_price, args.max_time, args.max_trans)
+    records = snapshot.to_records(rows[np.argsort(snapshot.total_min[rows], kind='stable')])
+    print(f"\n条件に合う駅: {len(records)} / {len(snapshot)}")
+    for r in records[:args.top]:
+        price = f"{r['price']:.1f}万円" if r['price'] is not None else "家賃情報なし"
+        print(f"  {r['from']}（{r['line']}）→ {r['to']}: {r['total_min']}分 "
+              f"(電車{r['min']}分 + 徒歩{r['walk_min']}分, 乗換{r['trans']}回, {price})")
+
+    if args.output:
+        columns = ['line', 'from', 'to', 'trans', 'min', 'lat', 'lng', 'price', 'walk_min']
+        pd.DataFrame(records, columns=columns + ['total_min'])[columns].to_csv(args.output, index=False)
+        print(f"\n保存しました: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+frontend - /api/stations のレスポンス形式（列指向JSON・バイナリ）と圧縮
+
+従来の形式（json）は駅ごとの辞書リストで、行ごとにキー名が繰り返される。
+大きな結果セット向けに、列ごとの配列で返す2つの形式を用意する。
+
+- columns: 列指向JSON。line / from / to は辞書エンコード（名前の配列 + インデックス配列）
+- binary: リトルエンディアンのバイナリ。ブラウザで TypedArray としてそのまま参照できる
+
+binary のレイアウト:
+    [0:4]   マジック b'STN1'
+    [4:8]   ヘッダ長 (uint32 LE)
+    [8:...] ヘッダ (UTF-8 JSON): count, dictionaries, columns [{name, dtype, offset}]
+    以降    各列のデータ（先頭は8バイト境界に揃える、offset はバッファ先頭からの位置）
+
+家賃情報なしは price 列の NaN で表す。
+"""
+import gzip
+import json
+import struct
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # brotli は任意依存
+    brotli = None
+
+FORMAT_JSON = 'json'
+FORMAT_COLUMNS = 'columns'
+FORMAT_BINARY = 'binary'
+
+MIMETYPES = {
+    FORMAT_JSON: 'application/json',
+    FORMAT_COLUMNS: 'application/vnd.stations.columns+json',
+    FORMAT_BINARY: 'application/vnd.stations.columns+octet-stream',
+}
+
+BINARY_MAGIC = b'STN1'
+
+# この大きさ未満のレスポンスは圧縮しない（バイト）
+COMPRESS_MIN_BYTES = 1024
+
+
+def negotiate_format(format_param, accept_header):
+    """
+    format パラメータまたは Accept ヘッダからレスポンス形式を決める
+
+    Parameters:
+    -----------
+    format_param : str or None
+        クエリパラメータ format の値（json / columns / binary）
+    accept_header : str or None
+        Accept ヘッダ
+
+    Returns:
+    --------
+    str : FORMAT_JSON / FORMAT_COLUMNS / FORMAT_BINARY
+    """
+    if format_param in MIMETYPES:
+        return format_param
+    accept = accept_header or ''
+    for fmt in (FORMAT_BINARY, FORMAT_COLUMNS):
+        if MIMETYPES[fmt] in accept:
+            return fmt
+    return FORMAT_JSON
+
+
+def _dictionary_encode(codes, categories):
+    """
+    結果行に現れるカテゴリだけの辞書に詰め直す
+
+    Returns:
+    --------
+    tuple : (名前のリスト, 新しいコード配列)
+    """
+    used, inverse = np.unique(codes, return_inverse=True)
+    return categories[used].tolist(), inverse.astype(np.uint16 if len(used) <= 0xFFFF else np.uint32)
+
+
+def _columns(snapshot, rows):
+    """
+    結果行の列配列と辞書を作る（columns / binary 共通）
+    """
+    dictionaries = {}
+    columns = {}
+    for name in ('line', 'from', 'to'):
+        codes = getattr(snapshot, f'{name}_codes')[rows]
+        categories = getattr(snapshot, f'{name}_categories')
+        dictionaries[name], columns[name] = _dictionary_encode(codes, categories)
+
+    columns['lat'] = snapshot.lat[rows]
+    columns['lng'] = snapshot.lng[rows]
+    columns['price'] = snapshot.price[rows]
+    columns['trans'] = snapshot.trans[rows]
+    columns['min'] = snapshot.min[rows]
+    columns['walk_min'] = snapshot.walk_min[rows]
+    columns['total_min'] = snapshot.total_min[rows]
+    return dictionaries, columns
+
+
+def encode_columns(snapshot, rows):
+    """
+    列指向JSONにエンコード
+
+    Returns:
+    --------
+    bytes : UTF-8 JSON
+    """
+    dictionaries, columns = _columns(snapshot, rows)
+    has_price = snapshot.has_price[rows]
+
+    payload = {
+        'count': int(len(rows)),
+        'dictionaries': dictionaries,
+        'columns': {
+            'line': columns['line'].tolist(),
+            'from': columns['from'].tolist(),
+            'to': columns['to'].tolist(),
+            'lat': np.round(columns['lat'].astype(np.float64), 6).tolist(),
+            'lng': np.round(columns['lng'].astype(np.float64), 6).tolist(),
+            'price': [p if h else None for p, h in zip(
+                np.round(columns['price'].astype(np.float64), 2).tolist(), has_price.tolist())],
+            'trans': columns['trans'].tolist(),
+            'min': columns['min'].tolist(),
+            'walk_min': columns['walk_min'].tolist(),
+            'total_min': columns['total_min'].tolist(),
+        }
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode_binary(snapshot, rows):
+    """
+    リトルエンディアンのバイナリにエンコード
+
+    Returns:
+    --------
+    bytes : バイナリバッファ
+    """
+    dictionaries, columns = _columns(snapshot, rows)
+    arrays = [(name, np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<')))
+              for name, values in columns.items()]
+
+    def align(n):
+        return (n + 7) // 8 * 8
+
+    # ヘッダ長がオフセットに影響するため、オフセットを仮置きして長さを確定させる
+    layout = [{'name': name, 'dtype': values.dtype.str, 'offset': 0} for name, values in arrays]
+    header = {'count': int(len(rows)), 'dictionaries': dictionaries, 'columns': layout}
+    while True:
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        offset = align(8 + len(header_bytes))
+        changed = False
+        for entry, (_, values) in zip(layout, arrays):
+            if entry['offset'] != offset:
+                entry['offset'] = offset
+                changed = True
+            offset = align(offset + values.nbytes)
+        if not changed:
+            break
+
+    buffer = bytearray(offset)
+    buffer[0:4] = BINARY_MAGIC
+    buffer[4:8] = struct.pack('<I', len(header_bytes))
+    buffer[8:8 + len(header_bytes)] = header_bytes
+    for entry, (_, values) in zip(layout, arrays):
+        buffer[entry['offset']:entry['offset'] + values.nbytes] = values.tobytes()
+    return bytes(buffer)
+
+
+def _quality(value):
+    """
+    Accept-Encoding の q 値を数値に変換
+
+    Returns:
+    --------
+    float or None : 0〜1 の q 値。不正な値の場合は None
+    """
+    try:
+        q = float(value)
+    except ValueError:
+        return None
+    return q if 0 <= q <= 1 else None
+
+
+def choose_encoding(accept_encoding):
+    """
+    Accept-Encoding から圧縮方式を選ぶ（q 値の高いもの、同じなら brotli を優先）
+
+    q=0 の方式（例: br;q=0）は使わない。明示されていない方式は * の q 値に従う。
+
+    Returns:
+    --------
+    str or None : 'br' / 'gzip' / None
+    """
+    qualities = {}
+    for token in (accept_encoding or '').split(','):
+        name, *params = [part.strip() for part in token.split(';')]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                q = _quality(value.strip())
+        if q is not None:
+            qualities[name.lower()] = q
+
+    default = qualities.get('*', 0.0)
+    candidates = [('br', qualities.get('br', default))] if brotli is not None else []
+    candidates.append(('gzip', qualities.get('gzip', default)))
+    encoding, q = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if q > 0 else None
+
+
+def compress(body, encoding):
+    """
+    指定方式で圧縮する
+
+    Returns:
+    --------
+    bytes : 圧縮後のデータ
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
@@ -1,22 +1,122 @@
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 
-from config import EKISPERT_KEY
+from apis.rate_limiter import TokenBucket
+from apis.response_cache import ResponseCache
+from config import (
+    EKISPERT_KEY,
+    EKISPERT_RATE_PER_SEC,
+    EKISPERT_MAX_WORKERS,
+    EKISPERT_TIMEOUT_SEC,
+    EKISPERT_CACHE_PATH,
+    EKISPERT_CACHE_TTL_SEC,
+    EKISPERT_NEGATIVE_CACHE_TTL_SEC,
+    EKISPERT_MEMORY_CACHE_SIZE
+)
 
+STATION_URL = 'https://api.ekispert.jp/v1/json/station'
+COURSE_URL = 'https://api.ekispert.jp/v1/json/search/course'
 
-def get_official_station_name(station_name: str) -> str or None:
+# 全スレッドで共有するHTTPセッション（コネクションを再利用する）
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=EKISPERT_MAX_WORKERS))
+
+# Ekispertのクォータに合わせたレート制限（全スレッド共通）
+_rate_limiter = TokenBucket(EKISPERT_RATE_PER_SEC)
+
+# 駅名検索・経路検索のレスポンスキャッシュ（SQLite + プロセス内LRU）
+_cache = ResponseCache(
+    EKISPERT_CACHE_PATH,
+    ttl_sec=EKISPERT_CACHE_TTL_SEC,
+    negative_ttl_sec=EKISPERT_NEGATIVE_CACHE_TTL_SEC,
+    memory_size=EKISPERT_MEMORY_CACHE_SIZE
+)
+
+# 送信したリクエスト数（スループット表示用）
+_request_count = 0
+_request_count_lock = threading.Lock()
+
+
+def _get(url: str, params: dict) -> requests.Response:
     """
-    引数の駅名に対してEkispert APIを呼び出し、
-    正式な駅名を返す。見つからない場合はNone。
-    電車の駅のみを検索対象とする（バス停を除外）。
+    レート制限・タイムアウト付きでEkispert APIにGETリクエストを送る。
+    """
+    global _request_count
+    _rate_limiter.acquire()
+    with _request_count_lock:
+        _request_count += 1
+    return _session.get(url, params=params, timeout=EKISPERT_TIMEOUT_SEC)
+
+
+def get_request_count() -> int:
+    """
+    これまでにEkispert APIへ送信したリクエスト数を返す。
+    """
+    return _request_count
+
+
+def _get_json(url: str, params: dict, is_negative) -> dict or None:
+    """
+    キャッシュを確認してからEkispert APIを呼び出し、レスポンスのdictを返す。
+    正常なレスポンス(200)は生のJSONのままキャッシュに保存する。
+    is_negative(body) が True のレスポンス（該当なし）は短いTTLで保存する。
+    通信エラー・200以外のレスポンスは保存せずNoneを返す。
+    """
+    hit, body = _cache.get(url, params)
+    if hit:
+        return body
+
+    try:
+        res = _get(url, params)
+        if res.status_code != 200:
+            return None
+        body = res.json()
+    except Exception:
+        return None
+
+    _cache.put(url, params, body, negative=is_negative(body))
+    return body
+
+
+def get_cache_stats() -> dict:
     """
-    url = 'https://api.ekispert.jp/v1/json/station'
-    params = {
+    Ekispertレスポンスキャッシュのヒット・ミス回数を返す。
+    """
+    return _cache.stats()
+
+
+def _has_no_station(body: dict) -> bool:
+    return not body.get('ResultSet', {}).get('Point')
+
+
+def _has_no_course(body: dict) -> bool:
+    return not body.get('ResultSet', {}).get('Course')
+
+
+def _station_params(station_name: str) -> dict:
+    return {
         'key': EKISPERT_KEY,
         'name': station_name,
         'type': 'train'  # 電車の駅のみ検索
     }
-    res = requests.get(url, params=params).json()
-    if 'ResultSet' not in res:
+
+
+def _course_params(from_name: str, to_name: str) -> dict:
+    return {
+        'key': EKISPERT_KEY,
+        'from': from_name,
+        'to': to_name,
+        'time': '0900',         # 朝9時を指定（通勤時間帯）
+        'searchType': 'arrival',  # 9時到着のルートを検索
+        'plane': 'false',  # 飛行機は使わない
+        'bus': 'false'      # バスも使わない（電車のみ）
+    }
+
+
+def _parse_official_station_name(res: dict) -> str or None:
+    if res is None or 'ResultSet' not in res:
         return None
     data = res['ResultSet'].get('Point')
     if not data:
@@ -29,61 +129,117 @@ def get_official_station_name(station_name: str) -> str or None:
         return data['Station']['Name']
 
 
-def get_minimum_route_info_between_stations(from_station: str, to_station: str) -> tuple or None:
+def get_official_station_name(station_name: str) -> str or None:
     """
-    from_station->to_stationの最適ルート情報(乗り換え最小・所要時間最小)を返す
-    /search/course API（lightなし）を使用してJSON APIレスポンスから直接取得
-    戻り値: (乗り換え回数, 所要時間(分)) or None
+    引数の駅名に対してEkispert APIを呼び出し、
+    正式な駅名を返す。見つからない場合はNone。
+    電車の駅のみを検索対象とする（バス停を除外）。
+    """
+    res = _get_json(STATION_URL, _station_params(station_name), _has_no_station)
+    return _parse_official_station_name(res)
+
+
+def peek_official_station_name(station_name: str) -> tuple:
+    """
+    APIを呼ばずにキャッシュだけで正式な駅名を調べる。
+    戻り値: (キャッシュにあるか, 正式な駅名 or None)
+    """
+    hit, res = _cache.peek(STATION_URL, _station_params(station_name))
+    return hit, _parse_official_station_name(res) if hit else None
+
+
+def is_course_cached(from_name: str, to_name: str) -> bool:
+    """
+    正規化済みの駅名ペアの経路検索結果がキャッシュにあるかを返す（APIは呼ばない）。
+    """
+    hit, _ = _cache.peek(COURSE_URL, _course_params(from_name, to_name))
+    return hit
+
+
+def is_course_answered(from_station: str, to_station: str) -> bool:
+    """
+    from_station->to_station の経路検索に、APIが応答したか（該当なしを含め結果がキャッシュにあるか）を返す。
+    通信エラー・200以外のレスポンスで結果がない場合は False（APIは呼ばない）。
+    """
+    from_hit, from_name = peek_official_station_name(from_station)
+    to_hit, to_name = peek_official_station_name(to_station)
+    if not (from_hit and to_hit):
+        return False
+    return is_course_cached(from_name or from_station, to_name or to_station)
+
+
+def get_course_search_result(from_station: str, to_station: str) -> dict or None:
+    """
+    from_station->to_stationの /search/course API（lightなし）の生のレスポンスを返す。
+    駅名は事前に get_official_station_name で正規化する（失敗したら元の駅名を使う）。
+    戻り値: レスポンスのdict or None
     """
-    # まず駅名を正規化（失敗したら元の駅名を使う）
     from_name = get_official_station_name(from_station) or from_station
     to_name = get_official_station_name(to_station) or to_station
 
-    # /search/course API を使用（lightなし - これが正しいエンドポイント）
-    url = 'https://api.ekispert.jp/v1/json/search/course'
-    params = {
-        'key': EKISPERT_KEY,
-        'from': from_name,
-        'to': to_name,
-        'time': '0900',         # 朝9時を指定（通勤時間帯）
-        'searchType': 'arrival',  # 9時到着のルートを検索
-        'plane': 'false',  # 飛行機は使わない
-        'bus': 'false'      # バスも使わない（電車のみ）
-    }
+    return _get_json(COURSE_URL, _course_params(from_name, to_name), _has_no_course)
+
 
+def extract_course_candidates(data: dict) -> list:
+    """
+    /search/course のレスポンスから各コースの (乗換回数, 所要時間(分)) を取り出す。
+    所要時間は 乗車時間 + その他時間 + 徒歩時間。所要時間が0のコースは除外する。
+    """
+    if not data or 'ResultSet' not in data or 'Course' not in data['ResultSet']:
+        return []
+
+    courses = data['ResultSet']['Course']
+    # 単一のコースの場合はリスト化
+    if not isinstance(courses, list):
+        courses = [courses]
+
+    candidates = []
+    for course in courses:
+        route = course.get('Route', {})
+
+        # 乗換回数
+        transfer_count = int(route.get('transferCount', 0))
+
+        # 所要時間（乗車時間 + その他時間 + 徒歩時間）
+        time_on_board = int(route.get('timeOnBoard', 0))
+        time_other = int(route.get('timeOther', 0))
+        time_walk = int(route.get('timeWalk', 0))
+        time_total = time_on_board + time_other + time_walk
+
+        if time_total > 0:
+            candidates.append((transfer_count, time_total))
+    return candidates
+
+
+def select_min_transfer_then_time(candidates: list) -> tuple or None:
+    """
+    乗換回数が最小、かつ所要時間が最小のコースを選ぶ（既定の選択ルール）。
+    """
+    if not candidates:
+        return None
+    return min(candidates, key=lambda x: (x[0], x[1]))
+
+
+def select_min_time_then_transfer(candidates: list) -> tuple or None:
+    """
+    所要時間が最小、かつ乗換回数が最小のコースを選ぶ。
+    """
+    if not candidates:
+        return None
+    return min(candidates, key=lambda x: (x[1], x[0]))
+
+
+def get_minimum_route_info_between_stations(from_station: str, to_station: str,
+                                            selection_rule=select_min_transfer_then_time) -> tuple or None:
+    """
+    from_station->to_stationの最適ルート情報を返す
+    /search/course API（lightなし）を使用してJSON APIレスポンスから直接取得
+    レスポンスはキャッシュされるため、selection_rule を変えて再計算しても再リクエストは発生しない
+    戻り値: (乗り換え回数, 所要時間(分)) or None
+    """
     try:
-        res = requests.get(url, params=params, timeout=10)
-        if res.status_code == 200:
-            data = res.json()
-            if 'ResultSet' in data and 'Course' in data['ResultSet']:
-                courses = data['ResultSet']['Course']
-                # 単一のコースの場合はリスト化
-                if not isinstance(courses, list):
-                    courses = [courses]
-
-                # 各コースから乗換回数と所要時間を抽出
-                candidates = []
-                for course in courses:
-                    route = course.get('Route', {})
-
-                    # 乗換回数
-                    transfer_count = int(route.get('transferCount', 0))
-
-                    # 所要時間（乗車時間 + その他時間 + 徒歩時間）
-                    time_on_board = int(route.get('timeOnBoard', 0))
-                    time_other = int(route.get('timeOther', 0))
-                    time_walk = int(route.get('timeWalk', 0))
-                    time_total = time_on_board + time_other + time_walk
-
-                    if time_total > 0:
-                        candidates.append((transfer_count, time_total))
-
-                if candidates:
-                    # 乗換回数が最小、かつ所要時間が最小のものを選択
-                    candidates.sort(key=lambda x: (x[0], x[1]))
-                    return candidates[0]
-    except Exception as e:
+        data = get_course_search_result(from_station, to_station)
+        return selection_rule(extract_course_candidates(data))
+    except Exception:
         # エラーが発生した場合はNoneを返す
-        pass
-
-    return None
\ No newline at end of file
+        return None
@@ -1,23 +1,120 @@
+import threading
+
 import requests
-from config import GOOGLE_MAPS_KEY
+from requests.adapters import HTTPAdapter
+
+from apis.rate_limiter import AdaptiveRateLimiter
+from apis.response_cache import ResponseCache
+from config import (
+    GOOGLE_MAPS_KEY,
+    GOOGLE_MAPS_RATE_PER_SEC,
+    GOOGLE_MAPS_MIN_RATE_PER_SEC,
+    GOOGLE_MAPS_MAX_RATE_PER_SEC,
+    GOOGLE_MAPS_MAX_WORKERS,
+    GOOGLE_MAPS_TIMEOUT_SEC,
+    GOOGLE_MAPS_RETRY_COUNT,
+    GEOCODE_CACHE_PATH,
+    GEOCODE_CACHE_TTL_SEC,
+    GEOCODE_NEGATIVE_CACHE_TTL_SEC
+)
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+# 全スレッドで共有するHTTPセッション（コネクションを再利用する）
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=GOOGLE_MAPS_MAX_WORKERS))
+
+# レート制限の応答に合わせて速度を調整するレートリミッタ（全スレッド共通）
+_rate_limiter = AdaptiveRateLimiter(
+    GOOGLE_MAPS_RATE_PER_SEC,
+    min_rate=GOOGLE_MAPS_MIN_RATE_PER_SEC,
+    max_rate=GOOGLE_MAPS_MAX_RATE_PER_SEC
+)
+
+# クエリごとのレスポンスキャッシュ。見つからなかった結果（ZERO_RESULTS）も保存し、
+# 同じクエリは二度と送らない
+_cache = ResponseCache(
+    GEOCODE_CACHE_PATH,
+    ttl_sec=GEOCODE_CACHE_TTL_SEC,
+    negative_ttl_sec=GEOCODE_NEGATIVE_CACHE_TTL_SEC
+)
+
+# 送信したリクエスト数（スループット表示用）
+_request_count = 0
+_request_count_lock = threading.Lock()
+
+# キャッシュしてよい（クエリに対して確定した）レスポンスのstatus
+_FINAL_STATUSES = {'OK', 'ZERO_RESULTS'}
+# レート制限を表すstatus
+_THROTTLE_STATUSES = {'OVER_QUERY_LIMIT'}
+
+
+def get_request_count() -> int:
+    """
+    これまでにGeocoding APIへ送信したリクエスト数を返す。
+    """
+    return _request_count
+
+
+def get_cache_stats() -> dict:
+    """
+    ジオコーディングキャッシュのヒット・ミス回数を返す。
+    """
+    return _cache.stats()
+
+
+def _fetch(params: dict) -> dict or None:
+    """
+    レート制限付きでGeocoding APIを呼び出す。
+    レート制限・通信エラーの場合は速度を下げて GOOGLE_MAPS_RETRY_COUNT 回まで再試行する。
+    結果が確定しなかった場合はNone。
+    """
+    global _request_count
+    for _ in range(GOOGLE_MAPS_RETRY_COUNT):
+        _rate_limiter.acquire()
+        with _request_count_lock:
+            _request_count += 1
+        try:
+            res = _session.get(GEOCODE_URL, params=params, timeout=GOOGLE_MAPS_TIMEOUT_SEC)
+        except Exception:
+            _rate_limiter.on_throttle()
+            continue
+
+        if res.status_code == 429:
+            _rate_limiter.on_throttle()
+            continue
+        if res.status_code != 200:
+            return None
+
+        body = res.json()
+        status = body.get('status')
+        if status in _THROTTLE_STATUSES:
+            _rate_limiter.on_throttle()
+            continue
+        _rate_limiter.on_success()
+        return body if status in _FINAL_STATUSES else None
+    return None
 
 
 def geocode_location(location_name: str) -> tuple:
     """
     指定した地名(駅名など)の緯度経度を取得する。
+    結果はクエリごとにキャッシュし（見つからなかった結果も含む）、同じクエリはAPIに送らない。
     戻り値: (lat, lng) or (None, None)
     """
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
     params = {
         "address": location_name,
         "key": GOOGLE_MAPS_KEY
     }
-    res = requests.get(url, params=params)
-    if res.status_code != 200:
-        return (None, None)
+    hit, body = _cache.get(GEOCODE_URL, params)
+    if not hit:
+        body = _fetch(params)
+        if body is None:
+            return (None, None)
+        _cache.put(GEOCODE_URL, params, body, negative=not body.get("results"))
 
-    data = res.json().get("results", [])
+    data = body.get("results", [])
     if not data:
         return (None, None)
     loc = data[0]["geometry"]["location"]
-    return (loc["lat"], loc["lng"])
\ No newline at end of file
+    return (loc["lat"], loc["lng"])
@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    スレッドセーフなトークンバケット方式のレートリミッタ。
+
+    rate_per_sec 個/秒の速度でトークンが補充され、最大 capacity 個まで貯まる。
+    acquire() はトークンが1つ取れるまで待機する。
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float = None):
+        self.rate = float(rate_per_sec)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate_per_sec))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """
+        トークンを1つ消費する。足りなければ補充されるまで待機する。
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    APIのレート制限の応答に合わせて速度を自動調整するトークンバケット（AIMD方式）。
+
+    成功するたびに increase_per_sec ずつ max_rate まで速度を上げ、
+    制限された（HTTP 429・OVER_QUERY_LIMIT など）ら decrease_ratio 倍（min_rate まで）に下げる。
+    """
+
+    def __init__(self, rate_per_sec: float, min_rate: float, max_rate: float,
+                 increase_per_sec: float = 0.1, decrease_ratio: float = 0.5, capacity: float = None):
+        super().__init__(rate_per_sec, capacity)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase_per_sec = float(increase_per_sec)
+        self.decrease_ratio = float(decrease_ratio)
+
+    def on_success(self) -> None:
+        """
+        リクエストが成功したときに呼ぶ（速度を少し上げる）。
+        """
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase_per_sec)
+
+    def on_throttle(self) -> None:
+        """
+        レート制限されたときに呼ぶ（速度を下げ、貯まっているトークンを捨てる）。
+        """
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.decrease_ratio)
+            self._tokens = 0.0
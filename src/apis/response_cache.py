@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    APIレスポンス(JSON)をSQLiteに永続化するキャッシュ。
+
+    キーは「エンドポイント + 正規化したパラメータ」。APIキーなど結果に影響しない
+    パラメータは ignore_params で除外する。生のレスポンスを保存するため、
+    レスポンスからの値の取り出し方を変えても再リクエストは不要。
+
+    - TTL: 取得から ttl_sec 秒を過ぎたレスポンスは無効（ミス扱い）
+    - ネガティブキャッシュ: 「見つからなかった」レスポンスは negative_ttl_sec で管理
+    - SQLiteの前段にプロセス内LRU（memory_size 件）を置く
+    """
+
+    def __init__(self, db_path: str, ttl_sec: float, negative_ttl_sec: float,
+                 memory_size: int = 10000, ignore_params: tuple = ('key',)):
+        self.db_path = db_path
+        self.ttl_sec = ttl_sec
+        self.negative_ttl_sec = negative_ttl_sec
+        self.memory_size = memory_size
+        self.ignore_params = set(ignore_params)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'writes': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # 初回アクセス時にDBを開く（キャッシュを使わない処理ではファイルを作らない）
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " cache_key TEXT PRIMARY KEY,"
+                " endpoint TEXT NOT NULL,"
+                " body TEXT NOT NULL,"
+                " negative INTEGER NOT NULL,"
+                " fetched_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def make_key(self, endpoint: str, params: dict) -> str:
+        """
+        エンドポイントと正規化したパラメータからキャッシュキーを作る。
+        """
+        normalized = sorted(
+            (str(k), str(v).strip()) for k, v in params.items() if k not in self.ignore_params
+        )
+        return endpoint + '?' + json.dumps(normalized, ensure_ascii=False, separators=(',', ':'))
+
+    def _is_fresh(self, negative: bool, fetched_at: float) -> bool:
+        ttl = self.negative_ttl_sec if negative else self.ttl_sec
+        return time.time() - fetched_at <= ttl
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, endpoint: str, params: dict) -> tuple:
+        """
+        キャッシュからレスポンスを取得する。
+
+        Returns:
+            tuple: (ヒットしたか, レスポンスのdict or None)
+        """
+        key = self.make_key(endpoint, params)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                body, negative, fetched_at = entry
+                if self._is_fresh(negative, fetched_at):
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return True, body
+                del self._memory[key]
+
+            row = self._connection().execute(
+                "SELECT body, negative, fetched_at FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return False, None
+
+            body, negative, fetched_at = json.loads(row[0]), bool(row[1]), row[2]
+            if not self._is_fresh(negative, fetched_at):
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return False, None
+
+            self._remember(key, (body, negative, fetched_at))
+            self._stats['disk_hits'] += 1
+            return True, body
+
+    def peek(self, endpoint: str, params: dict) -> tuple:
+        """
+        ヒット・ミスの回数やLRUの順序を変えずに、有効なキャッシュがあるか調べる。
+        API呼び出し回数の見積もりに使う。
+
+        Returns:
+            tuple: (ヒットしたか, レスポンスのdict or None)
+        """
+        key = self.make_key(endpoint, params)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._is_fresh(entry[1], entry[2]):
+                return True, entry[0]
+            row = self._connection().execute(
+                "SELECT body, negative, fetched_at FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if row is None or not self._is_fresh(bool(row[1]), row[2]):
+            return False, None
+        return True, json.loads(row[0])
+
+    def put(self, endpoint: str, params: dict, body: dict, negative: bool = False) -> None:
+        """
+        レスポンスをキャッシュに保存する。
+
+        Args:
+            endpoint: エンドポイントURL
+            params: リクエストパラメータ
+            body: レスポンスのdict（生のJSON）
+            negative: 「見つからなかった」レスポンスならTrue（negative_ttl_secで管理）
+        """
+        key = self.make_key(endpoint, params)
+        fetched_at = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, endpoint, body, negative, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, json.dumps(body, ensure_ascii=False), int(negative), fetched_at)
+            )
+            conn.commit()
+            self._remember(key, (body, negative, fetched_at))
+            self._stats['writes'] += 1
+
+    def stats(self) -> dict:
+        """
+        ヒット・ミスの回数を返す。
+
+        Returns:
+            dict: memory_hits, disk_hits, misses, expired, writes, hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
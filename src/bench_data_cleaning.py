@@ -0,0 +1,139 @@
+"""
+pipeline.data_cleaning のベンチマーク
+
+同梱の price_by_station_*.csv（1倍）と、それを100倍に複製した表で、
+路線名の正規化（normalize_line_names）と徒歩時間の加算（add_walking_time）を
+旧実装（駅ごと・行ごとのPythonループ）と現在の実装（対応表の map・インデックス配列）で比較する。
+
+両方の出力が完全に一致することも確認する。
+
+使い方:
+    cd src
+    python bench_data_cleaning.py
+"""
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import WALK_MINUTES
+from pipeline.data_cleaning import LINE_NAME_MAPPING, add_walking_time, normalize_line_names
+from pipeline.transit_graph import load_calculated_routes
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+STATION_CSV = os.path.join(DATA_DIR, "station_master", "station_address_with_coordinates.csv")
+
+SCALES = [1, 100]
+REPEAT = 5
+
+
+def legacy_normalize_odakyu_line(price_df, station_df):
+    """
+    旧実装: 小田急の駅ごとに駅マスタを絞り込み、行ごとに路線名を書き換える
+    """
+    odakyu_mask = price_df['line'] == '小田急線'
+    odakyu_stations = price_df[odakyu_mask]['station'].unique()
+    station_to_line = {}
+    for station in odakyu_stations:
+        matches = station_df[
+            (station_df['station'] == station) &
+            (station_df['line'].str.contains('小田急', na=False))
+        ]
+        if len(matches) > 0:
+            station_to_line[station] = matches.iloc[0]['line']
+        else:
+            station_to_line[station] = '小田急小田原線'
+    for idx in price_df[odakyu_mask].index:
+        station = price_df.loc[idx, 'station']
+        price_df.loc[idx, 'line'] = station_to_line.get(station, '小田急小田原線')
+    return price_df
+
+
+def legacy_normalize_line_names(price_df, station_df):
+    """
+    旧実装の normalize_line_names
+    """
+    df_normalized = price_df.copy()
+    df_normalized['line'] = df_normalized['line'].replace(LINE_NAME_MAPPING)
+    df_normalized = legacy_normalize_odakyu_line(df_normalized, station_df)
+    monorail2_stations = ['千葉', '千葉公園', '千城台', '千城台北', '小倉台', '桜木', '都賀', '作草部']
+    df_normalized.loc[
+        (df_normalized['line'] == '千葉モノレール1号線') &
+        (df_normalized['station'].isin(monorail2_stations)),
+        'line'
+    ] = '千葉モノレール2号線'
+    return df_normalized
+
+
+def legacy_add_walking_time(df, walk_dict, to_col='to', time_col='min', new_col='train+walk_min'):
+    """
+    旧実装の add_walking_time
+    """
+    walk_list = []
+    for dest in df[to_col]:
+        walk_list.append(walk_dict.get(dest, 0))
+    df[new_col] = np.array(walk_list) + df[time_col].values
+    return df
+
+
+def scale_df(df, scale):
+    """
+    表を scale 倍に複製する（行の内容はそのまま、インデックスは振り直す）
+    """
+    return pd.concat([df] * scale, ignore_index=True) if scale > 1 else df.copy()
+
+
+def measure(func):
+    """
+    REPEAT 回実行した中央値（ミリ秒）と最後の結果を返す
+    """
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def report(label, rows, legacy, current):
+    t_legacy, expected = measure(legacy)
+    t_current, actual = measure(current)
+    pd.testing.assert_frame_equal(actual, expected)
+    print(f"{label:<36} {rows:>9} {t_legacy:>10.2f} {t_current:>9.2f} {t_legacy / t_current:>7.1f}x")
+
+
+def main():
+    station_df = pd.read_csv(STATION_CSV)
+    price_paths = sorted(glob.glob(os.path.join(DATA_DIR, "price_by_station", "price_by_station_*.csv")))
+    route_df = load_calculated_routes(os.path.join(DATA_DIR, "calculated_routes"))
+
+    print("=" * 76)
+    print("data_cleaning ベンチマーク（中央値、ミリ秒）")
+    print("=" * 76)
+    print(f"{'処理':<36} {'行数':>9} {'旧実装':>10} {'現在':>9} {'速度比':>8}")
+
+    for path in price_paths:
+        name = os.path.basename(path).replace('price_by_station_', '').replace('.csv', '')
+        if name == 'long':  # 縦持ちの表（全部屋タイプ）は対象外
+            continue
+        base_df = pd.read_csv(path)
+        for scale in SCALES:
+            price_df = scale_df(base_df, scale)
+            report(f"normalize_line_names {name} x{scale}", len(price_df),
+                   lambda: legacy_normalize_line_names(price_df, station_df),
+                   lambda: normalize_line_names(price_df, station_df))
+
+    for scale in SCALES:
+        df = scale_df(route_df, scale)
+        report(f"add_walking_time x{scale}", len(df),
+               lambda: legacy_add_walking_time(df.copy(), WALK_MINUTES),
+               lambda: add_walking_time(df.copy(), WALK_MINUTES))
+
+    print("=" * 76)
+    print("すべての出力が旧実装と一致しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+スクレイピングしたページの解析のベンチマーク
+
+フィクスチャのページ（tests/fixtures/pages/）またはページキャッシュ（data/cache/pages/、
+scrapers/page_cache.py）に保存された SUUMO・TravelTowns のページで、
+次の方式の1ページあたりの解析時間を比較する。
+
+- html.parser: ページ全体を html.parser で解析（旧実装）
+- html.parser+表: 対象の表だけを解析（SoupStrainer）
+- lxml / lxml+表: パーサを lxml にしたもの（lxml がインストールされている場合のみ）
+
+各方式で抽出した行が旧実装と完全に一致することも確認する。
+
+使い方:
+    cd src
+    python bench_html_parser.py                       # フィクスチャのページで計測
+    python bench_html_parser.py --cache-dir DIR       # ページキャッシュのページで計測
+    python bench_html_parser.py --export-fixtures     # ページキャッシュのページでフィクスチャを置き換える
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from config import SCRAPING_CACHE_DIR
+from scrapers.html_parser import make_soup
+from scrapers import suumo_scraper, traveltowns_scraper
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "pages")
+
+REPEAT = 5
+
+# ページの種類: (表示名, URLの判定, 抽出関数, 絞り込み)
+PAGE_KINDS = [
+    ('SUUMO 都道府県', lambda url: 'suumo.jp' in url and url.endswith('/ensen/'),
+     suumo_scraper._parse_pref_lines, suumo_scraper.PREF_LINES_ONLY),
+    ('SUUMO 路線', lambda url: 'suumo.jp' in url and 'mdKbn=' in url,
+     suumo_scraper._parse_line_prices, suumo_scraper.LINE_PRICES_ONLY),
+    ('TravelTowns 路線一覧', lambda url: 'traveltowns.jp' in url and url.rstrip('/').endswith('/kanto'),
+     traveltowns_scraper._parse_line_links, traveltowns_scraper.TABLES_ONLY),
+    ('TravelTowns 路線', lambda url: 'traveltowns.jp' in url,
+     traveltowns_scraper._parse_stations, traveltowns_scraper.TABLES_ONLY),
+]
+
+
+def available_backends():
+    try:
+        import lxml  # noqa: F401
+        return ['html.parser', 'lxml']
+    except ImportError:
+        return ['html.parser']
+
+
+def load_pages(cache_dir):
+    """
+    ページキャッシュから (URL, HTML) のリストを読み込む
+    """
+    index_path = os.path.join(cache_dir, 'index.sqlite3')
+    if not os.path.exists(index_path):
+        return []
+    conn = sqlite3.connect(index_path)
+    rows = conn.execute("SELECT url, body_hash, encoding FROM pages ORDER BY url").fetchall()
+    conn.close()
+
+    pages = []
+    for url, body_hash, encoding in rows:
+        with open(os.path.join(cache_dir, 'objects', body_hash[:2], body_hash), 'rb') as f:
+            pages.append((url, f.read().decode(encoding or 'utf-8', errors='replace')))
+    return pages
+
+
+def load_fixtures(fixture_dir):
+    """
+    フィクスチャのディレクトリ（pages.csv に URL とファイル名の対応）から (URL, HTML) のリストを読み込む
+    """
+    index_path = os.path.join(fixture_dir, 'pages.csv')
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+
+    pages = []
+    for row in rows:
+        with open(os.path.join(fixture_dir, row['file']), encoding='utf-8') as f:
+            pages.append((row['url'], f.read()))
+    return pages
+
+
+def export_fixtures(pages, fixture_dir):
+    """
+    (URL, HTML) のリストをフィクスチャのディレクトリに書き出す（既存のフィクスチャは置き換える）
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    for name in os.listdir(fixture_dir):
+        if name.endswith('.html'):
+            os.remove(os.path.join(fixture_dir, name))
+
+    rows = []
+    for i, (url, html) in enumerate(pages):
+        kind = 'suumo' if 'suumo.jp' in url else 'traveltowns'
+        name = f"{kind}_{i:03d}.html"
+        with open(os.path.join(fixture_dir, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        rows.append([url, name])
+    with open(os.path.join(fixture_dir, 'pages.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['url', 'file'])
+        writer.writerows(rows)
+    print(f"{len(rows)} ページをフィクスチャに書き出しました: {fixture_dir}")
+
+
+def measure(func):
+    """
+    REPEAT 回実行した中央値（ミリ秒）と最後の結果を返す
+    """
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スクレイピングしたページの解析のベンチマーク")
+    parser.add_argument('--fixture-dir', default=FIXTURE_DIR, help="フィクスチャのページのディレクトリ")
+    parser.add_argument('--cache-dir', nargs='?', const=SCRAPING_CACHE_DIR,
+                        help="フィクスチャの代わりにページキャッシュのページを使う（省略時は SCRAPING_CACHE_DIR）")
+    parser.add_argument('--export-fixtures', action='store_true',
+                        help="ページキャッシュのページをフィクスチャのディレクトリに書き出して終了する")
+    args = parser.parse_args()
+
+    if args.export_fixtures:
+        cache_dir = args.cache_dir or SCRAPING_CACHE_DIR
+        pages = load_pages(cache_dir)
+        if not pages:
+            print(f"保存されたページがありません: {cache_dir}")
+            return
+        export_fixtures(pages, args.fixture_dir)
+        return
+
+    source = args.cache_dir or args.fixture_dir
+    pages = load_pages(args.cache_dir) if args.cache_dir else load_fixtures(args.fixture_dir)
+    if not pages:
+        print(f"保存されたページがありません: {source}")
+        return
+    print(f"ページ: {source}（{len(pages)} ページ）")
+
+    methods = []
+    for backend in available_backends():
+        methods.append((backend, backend, False))
+        methods.append((backend + '+表', backend, True))
+
+    print("=" * 72)
+    print("HTML解析 ベンチマーク（1ページあたりの平均、各ページは中央値、ミリ秒）")
+    print("=" * 72)
+    print(f"{'ページ':<20} {'件数':>5} " + " ".join(f"{name:>15}" for name, _, _ in methods))
+
+    for kind, matches, extract, strainer in PAGE_KINDS:
+        kind_pages = [(url, html) for url, html in pages if matches(url)]
+        pages = [(url, html) for url, html in pages if not matches(url)]
+        if not kind_pages:
+            continue
+
+        totals = {name: 0.0 for name, _, _ in methods}
+        for url, html in kind_pages:
+            baseline = None
+            for name, backend, restrict in methods:
+                elapsed, rows = measure(
+                    lambda: extract(make_soup(html, strainer if restrict else None, backend))
+                )
+                if baseline is None:
+                    baseline = rows
+                elif rows != baseline:
+                    raise AssertionError(f"抽出結果が一致しません: {name} {url}")
+                totals[name] += elapsed
+
+        base_ms = totals[methods[0][0]] / len(kind_pages)
+        cells = []
+        for name, _, _ in methods:
+            ms = totals[name] / len(kind_pages)
+            cells.append(f"{ms:>7.2f} ({base_ms / ms:>4.1f}x)")
+        print(f"{kind:<20} {len(kind_pages):>5} " + " ".join(f"{cell:>15}" for cell in cells))
+
+    print("=" * 72)
+    print("すべての方式で抽出結果が旧実装（html.parser、ページ全体）と一致しました")
+
+
+if __name__ == '__main__':
+    main()
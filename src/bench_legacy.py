@@ -0,0 +1,81 @@
+"""
+ベンチマーク用の旧実装（フロントエンド用マスターの座標・価格の付与）
+
+pipeline/station_db.py のクエリに置き換える前の、CSVを全件読み込んでpandasで結合する実装。
+bench_location_join.py・bench_station_db.py で現在の実装と比べるために使う。
+"""
+import os
+
+import pandas as pd
+
+from config import ROOM_TYPE, WALK_MINUTES
+from pipeline.station_resolver import normalize_names
+from pipeline.storage import read_table
+
+
+def load_station_coord_price(data_dir):
+    """
+    駅の座標・価格情報を読み込む
+
+    Args:
+        data_dir: データディレクトリのパス
+
+    Returns:
+        DataFrame: 駅の座標・価格情報
+    """
+    path = os.path.join(
+        data_dir,
+        "station_coord_price",
+        f"station_coord_price_{ROOM_TYPE}.csv"
+    )
+    return read_table(path, 'station_coord_price')
+
+
+def add_location_and_price_info(frontend_master, station_coord_price_df):
+    """
+    経路データに座標・価格・徒歩時間を追加する
+
+    経路の (line, from) と駅データの (line, station) を正規化したキー（pipeline.station_resolver.normalize_name）で
+    完全一致させる（ハッシュ結合）。
+    一致しない行は、駅名だけで一致する駅データ（同じ駅名が複数あれば先頭の行）で補う。
+    それでも一致しない行は座標・価格を欠損値とし、件数と駅を表示する。
+
+    Args:
+        frontend_master: 経路データのDataFrame
+        station_coord_price_df: 駅の座標・価格情報
+
+    Returns:
+        DataFrame: 座標・価格・徒歩時間が追加されたDataFrame
+    """
+    columns = ['lat', 'lng', 'price']
+    keys = pd.DataFrame({
+        'line': normalize_names(frontend_master['line']),
+        'station': normalize_names(frontend_master['from']),
+    })
+    stations = station_coord_price_df.assign(
+        line=normalize_names(station_coord_price_df['line']),
+        station=normalize_names(station_coord_price_df['station'])
+    )
+
+    # 1. (路線, 駅) の完全一致
+    by_line_station = stations.drop_duplicates(subset=['line', 'station'])[['line', 'station'] + columns]
+    additional_df = keys.merge(
+        by_line_station, on=['line', 'station'], how='left', validate='many_to_one', indicator=True
+    )
+    matched = (additional_df['_merge'] == 'both').to_numpy()
+
+    # 2. 駅名だけで一致する行で補う（路線名の表記が駅データと異なる場合）
+    by_station = stations.drop_duplicates(subset='station').set_index('station')[columns]
+    fallback = ~matched & keys['station'].isin(by_station.index).to_numpy()
+    for column in columns:
+        additional_df.loc[fallback, column] = keys.loc[fallback, 'station'].map(by_station[column])
+
+    unmatched = ~matched & ~fallback
+    if fallback.any() or unmatched.any():
+        print(f"  - 駅名だけで一致: {int(fallback.sum())} 行, 一致なし: {int(unmatched.sum())} 行")
+    if unmatched.any():
+        missing = keys[unmatched].drop_duplicates().head(10)
+        print("    一致しない駅: " + ", ".join(f"{line} {station}" for line, station in missing.itertuples(index=False)))
+
+    additional_df = additional_df[columns].assign(walk_min=frontend_master['to'].map(WALK_MINUTES).to_numpy())
+    return pd.concat([frontend_master.reset_index(drop=True), additional_df], axis=1)
@@ -0,0 +1,100 @@
+"""
+経路データへの座標・価格の付与（bench_legacy.add_location_and_price_info）のベンチマーク
+
+同梱のデータ（station_coord_price_{ROOM_TYPE}.csv と calculated_routes）で、次の2方式を比較する。
+
+- substring: 経路1行ごとに路線名・駅名の str.contains で駅データを全件走査し、先頭の一致を使う（旧実装）
+- join: 正規化した (路線, 駅) での完全一致のハッシュ結合（pandas版。StationDB.frontend_master() と同じ規則）
+
+旧実装は遅いため、オフィスごとに先頭 --sample 行で測り、1行あたりの時間で比べる。
+旧実装が部分一致で別の駅を選んだ行（例: 「千葉」が「西千葉」に一致）の数も表示する。
+
+使い方:
+    cd src
+    python bench_location_join.py [--sample 2000]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import TO_TORANOMON_LIST, TO_TOKYO_LIST, TO_OTSUKA_LIST, WALK_MINUTES
+from bench_legacy import add_location_and_price_info, load_station_coord_price
+from pipeline.route_matrix import RouteMatrix
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+OFFICES = {
+    'toranomon': TO_TORANOMON_LIST,
+    'tokyo': TO_TOKYO_LIST,
+    'otsuka': TO_OTSUKA_LIST,
+}
+
+REPEAT = 5
+
+
+def substring_lookup(frontend_master, station_coord_price_df):
+    """
+    旧実装と同じ、1行ごとの str.contains による検索
+    """
+    additional_records = []
+    for i in range(len(frontend_master)):
+        row = frontend_master.iloc[i]
+        condition_line = station_coord_price_df['line'].str.contains(row['line'])
+        condition_station = station_coord_price_df['station'].str.contains(row['from'])
+        search_result = station_coord_price_df[condition_line & condition_station].iloc[0]
+        additional_records.append([search_result['lat'], search_result['lng'], search_result['price'],
+                                   WALK_MINUTES[row['to']]])
+    additional_df = pd.DataFrame(additional_records, columns=['lat', 'lng', 'price', 'walk_min'])
+    return pd.concat([frontend_master, additional_df], axis=1)
+
+
+def measure(func, repeat):
+    """
+    repeat 回実行した中央値（ミリ秒）と最後の結果を返す
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="座標・価格の付与のベンチマーク")
+    parser.add_argument('--sample', type=int, default=2000, help="旧実装を測るオフィスごとの行数")
+    args = parser.parse_args()
+
+    station_coord_price_df = load_station_coord_price(DATA_DIR)
+    matrix = RouteMatrix.from_csv_dir(os.path.join(DATA_DIR, "calculated_routes"))
+
+    print("=" * 72)
+    print("座標・価格の付与 ベンチマーク（1行あたり、マイクロ秒）")
+    print("=" * 72)
+    print(f"{'オフィス':<10} {'行数':>7} {'join(全体)':>11} {'substring':>10} {'join':>8} {'速度比':>8} {'選択の違い':>8}")
+
+    for office_name, to_station_list in OFFICES.items():
+        frontend_master = pd.concat([matrix.to_route_df(s) for s in to_station_list], ignore_index=True)
+        sample = frontend_master.head(args.sample)
+
+        t_join, joined = measure(lambda: add_location_and_price_info(frontend_master, station_coord_price_df), REPEAT)
+        t_old, old = measure(lambda: substring_lookup(sample, station_coord_price_df), 1)
+
+        # 旧実装が別の駅を選んだ行（座標が異なる行）
+        columns = ['lat', 'lng']
+        head = joined.head(len(sample))
+        differs = ~(np.isclose(old[columns], head[columns]) | (old[columns].isna() & head[columns].isna())).all(axis=1)
+
+        per_row_join = t_join * 1000 / len(frontend_master)
+        per_row_old = t_old * 1000 / len(sample)
+        print(f"{office_name:<10} {len(frontend_master):>7} {t_join:>9.1f}ms {per_row_old:>10.1f} "
+              f"{per_row_join:>8.2f} {per_row_old / per_row_join:>7.0f}x {int(differs.sum()):>8}/{len(sample)}")
+
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
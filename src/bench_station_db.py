@@ -0,0 +1,137 @@
+"""
+pipeline.station_db のベンチマーク
+
+同梱のデータで、フロントエンド用マスター（3オフィス）とフィルタリング済みマスターの作成を
+旧実装（CSV・経路行列の全件読み込みとpandasの結合・フィルタ）と
+データベースへのクエリ（インデックスを使った結合）で比較する。
+データベースは一時ディレクトリにCSVから作り、その時間も表示する。
+
+両方の出力が完全に一致することも確認する。
+
+使い方:
+    cd src
+    python bench_station_db.py
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import ROOM_TYPE, WALK_MINUTES, TO_TORANOMON_LIST, TO_TOKYO_LIST, TO_OTSUKA_LIST
+from bench_legacy import add_location_and_price_info, load_station_coord_price
+from pipeline.route_matrix import RouteMatrix
+from pipeline.station_db import build_station_db
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+STATION_CSV = os.path.join(DATA_DIR, "station_master", "station_address_with_coordinates.csv")
+
+OFFICES = {'toranomon': TO_TORANOMON_LIST, 'tokyo': TO_TOKYO_LIST, 'otsuka': TO_OTSUKA_LIST}
+TRANSIT_MIN_UPPER = {'toranomon': 80, 'tokyo': 80, 'otsuka': 60}
+TRANS_NUM_UPPER = 2
+RENT_PRICE_UPPER = 12
+
+REPEAT = 5
+
+
+def legacy_frontend_masters():
+    """
+    旧実装: 駅の座標・家賃CSVと calculated_routes（経路行列）を全件読み込み、オフィスごとにpandasで結合する
+    """
+    station_coord_price_df = load_station_coord_price(DATA_DIR)
+    matrix = RouteMatrix.from_csv_dir(os.path.join(DATA_DIR, "calculated_routes"))
+    result = {}
+    for office, to_stations in OFFICES.items():
+        frontend_master = pd.concat([matrix.to_route_df(s) for s in to_stations], ignore_index=True)
+        result[office] = add_location_and_price_info(frontend_master, station_coord_price_df)
+    return result
+
+
+def legacy_filter_frontend_master(frontend_master_df, transit_min_upper, trans_num_upper, rent_price_upper):
+    """
+    旧実装の make_filtered_master.filter_frontend_master
+    """
+    frontend_master = frontend_master_df.copy()
+    transit_min_bool = frontend_master['min'] + frontend_master['walk_min'] <= transit_min_upper
+    trans_num_bool = frontend_master['trans'] <= trans_num_upper
+    rent_price_bool = frontend_master['price'] <= rent_price_upper
+    return frontend_master[transit_min_bool & trans_num_bool & rent_price_bool].reset_index(drop=True)
+
+
+def legacy_filtered_master(frontend_masters):
+    """
+    旧実装の make_filtered_master（エリアごとのフィルタ → 共通駅の抽出 → 駅名の重複の解消）
+    """
+    filtered = {
+        office: legacy_filter_frontend_master(df, TRANSIT_MIN_UPPER[office], TRANS_NUM_UPPER, RENT_PRICE_UPPER)
+        for office, df in frontend_masters.items()
+    }
+    station_sets = [set(zip(df['line'], df['from'])) for df in filtered.values()]
+    common_stations = set.intersection(*station_sets)
+    base = filtered['toranomon']
+    common = base[base.apply(lambda row: (row['line'], row['from']) in common_stations, axis=1)].reset_index(drop=True)
+    temp_df = common.copy()
+    temp_df['total_time'] = temp_df['min'] + temp_df['walk_min']
+    min_idx = temp_df.groupby('from')['total_time'].idxmin()
+    return common.loc[min_idx].reset_index(drop=True)
+
+
+def measure(func):
+    """
+    REPEAT 回実行した中央値（ミリ秒）と最後の結果を返す
+    """
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def report(label, legacy, current):
+    t_legacy, expected = measure(legacy)
+    t_current, actual = measure(current)
+    for key in expected:
+        pd.testing.assert_frame_equal(actual[key], expected[key], check_dtype=False)
+    print(f"{label:<28} {t_legacy:>10.2f} {t_current:>9.2f} {t_legacy / t_current:>7.1f}x")
+    return expected
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='bench_station_db_')
+    try:
+        db_path = os.path.join(tmp_dir, "station_db.sqlite3")
+        start = time.perf_counter()
+        db = build_station_db(db_path, STATION_CSV, os.path.join(DATA_DIR, "station_coord_price"),
+                              os.path.join(DATA_DIR, "calculated_routes"))
+        build_ms = (time.perf_counter() - start) * 1000
+        counts = db.counts()
+
+        print("=" * 60)
+        print("station_db ベンチマーク（中央値、ミリ秒）")
+        print("=" * 60)
+        print(f"データベースの作成: {build_ms:.0f} ms（駅 {counts['stations']}, 家賃 {counts['prices']},"
+              f" 経路 {counts['routes']}）, {os.path.getsize(db_path) / 1024:.0f} KB")
+        print(f"{'処理':<28} {'旧実装':>10} {'DB':>9} {'速度比':>8}")
+
+        frontend_masters = report(
+            "フロントエンド用マスター x3", legacy_frontend_masters,
+            lambda: {office: db.frontend_master(to_stations, ROOM_TYPE, WALK_MINUTES)
+                     for office, to_stations in OFFICES.items()})
+        report(
+            "フィルタリング済みマスター",
+            lambda: {'filtered': legacy_filtered_master(frontend_masters)},
+            lambda: {'filtered': db.common_stations(OFFICES, TRANSIT_MIN_UPPER, TRANS_NUM_UPPER, RENT_PRICE_UPPER,
+                                                    ROOM_TYPE, WALK_MINUTES, base_office='toranomon')})
+        db.close()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print("=" * 60)
+    print("すべての出力が旧実装と一致しました")
+
+
+if __name__ == '__main__':
+    main()
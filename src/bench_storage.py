@@ -0,0 +1,117 @@
+"""
+pipeline.storage のベンチマーク
+
+同梱のデータ（駅の座標・家賃、経路、フロントエンド用マスター）と、それを20倍に複製した表で、
+読み込み時間とファイルサイズを次の形式で比較する。
+
+- CSV（型推定）: これまでの pd.read_csv
+- CSV（スキーマ）: 列の型を指定した pd.read_csv（pyarrow がない場合の read_table）
+- Arrow IPC: 非圧縮、辞書エンコード、メモリマップで読み込み（STORAGE_FORMAT='arrow'）
+- Parquet: zstd 圧縮、辞書エンコード（STORAGE_FORMAT='parquet'）
+
+列指向ファイルは一時ディレクトリに書き出す。列指向ファイルから読んだ表が
+スキーマを指定してCSVから読んだ表と完全に一致することも確認する。
+
+使い方:
+    cd src
+    python bench_storage.py
+"""
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline import storage
+from pipeline.storage import SCHEMAS, columnar_path, read_table, write_columnar
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+TABLES = [
+    ('station_coord_price', os.path.join(DATA_DIR, "station_coord_price", "station_coord_price_*.csv")),
+    ('calculated_routes', os.path.join(DATA_DIR, "calculated_routes", "calculated_routes_*.csv")),
+    ('frontend_master', os.path.join(DATA_DIR, "frontend_master", "frontend_master_*.csv")),
+]
+
+SCALES = [1, 20]
+REPEAT = 5
+
+
+def measure(func):
+    """
+    REPEAT 回実行した中央値（ミリ秒）と最後の結果を返す
+    """
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def read_all(paths, reader):
+    return pd.concat([reader(path) for path in paths], ignore_index=True)
+
+
+def main():
+    if storage.pa is None:
+        print("pyarrow がインストールされていないため、列指向ファイルのベンチマークは実行できません")
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix='bench_storage_')
+    try:
+        print("=" * 88)
+        print("storage ベンチマーク（読み込みの中央値 ミリ秒 / ファイルサイズの合計 KB）")
+        print("=" * 88)
+        print(f"{'表':<26} {'行数':>9} {'CSV推定':>9} {'CSV型':>9} {'Arrow':>9} {'Parquet':>9}"
+              f"  {'CSV':>8} {'Arrow':>8} {'Parquet':>8}")
+
+        for schema, pattern in TABLES:
+            source_paths = sorted(glob.glob(pattern))
+            if not source_paths:
+                continue
+            for scale in SCALES:
+                # 表をファイルごとに scale 倍に複製して一時ディレクトリに書き出す
+                csv_paths = []
+                for path in source_paths:
+                    df = pd.read_csv(path, dtype=SCHEMAS[schema])
+                    if scale > 1:
+                        df = pd.concat([df] * scale, ignore_index=True)
+                    csv_path = os.path.join(tmp_dir, f"x{scale}_{os.path.basename(path)}")
+                    df.to_csv(csv_path, index=False)
+                    for fmt in storage.FORMATS:
+                        write_columnar(df, csv_path, schema, fmt)
+                    csv_paths.append(csv_path)
+
+                t_infer, _ = measure(lambda: read_all(csv_paths, pd.read_csv))
+                t_schema, expected = measure(lambda: read_all(csv_paths, lambda p: pd.read_csv(p, dtype=SCHEMAS[schema])))
+                timings = {}
+                for fmt in storage.FORMATS:
+                    columnar_paths = [columnar_path(p, fmt) for p in csv_paths]
+                    timings[fmt], actual = measure(
+                        lambda: read_all(columnar_paths, lambda p: storage._read_columnar(p, schema)))
+                    pd.testing.assert_frame_equal(actual, expected)
+
+                sizes = {
+                    fmt: sum(os.path.getsize(columnar_path(p, fmt)) for p in csv_paths) / 1024
+                    for fmt in storage.FORMATS
+                }
+                csv_size = sum(os.path.getsize(p) for p in csv_paths) / 1024
+                print(f"{f'{schema} x{scale}':<26} {len(expected):>9} {t_infer:>9.2f} {t_schema:>9.2f}"
+                      f" {timings['arrow']:>9.2f} {timings['parquet']:>9.2f}"
+                      f"  {csv_size:>8.0f} {sizes['arrow']:>8.0f} {sizes['parquet']:>8.0f}")
+
+                # read_table は CSV より新しい列指向ファイル（STORAGE_FORMAT）を読む
+                pd.testing.assert_frame_equal(read_all(csv_paths, lambda p: read_table(p, schema)), expected)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print("=" * 88)
+    print("列指向ファイルから読んだ表は、スキーマを指定してCSVから読んだ表と一致しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,74 @@ GOOGLE_MAPS_KEY = os.environ.get("GOOGLE_MAPS_KEY")
 SCRAPING_SLEEP_SEC = 10
 SCRAPING_RETRY_COUNT = 3
 
+# スクレイピングしたページのキャッシュ（scrapers/page_cache.py）
+# refresh: 保存済みのページは条件付きリクエスト（304なら再ダウンロード・再解析しない）
+# replay: ネットワークにアクセスせず、保存済みのページだけで実行する（開発・ベンチマーク用）
+SCRAPING_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "cache", "pages")
+SCRAPING_CACHE_MODE = os.environ.get("SCRAPING_CACHE_MODE", "refresh")
+
+# 駅マスタ（駅名・路線名の名寄せ pipeline/station_resolver.py の索引の元）
+STATION_MASTER_CSV = os.path.join(os.path.dirname(__file__), "..", "data", "station_master", "station_address.csv")
+STATION_RESOLVER_CACHE_SIZE = 20000   # 名前ごとの解決結果のLRUの件数
+
+# Ekispert API の呼び出し設定（契約プランのクォータに合わせて調整する）
+EKISPERT_RATE_PER_SEC = 5     # 1秒あたりのリクエスト数の上限
+EKISPERT_MAX_WORKERS = 8      # 同時に処理する経路検索の上限
+EKISPERT_TIMEOUT_SEC = 10     # 1リクエストのタイムアウト
+
+# Ekispert APIレスポンスのキャッシュ（駅名検索・経路検索の生のJSONを保存）
+EKISPERT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "cache", "ekispert_cache.sqlite3")
+EKISPERT_CACHE_TTL_SEC = 60 * 60 * 24 * 90          # 90日
+EKISPERT_NEGATIVE_CACHE_TTL_SEC = 60 * 60 * 24 * 7  # 該当なしの結果は7日
+EKISPERT_MEMORY_CACHE_SIZE = 20000                  # プロセス内LRUの件数
+
+# Google Maps Geocoding API の呼び出し設定
+# 速度は GOOGLE_MAPS_RATE_PER_SEC から始め、レート制限の応答に合わせて MIN〜MAX の間で自動調整する
+GOOGLE_MAPS_RATE_PER_SEC = 10
+GOOGLE_MAPS_MIN_RATE_PER_SEC = 1
+GOOGLE_MAPS_MAX_RATE_PER_SEC = 40
+GOOGLE_MAPS_MAX_WORKERS = 8
+GOOGLE_MAPS_TIMEOUT_SEC = 10
+GOOGLE_MAPS_RETRY_COUNT = 3   # レート制限・通信エラー時の再試行回数
+
+# ジオコーディング結果のキャッシュ（クエリごとの生のJSON、見つからなかった結果も含めて無期限に保存）
+GEOCODE_CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "cache", "geocode_cache.sqlite3")
+GEOCODE_CACHE_TTL_SEC = float('inf')
+GEOCODE_NEGATIVE_CACHE_TTL_SEC = float('inf')
+
+# 駅座標の範囲（緯度・経度）。これより外の座標はジオコーディングの誤りとみなす
+# 関東から延びる路線の駅（常磐線の仙台、上越線の長岡、中央本線の塩尻など）を含む広さにしている
+STATION_BBOX = {'lat': (34.8, 38.4), 'lng': (137.8, 141.1)}
+
+# オフライン経路推定（pipeline/transit_graph.py）の較正済み係数
+TRANSIT_PARAMS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "transit_graph", "transit_params.json")
+
+# 出発駅 × 目的駅の経路行列（pipeline/route_matrix.py）の保存先
+ROUTE_MATRIX_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "route_matrix")
+
+# 駅・家賃・経路の組み込みデータベース（pipeline/station_db.py、data/ のCSVから再生成できる）
+STATION_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "station_db", "station_db.sqlite3")
+
+# データパイプライン（make_base_data.py、pipeline/runner.py）
+# 各ステージのフィンガープリント（入力の内容・設定値・処理）と出力のハッシュを保存する
+PIPELINE_STATE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "cache", "pipeline_state.json")
+PIPELINE_MAX_WORKERS = 2      # 同時に実行するステージの上限（家賃の取得とジオコーディングなど）
+
+# data/ の表（駅の座標・家賃、経路、フロントエンド用マスター）の列指向ファイルの形式（pipeline/storage.py）
+# 'arrow'（Arrow IPC、メモリマップで読む）または 'parquet'。CSVは書き出し用として常に保存する
+# pyarrow がインストールされていなければCSVだけを使う
+STORAGE_FORMAT = os.environ.get("STORAGE_FORMAT", "arrow")
+
 ROOM_TYPE = '2k'
 
+# 家賃相場を取得するときに1回の巡回でまとめて取得する部屋タイプ（ROOM_TYPE は常に含める）
+# data/price_by_station/ と frontend が扱う部屋タイプに合わせている
+RENT_ROOM_TYPES = ['one_room', '1k', '2k']
+
+# 既存の家賃相場CSVをSUUMOの変更分だけ更新する（RENT_REFRESH=1 python make_base_data.py）
+# 変更履歴（追加・削除・家賃の変更）は data/price_by_station/price_changes_{ROOM_TYPE}.csv に保存する
+RENT_REFRESH = os.environ.get("RENT_REFRESH", "0") == "1"
+
 # プロジェクト内で使う定数例（拡張しやすいようにまとめる）
 WALK_MINUTES = {
     '虎ノ門ヒルズ': 4,
@@ -8,45 +8,144 @@ import pandas as pd
 import os
 
 from scrapers.traveltowns_scraper import scrape_traveltowns_kanto
-from scrapers.suumo_scraper import scrape_suumo_rent
+from scrapers.suumo_scraper import scrape_suumo_rent_multi, refresh_suumo_rent, select_room_type
 
-from apis.ekispert import get_minimum_route_info_between_stations
+from tqdm import tqdm
+
+from apis.ekispert import is_course_answered
+from pipeline.route_engine import iter_concurrent, iter_route_results, resolve_station_names
+from pipeline.route_planner import RoutePlan
+from pipeline.station_resolver import get_station_resolver, normalize_names
+from pipeline.checkpoint import RouteCheckpoint
+from pipeline.storage import read_table
 
 from pipeline.data_cleaning import add_walking_time
+from pipeline.station_coordinates import SOURCE_SAME_NAME, impute_coordinates, print_imputation_summary
 
 from config import WALK_MINUTES
 from config import ROOM_TYPE
+from config import RENT_REFRESH
+from config import RENT_ROOM_TYPES
+
+
+def calculate_routes(df: pd.DataFrame, to_stations: list, output_paths: dict = None,
+                     reuse_outputs: bool = False) -> dict:
+    """
+    駅一覧DataFrameから各駅->各目的駅までの最小乗り換え回数・所要時間をまとめて取得する。
+
+    全目的駅 × 駅一覧の行を一意な (from, to) 駅名ペアにまとめ（RoutePlan、同じ駅の表記違いもまとめる）、
+    キャッシュ済み・記録済みのものを除いた必要なAPI呼び出し回数を表示してから検索する。
+    検索結果は同じ駅名ペアを持つ全ての (line, from, to) 行に展開する。
+    Ekispert APIの呼び出しはroute_engineで並列・レート制限付きで実行する。
+
+    output_pathsを指定した場合は、取得した経路を1件ずつ `{output_path}.partial` に追記し、
+    完了後にoutput_pathへアトミックに置き換える。途中で停止しても、次回は
+    記録済みのペアをスキップして再開する。
+    APIが該当なしと応答したペアは `{output_path}.failed` に保存する。
+    reuse_outputs=True の場合は既存の出力ファイルの経路と `.failed` のペアも記録済みとして扱い、
+    どちらにもない (line, from, to)（新しい目的駅・駅）だけを検索する（駅一覧にない行は出力から除く）。
+
+    Args:
+        df: 駅一覧DataFrame (line, station, 列を含む)
+        to_stations: 目的地の駅名のリスト
+        output_paths: {目的地の駅名: 出力CSVパス}（省略時はファイルに保存しない）
+        reuse_outputs: 既存の出力ファイルの経路を再利用するか
 
+    Returns:
+        dict: {目的地の駅名: 経路情報DataFrame (line, from, to, trans, min列)}
+    """
+    output_paths = output_paths or {}
+    checkpoints = {}
+    completed = set()
+    failed = {}
+    for to_station in to_stations:
+        if output_paths.get(to_station) is None:
+            continue
+        checkpoint = RouteCheckpoint(output_paths[to_station])
+        reused = checkpoint.seed_from_output() if reuse_outputs else 0
+        keys = checkpoint.completed_keys()
+        failed[to_station] = checkpoint.failed_keys() if reuse_outputs else set()
+        if reused:
+            print(f"{to_station}: 既存ファイルの経路を再利用します"
+                  f"（{reused} 件、取得できなかった経路 {len(failed[to_station])} 件）")
+        elif keys:
+            print(f"{to_station}: 途中経過から再開します（記録済み {len(keys)} 件）")
+        completed |= keys | failed[to_station]
+        checkpoints[to_station] = checkpoint
+
+    plan = RoutePlan(df, to_stations, completed, resolver=get_station_resolver())
+    plan.print_summary()
+
+    pairs = plan.pairs
+    results = {}
+    for checkpoint in checkpoints.values():
+        checkpoint.open()
+    try:
+        # 駅名の正規化を先に1駅1回ずつ済ませ、経路検索は一意なペアだけ行う
+        resolve_station_names(plan.names_to_resolve())
+        for idx, route_info in iter_route_results(pairs):
+            if route_info is None:
+                # 該当なしの応答だけを記録する（通信エラーなどは次回再試行する）
+                if is_course_answered(*pairs[idx]):
+                    for key in plan.pending[pairs[idx]]:
+                        failed.setdefault(key[2], set()).add(key)
+                continue
+            trans, minutes = route_info
+            for line, from_station, to_station in plan.pending[pairs[idx]]:
+                results[(line, from_station, to_station)] = route_info
+                tqdm.write(str([line, from_station, to_station, trans, minutes]))
+                if to_station in checkpoints:
+                    checkpoints[to_station].append(line, from_station, to_station, trans, minutes)
+    finally:
+        for checkpoint in checkpoints.values():
+            checkpoint.close()
+
+    out = {}
+    for to_station, keys in plan.keys_by_destination.items():
+        if to_station in checkpoints:
+            out[to_station] = checkpoints[to_station].finalize(key_order=keys, failed=failed[to_station])
+            continue
+        records = [[*key, *results[key]] for key in keys if key in results]
+        out[to_station] = pd.DataFrame(
+            records, columns=['line', 'from', 'to', 'trans', 'min'])
+
+    return out
 
-def calculate_min_route(df: pd.DataFrame, to_station: str) -> pd.DataFrame:
+
+def calculate_min_route(df: pd.DataFrame, to_station: str, output_path: str = None) -> pd.DataFrame:
     """
     駅一覧DataFrameから各駅->to_stationまでの最小乗り換え回数・所要時間を取得する。
+    calculate_routes の目的駅1つ版。
 
     Args:
         df: 駅一覧DataFrame (line, station, 列を含む)
         to_station: 目的地の駅名
+        output_path: 出力CSVパス（省略時はファイルに保存しない）
 
     Returns:
         pd.DataFrame: 経路情報DataFrame (line, from, to, trans, min列)
     """
-    records = []
-    for idx, row in df.iterrows():
-        from_station = row['station']
-        line = row['line']
-
-        # Ekispert呼び出し
-        route_info = get_minimum_route_info_between_stations(
-            from_station, to_station)
-        if route_info is None:
-            continue
-        trans, minutes = route_info
-        print([line, from_station, to_station, trans, minutes])
-        records.append([line, from_station, to_station, trans, minutes])
+    output_paths = {to_station: output_path} if output_path is not None else None
+    return calculate_routes(df, [to_station], output_paths)[to_station]
+
+
+def get_or_calculate_routes(
+    station_coord_price_df: pd.DataFrame,
+    output_paths: dict
+) -> dict:
+    """
+    複数の目的駅の経路情報を取得する。
+    既存ファイルの経路は再利用し、ファイルにない駅（新しい目的駅・駅マスタに追加された駅）の
+    経路だけをcalculate_routesでまとめて計算して、output_pathsに保存する。
 
-    out_df = pd.DataFrame(
-        records, columns=['line', 'from', 'to', 'trans', 'min'])
+    Args:
+        station_coord_price_df: 駅座標・価格情報のDataFrame
+        output_paths: {目的地の駅名: 出力ファイルパス}
 
-    return out_df
+    Returns:
+        dict: {目的地の駅名: 経路情報DataFrame}
+    """
+    return calculate_routes(station_coord_price_df, list(output_paths), output_paths, reuse_outputs=True)
 
 
 def get_or_calculate_route(
@@ -56,7 +155,8 @@ def get_or_calculate_route(
 ) -> pd.DataFrame:
     """
     経路情報を取得する。
-    既存ファイルがあれば読み込み、なければcalculate_min_routeで計算する。
+    既存ファイルがあれば読み込み、なければcalculate_min_routeで計算してoutput_pathに保存する。
+    計算途中の `.partial` ファイルがあれば続きから再開する。
 
     Args:
         station_coord_price_df: 駅座標・価格情報のDataFrame
@@ -68,10 +168,10 @@ def get_or_calculate_route(
     """
     if os.path.exists(output_path):
         print(f"{to_station}: 既存ファイルを読み込みました")
-        return pd.read_csv(output_path)
+        return read_table(output_path, 'calculated_routes')
     else:
         print(f"{to_station}: 経路情報を計算中...")
-        return calculate_min_route(station_coord_price_df, to_station)
+        return calculate_min_route(station_coord_price_df, to_station, output_path)
 
 
 def geocode_station(line: str, station: str) -> tuple:
@@ -79,6 +179,7 @@ def geocode_station(line: str, station: str) -> tuple:
     複数のクエリパターンで座標取得を試行する汎用的な関数。
 
     複数の検索パターンを順に試行することで、座標取得の成功率を向上させる。
+    結果はクエリごとにキャッシュされる（apis.google_maps）ため、各パターンのAPI呼び出しは一度きり。
 
     Args:
         line: 路線名 (例: "JR山手線")
@@ -88,7 +189,6 @@ def geocode_station(line: str, station: str) -> tuple:
         tuple: (lat, lng) 座標取得成功時、(None, None) 失敗時
     """
     from apis.google_maps import geocode_location
-    import time
 
     # 複数の検索クエリパターンを定義
     query_patterns = [
@@ -103,7 +203,6 @@ def geocode_station(line: str, station: str) -> tuple:
         lat, lng = geocode_location(query)
         if lat is not None and lng is not None:
             return (lat, lng)
-        time.sleep(0.5)  # 失敗時も少し待機
 
     return (None, None)
 
@@ -130,10 +229,16 @@ def make_station_master() -> pd.DataFrame:
     return df
 
 
-def make_rent_data() -> pd.DataFrame:
+def make_rent_data(refresh: bool = RENT_REFRESH) -> pd.DataFrame:
     """
     家賃相場データを作成する。
     既に存在する場合は既存ファイルから読み込む。
+    取得するときは RENT_ROOM_TYPES の部屋タイプを1回の巡回でまとめて取得し、縦持ちの表
+    price_by_station_long.csv と、まだない部屋タイプごとの price_by_station_{部屋タイプ}.csv を保存する。
+    refresh=True なら既存ファイルを差分で更新し、変更履歴を price_changes_{ROOM_TYPE}.csv に保存する。
+
+    Args:
+        refresh: 既存の家賃相場CSVを差分で更新するか（既定は環境変数 RENT_REFRESH=1 のとき）
 
     Returns:
         pd.DataFrame: 家賃相場DataFrame
@@ -141,11 +246,21 @@ def make_rent_data() -> pd.DataFrame:
     data_dir = "../data"
     station_price_csv = os.path.join(
         data_dir, "price_by_station", f"price_by_station_{ROOM_TYPE}.csv")
+    pref_list = ['tokyo', 'kanagawa', 'saitama', 'chiba']
 
     if not os.path.exists(station_price_csv):
-        print(f"[2] SUUMOから家賃相場({ROOM_TYPE})を取得...")
-        pref_list = ['tokyo', 'kanagawa', 'saitama', 'chiba']
-        scrape_suumo_rent(pref_list, station_price_csv, room_type=ROOM_TYPE)
+        room_types = list(dict.fromkeys([ROOM_TYPE] + RENT_ROOM_TYPES))
+        print(f"[2] SUUMOから家賃相場({', '.join(room_types)})を取得...")
+        long_df = scrape_suumo_rent_multi(
+            pref_list, os.path.join(data_dir, "price_by_station", "price_by_station_long.csv"), room_types)
+        for room_type in room_types:
+            room_type_csv = os.path.join(data_dir, "price_by_station", f"price_by_station_{room_type}.csv")
+            if room_type == ROOM_TYPE or not os.path.exists(room_type_csv):
+                select_room_type(long_df, room_type).to_csv(room_type_csv, index=False)
+    elif refresh:
+        print(f"[2] SUUMOの家賃相場({ROOM_TYPE})を差分で更新...")
+        changelog_csv = os.path.join(data_dir, "price_by_station", f"price_changes_{ROOM_TYPE}.csv")
+        refresh_suumo_rent(pref_list, station_price_csv, changelog_csv, room_type=ROOM_TYPE)
     else:
         print("[2] 家賃相場CSVが既に存在します:", station_price_csv)
 
@@ -160,6 +275,9 @@ def add_geocode_to_station_master(df: pd.DataFrame, output_csv: str) -> pd.DataF
 
     既存の座標データ（output_csv）があれば読み込んで活用し、
     座標がない駅だけ新規取得することでAPI使用量を節約する。
+    取得した座標は同じ路線・同じ駅名の行に反映し、他の路線の同名駅は前後の駅と整合する場合だけ使う
+    （整合しなければ別の駅とみなし、その路線で取得する）。
+    最後に座標の外れ値を除き、取得できなかった駅は路線内の補間で補完する（pipeline.station_coordinates）。
 
     Args:
         df: 駅マスタDataFrame (line, station列を含む)
@@ -168,7 +286,8 @@ def add_geocode_to_station_master(df: pd.DataFrame, output_csv: str) -> pd.DataF
     Returns:
         pd.DataFrame: 座標付き駅マスタDataFrame (line, station, lat, lng列を含む)
     """
-    import time
+    from apis.google_maps import get_request_count, get_cache_stats
+    from config import GOOGLE_MAPS_MAX_WORKERS
 
     # 駅マスタをコピー
     df_stations = df.copy()
@@ -180,7 +299,7 @@ def add_geocode_to_station_master(df: pd.DataFrame, output_csv: str) -> pd.DataF
         # 既存データと新データをマージ（既存データを優先）
         df_merged = pd.merge(
             df_stations,
-            df_existing,
+            df_existing[['line', 'station', 'lat', 'lng']],
             on=['line', 'station'],
             how='left'
         )
@@ -191,56 +310,90 @@ def add_geocode_to_station_master(df: pd.DataFrame, output_csv: str) -> pd.DataF
         df_merged['lng'] = None
 
     # 座標が欠損している駅を抽出
-    missing_coords = df_merged[df_merged['lat'].isna()]
-    missing_count = len(missing_coords)
+    missing = df_merged['lat'].isna()
+    missing_count = int(missing.sum())
 
     if missing_count == 0:
         print("[2] すべての駅に座標が付与されています")
-        return df_merged
+        return _impute_station_coordinates(df_merged)
 
     print(f"[2] 座標が欠損している駅: {missing_count}駅")
-    print(f"[2] Google Maps APIで座標を取得します...")
-
-    # 座標を取得
-    success_count = 0
-    for idx, row in missing_coords.iterrows():
-        line = row['line']
-        station = row['station']
 
-        # 複数パターンで座標取得を試行
-        lat, lng = geocode_station(line, station)
+    # 駅名のキー（表記違いを含む）と、路線と駅名の組のキー。同じ駅名でも路線が違えば別の駅のことがある（小川町、霞ケ関/霞ヶ関 など）
+    resolver = get_station_resolver()
+    station_keys = df_merged['station'].map(resolver.station_key).fillna(normalize_names(df_merged['station']))
+    pair_keys = normalize_names(df_merged['line']) + '\t' + station_keys
+    attempted = set()
+    total_targets = 0
+    total_success = 0
+
+    while True:
+        # 同じ駅名の座標が他の路線で分かっていれば、それを使う（API呼び出しなし）
+        # 同名の別の駅を拾わないよう、路線の前後の駅と整合するものだけ採用する
+        imputed = impute_coordinates(df_merged)
+        reuse = df_merged['lat'].isna() & (imputed['coord_source'] == SOURCE_SAME_NAME)
+        df_merged.loc[reuse, ['lat', 'lng']] = imputed.loc[reuse, ['lat', 'lng']]
+        if reuse.any():
+            print(f"[2] 他の路線の同じ駅名から座標を補完: {int(reuse.sum())}駅")
+
+        # 残りは駅名ごとに1回だけジオコーディングし、同じ路線・同じ駅名の行に反映する
+        # 他の路線の行は、次の周回で前後の駅と整合する場合だけ同じ駅名から補完し、整合しなければその路線で取得する
+        missing = df_merged['lat'].isna()
+        targets = df_merged.assign(key=station_keys, pair=pair_keys)[missing & ~pair_keys.isin(attempted)]
+        targets = targets.drop_duplicates(subset='key')[['line', 'station', 'pair']]
+        if targets.empty:
+            break
+        attempted.update(targets['pair'])
+
+        print(f"[2] Google Maps APIで座標を取得します: {len(targets)}駅名 ({int(missing.sum())}行)")
+        items = list(targets[['line', 'station']].itertuples(index=False, name=None))
+        pairs = targets['pair'].tolist()
+        coords = {}
+        for idx, result in iter_concurrent(
+                geocode_station, items, "ジオコーディング", GOOGLE_MAPS_MAX_WORKERS,
+                request_counter=get_request_count, cache_stats=get_cache_stats):
+            if result is not None and result[0] is not None:
+                coords[pairs[idx]] = result
+
+        resolved = missing & pair_keys.isin(coords)
+        df_merged.loc[resolved, 'lat'] = pair_keys[resolved].map(lambda k: coords[k][0])
+        df_merged.loc[resolved, 'lng'] = pair_keys[resolved].map(lambda k: coords[k][1])
+        total_targets += len(targets)
+        total_success += len(coords)
+
+    if total_targets == 0:
+        return _impute_station_coordinates(df_merged)
 
-        # DataFrameを更新
-        df_merged.loc[idx, 'lat'] = lat
-        df_merged.loc[idx, 'lng'] = lng
+    # 統計情報を表示
+    failed_count = total_targets - total_success
+    print(f"[2] 座標取得完了: 成功 {total_success}/{total_targets}駅名 "
+          f"({total_success/total_targets*100:.1f}%)")
+    if failed_count > 0:
+        print(f"    失敗した駅名が {failed_count}駅名 あります（路線内の補間で補完します）")
 
-        if lat is not None and lng is not None:
-            success_count += 1
+    return _impute_station_coordinates(df_merged)
 
-        # 進捗表示（10駅ごと）
-        current = success_count + (len(missing_coords) - missing_count + len(missing_coords[:idx + 1]))
-        if (current) % 10 == 0:
-            failed = current - success_count
-            print(f"    進捗: {current}/{missing_count} "
-                  f"(成功: {success_count}, 失敗: {failed})")
 
-        # API制限対策: 1秒待機
-        time.sleep(1)
+def _impute_station_coordinates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    座標の外れ値を除き、取得できなかった駅の座標を路線内の補間などで補完する（API呼び出しなし）。
 
-    # 統計情報を表示
-    failed_count = missing_count - success_count
-    print(f"[2] 座標取得完了: 成功 {success_count}/{missing_count} "
-          f"({success_count/missing_count*100:.1f}%)")
-    if failed_count > 0:
-        print(f"    失敗した駅が {failed_count}駅 あります")
+    Args:
+        df: 座標付き駅マスタDataFrame (line, station, lat, lng列を含む)
 
-    return df_merged
+    Returns:
+        pd.DataFrame: 補完後の座標付き駅マスタDataFrame（列は入力と同じ）
+    """
+    print("[2] 座標の外れ値の検出・オフライン補完...")
+    imputed = impute_coordinates(df)
+    print_imputation_summary(imputed)
+    return imputed.drop(columns=['coord_source', 'coord_flag'])
 
 
 def make_merged_data(station_df: pd.DataFrame, price_df: pd.DataFrame) -> pd.DataFrame:
     """
     駅マスタと家賃データをマージする。
-    路線名の表記揺れを正規化してからマージを行う。
+    路線名・駅名の表記揺れを正規化してからマージを行う（pipeline.station_resolver）。
 
     Args:
         station_df: 駅マスタDataFrame (line, station, lat, lng列を含む)
@@ -255,6 +408,8 @@ def make_merged_data(station_df: pd.DataFrame, price_df: pd.DataFrame) -> pd.Dat
 
     # 路線名を正規化（全角JR→半角、小田急線の分割など）
     price_df_normalized = normalize_line_names(price_df, station_df)
+    # 駅名・路線名の表記揺れ（新鎌ケ谷/新鎌ヶ谷、二重橋前/二重橋前〈丸の内〉など）を駅マスタの表記に揃える
+    price_df_normalized = get_station_resolver().canonicalize(price_df_normalized)
 
     # 駅マスタをベースに左結合（座標情報を保持）
     merged = pd.merge(station_df, price_df_normalized, on=['line', 'station'], how='left')
@@ -2,52 +2,199 @@
 """
 データパイプラインのメイン実行スクリプト
 
-駅データ、家賃データ、経路情報を取得・統合するパイプラインを実行する。
+駅マスタ → 座標 → 家賃 → マージ → 経路 → 経路行列・データベース → フロントエンド用マスター
+→ フィルタリング済みマスター の各ステージを、入力・出力・依存する設定値を宣言したDAGとして実行する（pipeline/runner.py）。
+入力の内容・設定値・処理が前回の実行から変わったステージだけを実行し、
+依存関係のないステージ（座標の付与・家賃の取得・経路計算）は並列に実行する。
 各処理の詳細はfunctions.pyに定義されている。
+
+使い方:
+    python make_base_data.py                    # 変更のあったステージを実行
+    python make_base_data.py --dry-run          # 実行計画だけを表示
+    python make_base_data.py --force routes     # 指定したステージを必ず実行（複数指定可）
 """
+import argparse
 import os
+import time
+
+import pandas as pd
+
+import functions
+import make_filtered_master
+import make_frontend_master
 from functions import (
-    make_station_master,
     add_geocode_to_station_master,
-    make_rent_data,
+    get_or_calculate_routes,
     make_merged_data,
-    get_or_calculate_route,
+    make_rent_data,
 )
-from config import ROOM_TYPE, WALK_MINUTES
+from config import (
+    ROOM_TYPE,
+    RENT_ROOM_TYPES,
+    RENT_REFRESH,
+    WALK_MINUTES,
+    ROUTE_MATRIX_DIR,
+    STATION_BBOX,
+    STATION_DB_PATH,
+    TO_TORANOMON_LIST,
+    TO_TOKYO_LIST,
+    TO_OTSUKA_LIST,
+)
+from pipeline import data_cleaning, route_matrix, station_coordinates, station_db, station_resolver, storage
+from pipeline.route_matrix import RouteMatrix
+from pipeline.runner import Pipeline, Stage
+from pipeline.station_db import build_station_db
+from pipeline.storage import write_table
+from scrapers import suumo_scraper, traveltowns_scraper
+from scrapers.traveltowns_scraper import scrape_traveltowns_kanto
+
+data_dir = "../data"
+
+STATION_ADDRESS_CSV = os.path.join(data_dir, "station_master", "station_address.csv")
+STATION_COORDS_CSV = os.path.join(data_dir, "station_master", "station_address_with_coordinates.csv")
+PRICE_CSV = os.path.join(data_dir, "price_by_station", f"price_by_station_{ROOM_TYPE}.csv")
+STATION_COORD_PRICE_CSV = os.path.join(data_dir, "station_coord_price", f"station_coord_price_{ROOM_TYPE}.csv")
+STATION_COORD_PRICE_DIR = os.path.join(data_dir, "station_coord_price")
+CALCULATED_ROUTES_DIR = os.path.join(data_dir, "calculated_routes")
+OFFICES = ['toranomon', 'tokyo', 'otsuka']
+FRONTEND_MASTER_CSVS = [
+    os.path.join(data_dir, "frontend_master", f"frontend_master_{office}_{ROOM_TYPE}.csv") for office in OFFICES
+]
+FILTERED_MASTER_CSV = os.path.join(
+    data_dir, "frontend_master", "filtered", f"filtered_master_toranomon_common_{ROOM_TYPE}.csv")
+
 
 # %%
-# データパイプラインのメイン処理
-# 各関数は入力としてDataFrameを受け取り、処理結果のDataFrameを返す
+# 各ステージの処理
+# ステージ間のデータの受け渡しはファイルで行う（実行しないステージの出力も次のステージで読めるように）
 
-data_dir = "../data"
+def station_master_stage():
+    # 1. 駅マスタを取得
+    print("[1] Traveltownsから駅マスタを取得...")
+    scrape_traveltowns_kanto(STATION_ADDRESS_CSV)
 
-# 1. 駅マスタを取得
-station_master_df = make_station_master()
 
-# 2. 座標を付与
-station_with_coords_df = add_geocode_to_station_master(
-    station_master_df,
-    os.path.join(data_dir, "station_master", "station_address_with_coordinates.csv")
-)
-station_with_coords_df.to_csv(
-    os.path.join(data_dir, "station_master", "station_address_with_coordinates.csv"),
-    index=False
-)
+def geocode_stage():
+    # 2. 座標を付与（既存の座標データがあれば、座標がない駅だけ取得する）
+    station_with_coords_df = add_geocode_to_station_master(pd.read_csv(STATION_ADDRESS_CSV), STATION_COORDS_CSV)
+    station_with_coords_df.to_csv(STATION_COORDS_CSV, index=False)
 
-# 3. 家賃データを取得
-rent_data_df = make_rent_data()
 
-# 4. マージ
-station_coord_price_df = make_merged_data(station_with_coords_df, rent_data_df)
-station_coord_price_df.to_csv(
-    os.path.join(data_dir, "station_coord_price", f"station_coord_price_{ROOM_TYPE}.csv"),
-    index=False
-)
+def rent_stage():
+    # 3. 家賃データを取得（既存のCSVがあれば差分で更新し、変更履歴を保存する）
+    make_rent_data(refresh=True)
+
+
+def merge_stage():
+    # 4. マージ
+    station_coord_price_df = make_merged_data(pd.read_csv(STATION_COORDS_CSV), pd.read_csv(PRICE_CSV))
+    write_table(station_coord_price_df, STATION_COORD_PRICE_CSV, 'station_coord_price')
+
+
+def routes_stage():
+    # 5. 各目的地駅への経路計算（経路は駅の (路線, 駅名) だけで決まるため、駅マスタから計算する）
+    # 既存の calculated_routes_{駅名}.csv の経路と、該当なしだったペア（.failed）は再利用し、
+    # どちらにもない (line, from, to)（目的駅の追加・駅マスタの再取得で増えた駅）だけをAPIで検索する
+    # （全件を計算し直すにはCSVを、該当なしだったペアを再試行するには .failed を削除する）
+    # 全目的地駅をまとめて計画し、一意な (from, to) ペアだけAPIで検索する（検索結果はキャッシュ済みなら再利用）
+    # 計算結果は1件ずつ追記保存され、完了時に calculated_routes_{駅名}.csv になる
+    route_output_paths = {
+        to_station: os.path.join(CALCULATED_ROUTES_DIR, f"calculated_routes_{to_station}.csv")
+        for to_station in WALK_MINUTES.keys()
+    }
+    get_or_calculate_routes(pd.read_csv(STATION_ADDRESS_CSV), route_output_paths)
+
+
+def route_matrix_stage():
+    # 6. 経路行列（出発駅 × 目的駅）を保存
+    matrix = RouteMatrix.from_csv_dir(CALCULATED_ROUTES_DIR)
+    matrix.save(ROUTE_MATRIX_DIR)
+    print(f"[6] 経路行列を保存しました: {matrix.minutes.shape[0]}駅 × {matrix.minutes.shape[1]}目的駅")
+
+
+def station_db_stage():
+    # 7. 駅・家賃・経路のデータベース（全部屋タイプの家賃を読み込む）
+    db = build_station_db(STATION_DB_PATH, STATION_COORDS_CSV, STATION_COORD_PRICE_DIR, CALCULATED_ROUTES_DIR)
+    counts = db.counts()
+    db.close()
+    print(f"[7] データベースを保存しました: 駅 {counts['stations']} 件, 家賃 {counts['prices']} 件, 経路 {counts['routes']} 件")
+
+
+def frontend_master_stage():
+    # 8. オフィスエリアごとのフロントエンド用マスターデータ
+    make_frontend_master.main()
+
+
+def filtered_master_stage():
+    # 9. 3エリア共通のフィルタリング済みマスターデータ
+    make_filtered_master.main()
+
+
+def build_pipeline() -> Pipeline:
+    """
+    パイプラインのステージ（入力・出力・依存する設定値・処理のコード）を定義する。
+    """
+    return Pipeline([
+        Stage('station_master', station_master_stage,
+              outputs=[STATION_ADDRESS_CSV],
+              code=[traveltowns_scraper], source=True),
+        Stage('geocode', geocode_stage,
+              inputs=[STATION_ADDRESS_CSV], outputs=[STATION_COORDS_CSV],
+              config={'STATION_BBOX': STATION_BBOX},
+              code=[functions.add_geocode_to_station_master, station_coordinates]),
+        Stage('rent', rent_stage,
+              outputs=[PRICE_CSV],
+              config={'ROOM_TYPE': ROOM_TYPE, 'RENT_ROOM_TYPES': RENT_ROOM_TYPES},
+              code=[functions.make_rent_data, suumo_scraper], source=True, volatile=RENT_REFRESH),
+        Stage('merge', merge_stage,
+              inputs=[STATION_COORDS_CSV, PRICE_CSV], outputs=[STATION_COORD_PRICE_CSV],
+              config={'ROOM_TYPE': ROOM_TYPE},
+              code=[functions.make_merged_data, data_cleaning, station_resolver, storage]),
+        Stage('routes', routes_stage,
+              inputs=[STATION_ADDRESS_CSV], outputs=[CALCULATED_ROUTES_DIR],
+              config={'WALK_MINUTES': sorted(WALK_MINUTES)},
+              code=[functions.calculate_routes, functions.get_or_calculate_routes], source=True),
+        Stage('route_matrix', route_matrix_stage,
+              inputs=[CALCULATED_ROUTES_DIR], outputs=[ROUTE_MATRIX_DIR],
+              code=[route_matrix]),
+        Stage('station_db', station_db_stage,
+              inputs=[STATION_COORDS_CSV, STATION_COORD_PRICE_DIR, CALCULATED_ROUTES_DIR],
+              outputs=[STATION_DB_PATH], after=['merge'],
+              code=[station_db, storage]),
+        Stage('frontend_master', frontend_master_stage,
+              inputs=[STATION_DB_PATH],
+              outputs=FRONTEND_MASTER_CSVS,
+              config={'ROOM_TYPE': ROOM_TYPE, 'WALK_MINUTES': WALK_MINUTES, 'TO_TORANOMON_LIST': TO_TORANOMON_LIST,
+                      'TO_TOKYO_LIST': TO_TOKYO_LIST, 'TO_OTSUKA_LIST': TO_OTSUKA_LIST},
+              code=[make_frontend_master, station_db, storage]),
+        Stage('filtered_master', filtered_master_stage,
+              inputs=[STATION_DB_PATH], outputs=[FILTERED_MASTER_CSV],
+              config={'ROOM_TYPE': ROOM_TYPE, 'WALK_MINUTES': WALK_MINUTES, 'TO_TORANOMON_LIST': TO_TORANOMON_LIST,
+                      'TO_TOKYO_LIST': TO_TOKYO_LIST, 'TO_OTSUKA_LIST': TO_OTSUKA_LIST},
+              code=[make_filtered_master, station_db, storage]),
+    ])
+
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="データパイプラインの実行")
+    parser.add_argument('--dry-run', action='store_true', help="実行せずに実行計画を表示する")
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE', help="必ず実行するステージ")
+    args = parser.parse_args()
+
+    pipeline = build_pipeline()
+    unknown = [name for name in args.force if name not in pipeline.stages]
+    if unknown:
+        parser.error(f"unknown stage: {', '.join(unknown)} (stages: {', '.join(pipeline.order)})")
+
+    pipeline.print_plan(args.force)
+    if args.dry_run:
+        return
+
+    start = time.perf_counter()
+    results = pipeline.run(args.force)
+    pipeline.print_report(results, time.perf_counter() - start)
+
 
-# 5. 各目的地駅への経路計算（既存ファイルがあればキャッシュから読み込み）
-for to_station in list(WALK_MINUTES.keys()):
-    output_path = os.path.join(
-        data_dir, "calculated_routes", f"calculated_routes_{to_station}.csv"
-    )
-    df = get_or_calculate_route(station_coord_price_df, to_station, output_path)
-    df.to_csv(output_path, index=False)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+経路計算結果の逐次保存（チェックポイント）と再開
+
+経路情報を1件取得するごとに `{output_path}.partial` へ追記し、
+全ペアの処理が終わったら出力ファイルへアトミックに置き換える。
+途中で停止（クラッシュ・APIクォータ切れなど）しても、次回は
+`.partial` に記録済みのペアをスキップして続きから再開できる。
+
+- ペアのキーは (line, from, to)
+- 1行ずつ書き込んでflushし、FSYNC_EVERY 行ごとにfsyncする
+- 書き込み途中で止まった末尾の不完全な行は、再開時に切り捨てる
+- 経路が取得できなかったペアは `.partial` に記録しない（計算が途中で止まった場合、再開時に再試行される）
+- 完了時に、経路が取得できなかったペアを `{output_path}.failed` に保存する
+- 既存の出力ファイルの経路を `.partial` に引き継げば（seed_from_output）、
+  出力ファイルにも `.failed` にもない経路だけを追加で計算できる。
+  取得できなかったペアを再試行するときは `.failed` を削除する
+"""
+import csv
+import os
+
+import pandas as pd
+
+from pipeline.storage import write_columnar
+
+ROUTE_COLUMNS = ['line', 'from', 'to', 'trans', 'min']
+
+# この行数ごとにfsyncする
+FSYNC_EVERY = 50
+
+
+def route_key(line: str, from_station: str, to_station: str) -> tuple:
+    """
+    経路1件を識別するキーを返す。
+    """
+    return (str(line), str(from_station), str(to_station))
+
+
+class RouteCheckpoint:
+    """
+    経路計算結果を `.partial` ファイルへ追記していくチェックポイント。
+    """
+
+    def __init__(self, output_path: str, fsync_every: int = FSYNC_EVERY):
+        self.output_path = output_path
+        self.partial_path = output_path + '.partial'
+        self.failed_path = output_path + '.failed'
+        self.fsync_every = fsync_every
+        self._file = None
+        self._writer = None
+        self._unsynced = 0
+
+    def _repair(self) -> None:
+        """
+        末尾の書きかけの行（改行で終わっていない行）を切り捨てる。
+        """
+        with open(self.partial_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def completed_keys(self) -> set:
+        """
+        `.partial` に記録済みのペアのキー集合を返す。
+        """
+        if not os.path.exists(self.partial_path):
+            return set()
+        self._repair()
+        df = pd.read_csv(self.partial_path, dtype={'line': str, 'from': str, 'to': str})
+        return {route_key(*row) for row in df[['line', 'from', 'to']].itertuples(index=False)}
+
+    def failed_keys(self) -> set:
+        """
+        前回までに経路が取得できなかったペア（`.failed`）のキー集合を返す。
+        """
+        if not os.path.exists(self.failed_path):
+            return set()
+        df = pd.read_csv(self.failed_path, dtype={'line': str, 'from': str, 'to': str})
+        return {route_key(*row) for row in df[['line', 'from', 'to']].itertuples(index=False)}
+
+    def seed_from_output(self) -> int:
+        """
+        既存の出力ファイルの経路を `.partial` に書き出し、記録済みとして扱う。
+        `.partial` が既にある（前回の計算が途中で止まった）場合は、その記録をそのまま使う。
+
+        Returns:
+            int: 引き継いだ経路の件数
+        """
+        if os.path.exists(self.partial_path) or not os.path.exists(self.output_path):
+            return 0
+        df = pd.read_csv(self.output_path, dtype={'line': str, 'from': str, 'to': str})
+        tmp_path = self.partial_path + '.tmp'
+        df[ROUTE_COLUMNS].to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.partial_path)
+        return len(df)
+
+    def open(self) -> None:
+        """
+        追記用に `.partial` を開く（新規作成時はヘッダを書く）。
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.partial_path)), exist_ok=True)
+        is_new = not os.path.exists(self.partial_path) or os.path.getsize(self.partial_path) == 0
+        if not is_new:
+            self._repair()
+        self._file = open(self.partial_path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if is_new:
+            self._writer.writerow(ROUTE_COLUMNS)
+            self._sync()
+
+    def append(self, line: str, from_station: str, to_station: str, trans: int, minutes: int) -> None:
+        """
+        経路1件を追記する。
+        """
+        self._writer.writerow([line, from_station, to_station, trans, minutes])
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def finalize(self, key_order: list = None, failed: set = None) -> pd.DataFrame:
+        """
+        `.partial` の内容を出力ファイルへアトミックに置き換え、DataFrameとして返す。
+
+        Args:
+            key_order: 出力の並び順を表すキーのリスト（省略時は追記順）。
+                指定した場合、含まれないキーの経路（駅マスタからなくなった駅など）は出力しない
+            failed: 経路が取得できなかったペアのキーの集合（`.failed` に保存する。省略時は `.failed` を変えない）
+
+        Returns:
+            pd.DataFrame: 経路情報DataFrame (line, from, to, trans, min列)
+        """
+        self.close()
+        if os.path.exists(self.partial_path):
+            self._repair()
+            df = pd.read_csv(self.partial_path, dtype={'line': str, 'from': str, 'to': str})
+        else:
+            df = pd.DataFrame(columns=ROUTE_COLUMNS)
+
+        # 念のため同一キーの重複を除く（最初に記録したものを採用）
+        df = df.drop_duplicates(subset=['line', 'from', 'to'], keep='first')
+
+        if key_order is not None:
+            position = {key: i for i, key in enumerate(dict.fromkeys(key_order))}
+            keys = [route_key(*row) for row in df[['line', 'from', 'to']].itertuples(index=False)]
+            df = df.assign(_order=[position.get(key, -1) for key in keys])
+            df = df[df['_order'] >= 0].sort_values('_order', kind='stable').drop(columns='_order')
+        df = df.reset_index(drop=True)
+
+        tmp_path = self.output_path + '.tmp'
+        df.to_csv(tmp_path, index=False)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.output_path)
+        write_columnar(df, self.output_path, 'calculated_routes')
+        if failed is not None:
+            self._write_failed(df, key_order, failed)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+        return df
+
+    def _write_failed(self, df: pd.DataFrame, key_order: list, failed: set) -> None:
+        """
+        経路が取得できなかったペアを `.failed` に保存する（経路が取得できたペア・key_order にないペアは除く）。
+        """
+        succeeded = {route_key(*row) for row in df[['line', 'from', 'to']].itertuples(index=False)}
+        keys = [key for key in (dict.fromkeys(key_order) if key_order is not None else sorted(failed))
+                if key in failed and key not in succeeded]
+        if not keys:
+            if os.path.exists(self.failed_path):
+                os.remove(self.failed_path)
+            return
+        tmp_path = self.failed_path + '.tmp'
+        pd.DataFrame(keys, columns=['line', 'from', 'to']).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.failed_path)
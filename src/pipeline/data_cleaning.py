@@ -66,6 +66,13 @@ LINE_NAME_MAPPING = {
     '箱根登山鉄道鋼索線': '箱根登山鉄道',
 }
 
+# 駅マスタに見つからない「小田急線」の駅の路線名
+DEFAULT_ODAKYU_LINE = '小田急小田原線'
+
+# 家賃データで千葉モノレール1号線になっている2号線の駅: 千葉、千葉公園、千城台など
+CHIBA_MONORAIL2_STATIONS = ['千葉', '千葉公園', '千城台', '千城台北', '小倉台', '桜木', '都賀', '作草部']
+
+
 def filter_station_data(input_csv: str, time_threshold: int, price_threshold: float, output_csv: str) -> None:
     """
     時間や家賃などの条件でデータをフィルタして出力する。
@@ -83,13 +90,11 @@ def add_walking_time(df: pd.DataFrame, walk_dict: dict, to_col='to', time_col='m
     目的地ごとに徒歩分数を加算して新列を返す。
     walk_dict: {'六本木': 7, ...} のような徒歩時間辞書
     df: ['to', 'min'] 列が入っているDataFrame
+    目的地の種類ごとに徒歩分数を引き、行へはインデックス配列で展開する（辞書にない目的地は0分）。
     """
-    walk_list = []
-    for dest in df[to_col]:
-        walk_min = walk_dict.get(dest, 0)
-        walk_list.append(walk_min)
-    walk_array = np.array(walk_list)
-    df[new_col] = walk_array + df[time_col].values
+    codes, destinations = pd.factorize(df[to_col], use_na_sentinel=False)
+    walk_by_destination = np.array([walk_dict.get(dest, 0) for dest in destinations])
+    df[new_col] = walk_by_destination[codes] + df[time_col].values
     return df
 
 
@@ -102,6 +107,9 @@ def normalize_odakyu_line(price_df: pd.DataFrame, station_df: pd.DataFrame) -> p
     - 小田急江ノ島線
     - 小田急多摩線
 
+    駅マスタの小田急の行から「駅名 → 最初に現れる小田急の路線名」の対応表を作り、map で置き換える。
+    駅マスタにない駅は小田急小田原線とする。
+
     Args:
         price_df: 家賃DataFrame (line, station, price)
         station_df: 駅マスタDataFrame (line, station, ...)
@@ -109,30 +117,17 @@ def normalize_odakyu_line(price_df: pd.DataFrame, station_df: pd.DataFrame) -> p
     Returns:
         路線名を修正した家賃DataFrame
     """
-    # 小田急線の駅を抽出
     odakyu_mask = price_df['line'] == '小田急線'
-    odakyu_stations = price_df[odakyu_mask]['station'].unique()
-
-    # 駅ごとに正しい路線名を特定
-    station_to_line = {}
-    for station in odakyu_stations:
-        # 駅マスタから該当駅の小田急路線を検索
-        matches = station_df[
-            (station_df['station'] == station) &
-            (station_df['line'].str.contains('小田急', na=False))
-        ]
-        if len(matches) > 0:
-            # 最初にマッチした小田急路線を使用
-            station_to_line[station] = matches.iloc[0]['line']
-        else:
-            # デフォルトは小田急小田原線
-            station_to_line[station] = '小田急小田原線'
-
-    # 駅名に基づいて路線名を更新
-    for idx in price_df[odakyu_mask].index:
-        station = price_df.loc[idx, 'station']
-        price_df.loc[idx, 'line'] = station_to_line.get(station, '小田急小田原線')
+    if not odakyu_mask.any():
+        return price_df
+
+    # 駅名ごとに最初にマッチした小田急路線
+    odakyu_rows = station_df[station_df['line'].str.contains('小田急', na=False)]
+    station_to_line = odakyu_rows.drop_duplicates(subset='station').set_index('station')['line']
 
+    price_df.loc[odakyu_mask, 'line'] = (
+        price_df.loc[odakyu_mask, 'station'].map(station_to_line).fillna(DEFAULT_ODAKYU_LINE)
+    )
     return price_df
 
 
@@ -150,19 +145,17 @@ def normalize_line_names(price_df: pd.DataFrame, station_df: pd.DataFrame) -> pd
     # DataFrameをコピー（元のデータを変更しない）
     df_normalized = price_df.copy()
 
-    # 1. LINE_NAME_MAPPINGで一括置換（JR全角→半角など）
-    df_normalized['line'] = df_normalized['line'].replace(LINE_NAME_MAPPING)
+    # 1. LINE_NAME_MAPPINGで一括置換（JR全角→半角など）。対応表にない路線名はそのまま
+    df_normalized['line'] = df_normalized['line'].map(LINE_NAME_MAPPING).fillna(df_normalized['line'])
 
     # 2. 小田急線の特別処理
     df_normalized = normalize_odakyu_line(df_normalized, station_df)
 
     # 3. 千葉モノレール2号線の駅を区別
-    # 2号線の駅リスト: 千葉、千葉公園、千城台など
-    monorail2_stations = ['千葉', '千葉公園', '千城台', '千城台北', '小倉台', '桜木', '都賀', '作草部']
     df_normalized.loc[
         (df_normalized['line'] == '千葉モノレール1号線') &
-        (df_normalized['station'].isin(monorail2_stations)),
+        (df_normalized['station'].isin(CHIBA_MONORAIL2_STATIONS)),
         'line'
     ] = '千葉モノレール2号線'
 
-    return df_normalized
\ No newline at end of file
+    return df_normalized
@@ -0,0 +1,108 @@
+"""
+Ekispert経路検索の並列実行エンジン
+
+(出発駅, 目的駅) のペアをスレッドプールで並列に検索する。
+API呼び出しのレート制限・コネクションの再利用は apis.ekispert 側で行い、
+ここでは同時に処理するタスク数を EKISPERT_MAX_WORKERS に制限する。
+汎用の iter_concurrent はジオコーディングなど他のAPIの並列実行にも使う。
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tqdm import tqdm
+
+from apis.ekispert import (
+    get_minimum_route_info_between_stations,
+    get_official_station_name,
+    get_request_count,
+    get_cache_stats
+)
+from config import EKISPERT_MAX_WORKERS
+
+
+def _safe_call(func, item):
+    try:
+        return func(*item)
+    except Exception as e:
+        tqdm.write(f"API呼び出しに失敗: {item}: {e}")
+        return None
+
+
+def iter_concurrent(func, items: list, desc: str, max_workers: int = EKISPERT_MAX_WORKERS,
+                    request_counter=get_request_count, cache_stats=get_cache_stats):
+    """
+    items の各要素（引数のタプル）で func を並列に呼び出し、完了した順に結果を返す。
+
+    実行中のタスク数は max_workers、待機中のタスクは max_workers * 2 までに制限する。
+    進捗バーにはAPIリクエストのスループット(req/s)を表示する。
+
+    Args:
+        func: 呼び出す関数
+        items: 引数のタプルのリスト
+        desc: 進捗バーの表示名
+        max_workers: 同時に処理するタスク数
+        request_counter: 送信済みリクエスト数を返す関数（既定はEkispert）
+        cache_stats: キャッシュのヒット・ミス回数を返す関数（既定はEkispert）
+
+    Yields:
+        tuple: (itemsのインデックス, funcの戻り値 or None)
+    """
+    items = list(items)
+    max_pending = max_workers * 2
+    start_time = time.monotonic()
+    start_requests = request_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            tqdm(total=len(items), desc=desc) as progress:
+        queue = iter(enumerate(items))
+        pending = {}
+
+        def fill():
+            for idx, item in queue:
+                pending[executor.submit(_safe_call, func, item)] = idx
+                if len(pending) >= max_pending:
+                    break
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = pending.pop(future)
+                yield idx, future.result()
+                progress.update(1)
+
+            elapsed = time.monotonic() - start_time
+            requests_sent = request_counter() - start_requests
+            progress.set_postfix(req_per_sec=f"{requests_sent / elapsed:.2f}" if elapsed > 0 else "-")
+            fill()
+
+    elapsed = time.monotonic() - start_time
+    requests_sent = request_counter() - start_requests
+    if elapsed > 0:
+        print(f"{desc}完了: {len(items)}件, {requests_sent}リクエスト, "
+              f"{elapsed:.1f}秒 ({requests_sent / elapsed:.2f} req/s)")
+    stats = cache_stats()
+    print(f"キャッシュ: ヒット {stats['memory_hits'] + stats['disk_hits']}"
+          f" (メモリ {stats['memory_hits']}, ディスク {stats['disk_hits']}),"
+          f" ミス {stats['misses']}, ヒット率 {stats['hit_rate'] * 100:.1f}%")
+
+
+def iter_route_results(pairs: list, max_workers: int = EKISPERT_MAX_WORKERS):
+    """
+    (from_station, to_station) のリストを並列に経路検索し、完了した順に結果を返す。
+
+    Yields:
+        tuple: (pairsのインデックス, (乗り換え回数, 所要時間) or None)
+    """
+    yield from iter_concurrent(get_minimum_route_info_between_stations, pairs, "経路検索", max_workers)
+
+
+def resolve_station_names(names: list, max_workers: int = EKISPERT_MAX_WORKERS) -> None:
+    """
+    駅名の正規化（駅名検索）を並列に実行し、結果をキャッシュに載せる。
+    経路検索の前に済ませておくことで、同じ駅名が複数スレッドから同時に検索されるのを防ぐ。
+    """
+    if not names:
+        return
+    for _ in iter_concurrent(get_official_station_name, [(name,) for name in names], "駅名検索", max_workers):
+        pass
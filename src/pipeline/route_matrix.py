@@ -0,0 +1,220 @@
+"""
+出発駅 × 目的駅の経路行列
+
+経路情報は目的駅ごとの calculated_routes_{駅名}.csv に分かれているが、
+Ekispertの結果は駅名のペア (from, to) だけで決まるため、駅IDを軸にした密な行列で持つ。
+
+- minutes: int16 (出発駅数, 目的駅数) 所要時間(分)
+- trans: int8 (出発駅数, 目的駅数) 乗り換え回数
+- missing: bool (出発駅数, 目的駅数) 経路がない（未計算・取得失敗・出発駅=目的駅）
+- 出発駅・目的駅はどちらも共通の駅ID（stations のインデックス）で表す
+
+保存形式はディレクトリに minutes.npy / trans.npy / missing.npy と index.json
+（駅名・目的駅ID・(路線, 駅ID) の行）を置く。.npy はメモリマップで読み込める。
+
+「オフィスごとの最寄り目的駅」や複数目的駅の最小値は、目的駅の軸に沿ったNumPyの縮約で求める。
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.checkpoint import ROUTE_COLUMNS
+from pipeline.transit_graph import load_calculated_routes
+
+ARRAY_NAMES = ('minutes', 'trans', 'missing')
+INDEX_FILENAME = 'index.json'
+
+
+def _merge_row_order(row_lists: list) -> list:
+    """
+    目的駅ごとの (路線, 駅) の並びを、それぞれの順序を保ったまま1つの並びにまとめる。
+    新しく現れた行は、その目的駅の並びで直前にある行のすぐ後ろに入れる。
+    """
+    merged = []
+    position = {}
+    for rows in row_lists:
+        previous = None
+        for row in rows:
+            if row not in position:
+                insert_at = position[previous] + 1 if previous is not None else len(merged)
+                merged.insert(insert_at, row)
+                position = {r: i for i, r in enumerate(merged)}
+            previous = row
+    return merged
+
+
+class RouteMatrix:
+    """
+    出発駅 × 目的駅の所要時間・乗り換え回数の行列。
+
+    Attributes:
+        stations: 駅名のリスト（インデックスが駅ID）
+        destination_ids: 各列の目的駅の駅ID
+        minutes, trans, missing: (駅数, 目的駅数) の配列
+        rows: 駅マスタの (路線, 駅ID) のリスト。calculated_routes 形式への書き出しに使う
+    """
+
+    def __init__(self, stations: list, destination_ids: np.ndarray, minutes: np.ndarray,
+                 trans: np.ndarray, missing: np.ndarray, rows: list):
+        self.stations = list(stations)
+        self.station_index = {name: i for i, name in enumerate(self.stations)}
+        self.destination_ids = np.asarray(destination_ids, dtype=np.int32)
+        self.column_index = {self.stations[s]: j for j, s in enumerate(self.destination_ids)}
+        self.minutes = minutes
+        self.trans = trans
+        self.missing = missing
+        self.rows = [(str(line), int(station_id)) for line, station_id in rows]
+
+    @property
+    def destinations(self) -> list:
+        return [self.stations[s] for s in self.destination_ids]
+
+    @classmethod
+    def from_route_df(cls, route_df: pd.DataFrame) -> 'RouteMatrix':
+        """
+        経路情報DataFrame（calculated_routes を縦に連結したもの）から行列を作る。
+
+        Args:
+            route_df: 経路情報DataFrame (line, from, to, trans, min列)
+        """
+        route_df = route_df.astype({'line': str, 'from': str, 'to': str})
+        destinations = list(dict.fromkeys(route_df['to']))
+        row_lists = [
+            list(dict.fromkeys(zip(group['line'], group['from'])))
+            for _, group in route_df.groupby('to', sort=False)
+        ]
+        row_keys = _merge_row_order(row_lists)
+
+        stations = list(dict.fromkeys([station for _, station in row_keys] + destinations))
+        station_index = {name: i for i, name in enumerate(stations)}
+
+        pairs = route_df.drop_duplicates(subset=['from', 'to'])
+        origin = pairs['from'].map(station_index).to_numpy()
+        column = pairs['to'].map({name: j for j, name in enumerate(destinations)}).to_numpy()
+
+        shape = (len(stations), len(destinations))
+        minutes = np.zeros(shape, dtype=np.int16)
+        trans = np.zeros(shape, dtype=np.int8)
+        missing = np.ones(shape, dtype=bool)
+        minutes[origin, column] = pairs['min'].to_numpy()
+        trans[origin, column] = pairs['trans'].to_numpy()
+        missing[origin, column] = False
+
+        return cls(stations, [station_index[name] for name in destinations], minutes, trans, missing,
+                   [(line, station_index[station]) for line, station in row_keys])
+
+    @classmethod
+    def from_csv_dir(cls, route_dir: str) -> 'RouteMatrix':
+        """
+        calculated_routes_{駅名}.csv をすべて読み込んで行列を作る。
+        """
+        return cls.from_route_df(load_calculated_routes(route_dir))
+
+    def save(self, matrix_dir: str) -> None:
+        """
+        行列をディレクトリに保存する（配列は .npy、駅名などは index.json）。
+        """
+        os.makedirs(matrix_dir, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(matrix_dir, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        index = {
+            'stations': self.stations,
+            'destination_ids': self.destination_ids.tolist(),
+            'rows': self.rows,
+        }
+        tmp_path = os.path.join(matrix_dir, INDEX_FILENAME + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(matrix_dir, INDEX_FILENAME))
+
+    @classmethod
+    def load(cls, matrix_dir: str, mmap: bool = True) -> 'RouteMatrix':
+        """
+        保存した行列を読み込む。mmap=True なら配列はメモリマップ（読み取り専用）になる。
+        """
+        with open(os.path.join(matrix_dir, INDEX_FILENAME), encoding='utf-8') as f:
+            index = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(matrix_dir, f"{name}.npy"), mmap_mode='r' if mmap else None)
+            for name in ARRAY_NAMES
+        }
+        return cls(index['stations'], index['destination_ids'], rows=index['rows'], **arrays)
+
+    @staticmethod
+    def exists(matrix_dir: str) -> bool:
+        return os.path.exists(os.path.join(matrix_dir, INDEX_FILENAME))
+
+    def columns(self, to_stations: list) -> np.ndarray:
+        """
+        目的駅名のリストを列インデックスに変換する。
+
+        Raises:
+            KeyError: 行列にない目的駅が含まれる場合
+        """
+        return np.array([self.column_index[name] for name in to_stations], dtype=np.int64)
+
+    def to_route_df(self, to_station: str) -> pd.DataFrame:
+        """
+        1つの目的駅の列を calculated_routes と同じ形式のDataFrameに書き出す。
+
+        Returns:
+            pd.DataFrame: 経路情報DataFrame (line, from, to, trans, min列)
+        """
+        j = self.column_index[to_station]
+        row_station_ids = np.array([station_id for _, station_id in self.rows], dtype=np.int64)
+        present = ~np.asarray(self.missing[row_station_ids, j])
+        lines = np.array([line for line, _ in self.rows], dtype=object)[present]
+        ids = row_station_ids[present]
+        return pd.DataFrame({
+            'line': lines,
+            'from': np.array(self.stations, dtype=object)[ids],
+            'to': to_station,
+            'trans': np.asarray(self.trans[ids, j]).astype(np.int64),
+            'min': np.asarray(self.minutes[ids, j]).astype(np.int64),
+        }, columns=ROUTE_COLUMNS)
+
+    def to_csv_dir(self, route_dir: str, to_stations: list = None) -> None:
+        """
+        目的駅ごとに calculated_routes_{駅名}.csv として書き出す。
+        """
+        os.makedirs(route_dir, exist_ok=True)
+        for to_station in to_stations or self.destinations:
+            path = os.path.join(route_dir, f"calculated_routes_{to_station}.csv")
+            self.to_route_df(to_station).to_csv(path, index=False)
+
+    def best_destination(self, to_stations: list, walk_minutes: dict = None) -> pd.DataFrame:
+        """
+        各出発駅について、to_stations のうち 所要時間 + 徒歩時間 が最小の目的駅を選ぶ。
+        同じ合計時間なら乗り換えが少ない方、それも同じなら to_stations で先の駅を選ぶ。
+
+        Args:
+            to_stations: 候補の目的駅名のリスト（例: オフィスエリアの駅）
+            walk_minutes: {目的駅名: 駅からオフィスまでの徒歩時間(分)}（省略時は0分）
+
+        Returns:
+            pd.DataFrame: from, to, trans, min, walk_min, total_min 列（経路がある出発駅のみ、駅ID順）
+        """
+        cols = self.columns(to_stations)
+        walk = np.array([(walk_minutes or {}).get(name, 0) for name in to_stations], dtype=np.int32)
+
+        minutes = np.asarray(self.minutes[:, cols], dtype=np.int32)
+        trans = np.asarray(self.trans[:, cols], dtype=np.int32)
+        missing = np.asarray(self.missing[:, cols])
+
+        # 合計時間 → 乗り換え回数 の順で比べるため、1つの整数キーにまとめる
+        total = minutes + walk
+        key = np.where(missing, np.iinfo(np.int64).max, total.astype(np.int64) * 256 + trans)
+        best = np.argmin(key, axis=1)
+        origin = np.flatnonzero(~missing.all(axis=1))
+        best = best[origin]
+
+        return pd.DataFrame({
+            'from': np.array(self.stations, dtype=object)[origin],
+            'to': np.array(to_stations, dtype=object)[best],
+            'trans': trans[origin, best],
+            'min': minutes[origin, best],
+            'walk_min': walk[best],
+            'total_min': total[origin, best],
+        })
@@ -0,0 +1,126 @@
+"""
+経路計算のクエリプランナー
+
+駅マスタは (路線, 駅) ごとに1行のため、乗換駅（新宿など）は路線の数だけ現れる。
+しかしEkispertの経路検索の結果は駅名のペア (from, to) だけで決まるため、
+全目的地 × 駅マスタの行を一意な (from, to) ペアにまとめ、
+キャッシュ済み・チェックポイント記録済みのものを除いてから検索する。
+解決器（pipeline.station_resolver）を渡した場合は、同じ駅の表記違い（市ケ谷/市ヶ谷、
+押上〈スカイツリー前〉/押上（スカイツリー前））も1つの駅名にまとめてから検索する。
+
+実行前に必要なAPI呼び出し回数（駅名検索 + 経路検索）を正確に数えて表示し、
+検索結果は元の全ての (line, from, to) 行に展開する。
+"""
+from collections import OrderedDict
+
+import pandas as pd
+
+from apis.ekispert import peek_official_station_name, is_course_cached
+from pipeline.checkpoint import route_key
+
+
+class RoutePlan:
+    """
+    一意な (from, to) ペアと、その結果を展開する先の行キーの対応を保持する。
+
+    Attributes:
+        keys_by_destination: {目的駅: その目的駅の行キー (line, from, to) のリスト（入力順）}
+        pending: {(from, to): 未計算の行キーのリスト}
+        total_rows: 全行数（目的駅 × 駅マスタ、重複行を除く）
+        completed_rows: チェックポイントに記録済みの行数
+    """
+
+    def __init__(self, station_df: pd.DataFrame, to_stations: list, completed: set = None, resolver=None):
+        completed = completed or set()
+        lines = station_df['line'].tolist()
+        stations = station_df['station'].tolist()
+
+        # 検索に使う駅名（解決器があれば同じ駅の表記を1つに揃える）
+        query_names = {}
+        if resolver is not None:
+            for name in dict.fromkeys(stations + list(to_stations)):
+                query_names[name] = resolver.resolve_station(name) or name
+
+        self.keys_by_destination = {}
+        self.pending = OrderedDict()
+        self.total_rows = 0
+        self.completed_rows = 0
+
+        for to_station in to_stations:
+            keys = list(dict.fromkeys(
+                route_key(line, station, to_station) for line, station in zip(lines, stations)
+            ))
+            self.keys_by_destination[to_station] = keys
+            self.total_rows += len(keys)
+            for key in keys:
+                if key in completed:
+                    self.completed_rows += 1
+                    continue
+                pair = (query_names.get(key[1], key[1]), query_names.get(key[2], key[2]))
+                self.pending.setdefault(pair, []).append(key)
+
+    @property
+    def pairs(self) -> list:
+        """
+        検索が必要な一意な (from, to) ペアのリスト。
+        """
+        return list(self.pending.keys())
+
+    def names_to_resolve(self) -> list:
+        """
+        駅名検索が必要な（キャッシュにない）駅名のリスト。
+        """
+        names = dict.fromkeys(name for pair in self.pending for name in pair)
+        return [name for name in names if not peek_official_station_name(name)[0]]
+
+    def count_api_calls(self) -> dict:
+        """
+        実行に必要なAPI呼び出し回数を数える（APIは呼ばない）。
+
+        経路検索のキャッシュキーは正規化後の駅名で決まるため、駅名検索がキャッシュにない
+        ペアはキャッシュ判定ができず、経路検索が必要なものとして数える。
+
+        Returns:
+            dict: name_lookups, course_searches, cached_pairs, total
+        """
+        official = {}
+        name_lookups = 0
+        for name in dict.fromkeys(name for pair in self.pending for name in pair):
+            hit, official_name = peek_official_station_name(name)
+            if hit:
+                official[name] = official_name or name
+            else:
+                name_lookups += 1
+
+        course_searches = 0
+        cached_pairs = 0
+        for from_station, to_station in self.pending:
+            if from_station in official and to_station in official \
+                    and is_course_cached(official[from_station], official[to_station]):
+                cached_pairs += 1
+            else:
+                course_searches += 1
+
+        return {
+            'name_lookups': name_lookups,
+            'course_searches': course_searches,
+            'cached_pairs': cached_pairs,
+            'total': name_lookups + course_searches
+        }
+
+    def print_summary(self) -> dict:
+        """
+        実行計画（行数・一意なペア数・API呼び出し回数）を表示する。
+
+        Returns:
+            dict: count_api_calls() の結果
+        """
+        calls = self.count_api_calls()
+        pending_rows = sum(len(keys) for keys in self.pending.values())
+        print("経路計算の実行計画:")
+        print(f"  目的駅: {len(self.keys_by_destination)} 駅")
+        print(f"  対象行: {self.total_rows} 行 (記録済み {self.completed_rows}, 未計算 {pending_rows})")
+        print(f"  一意な (from, to) ペア: {len(self.pending)} (うちキャッシュ済み {calls['cached_pairs']})")
+        print(f"  必要なAPI呼び出し: {calls['total']} 回 "
+              f"(駅名検索 {calls['name_lookups']}, 経路検索 {calls['course_searches']})")
+        return calls
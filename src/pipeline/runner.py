@@ -0,0 +1,318 @@
+"""
+データパイプラインの実行（ステージのDAG・フィンガープリントによる再実行の判定）
+
+各ステージは入力ファイル・出力ファイル・依存する設定値を宣言する。
+入力ファイルの内容のハッシュ・設定値・ステージの処理（と code に挙げた関数・モジュール）のソースコードから
+フィンガープリントを作り、
+前回の実行時（状態ファイル PIPELINE_STATE_PATH）と同じで出力も変わっていなければ実行しない。
+
+- 依存関係は、あるステージの入力が別のステージの出力であることから決まる（after で明示もできる）
+- 依存関係のないステージ（家賃の取得とジオコーディングなど）はスレッドで並列に実行する
+- 外部のサイト・APIから取得するステージ（source=True）は、実行記録がなく出力が既にあり、
+  上流のステージもこの回に実行していなければ、取得し直さずにその出力を採用する
+  （初回に全ページのスクレイピング・全経路の検索をし直さないため）。
+  出力が前回の実行後に手で変更された場合も、取得し直さずに変更後の出力を採用する
+- volatile=True のステージは毎回実行する（RENT_REFRESH=1 の家賃の差分更新など）
+- 失敗したステージの下流のステージは実行しない
+
+dry_run では実行せずに、ステージごとの判定（実行・スキップ・上流次第）と理由を表示する。
+"""
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import PIPELINE_STATE_PATH, PIPELINE_MAX_WORKERS
+
+# ステージの判定・結果
+RUN = 'run'
+SKIP = 'skip'
+ADOPT = 'adopt'        # 実行せず、既存の出力を採用して記録する
+MAYBE = 'maybe'        # dry_run: 上流のステージの出力が変われば実行する
+DONE = 'done'
+FAILED = 'failed'
+BLOCKED = 'blocked'    # 上流のステージが失敗したため実行しない
+
+
+class Stage:
+    """
+    パイプラインの1ステージ。
+
+    Attributes:
+        name: ステージ名
+        func: 処理（引数なし）
+        inputs: 入力ファイル・ディレクトリのパスのリスト
+        outputs: 出力ファイル・ディレクトリのパスのリスト
+        config: {設定名: 値}（値が変わったら再実行する）
+        code: フィンガープリントに含める関数・モジュールのリスト（変わったら再実行する）
+        after: 入出力の関係以外で先に実行するステージ名のリスト
+        source: 外部のサイト・APIから取得するステージか
+        volatile: 毎回実行するか
+    """
+
+    def __init__(self, name: str, func, inputs: list = None, outputs: list = None, config: dict = None,
+                 code: list = None, after: list = None, source: bool = False, volatile: bool = False):
+        self.name = name
+        self.func = func
+        self.inputs = [os.path.abspath(p) for p in inputs or []]
+        self.outputs = [os.path.abspath(p) for p in outputs or []]
+        self.config = config or {}
+        self.code = list(code or [])
+        self.after = list(after or [])
+        self.source = source
+        self.volatile = volatile
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_path(path: str) -> str or None:
+    """
+    ファイルの内容のハッシュを返す。ディレクトリは中のファイル（途中経過の .partial・.tmp を除く）の
+    相対パスと内容から1つのハッシュにする。存在しなければNone。
+
+    Args:
+        path: ファイルまたはディレクトリのパス
+
+    Returns:
+        str or None: SHA-256（16進）
+    """
+    if os.path.isfile(path):
+        return _hash_file(path)
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(('.partial', '.tmp')):
+                continue
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+            digest.update(_hash_file(file_path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def _load_state(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_state(path: str, state: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class Pipeline:
+    """
+    ステージのDAGを、フィンガープリントが変わったステージだけ依存順に（独立したものは並列に）実行する。
+    """
+
+    def __init__(self, stages: list, state_path: str = PIPELINE_STATE_PATH, max_workers: int = PIPELINE_MAX_WORKERS):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.max_workers = max_workers
+
+        producers = {}
+        for stage in stages:
+            for path in stage.outputs:
+                producers[path] = stage.name
+        self.upstream = {}
+        for stage in stages:
+            deps = [producers[p] for p in stage.inputs if p in producers and producers[p] != stage.name]
+            for name in stage.after:
+                if name not in self.stages:
+                    raise ValueError(f"Unknown stage in after: '{name}' ({stage.name})")
+            self.upstream[stage.name] = list(dict.fromkeys(deps + stage.after))
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list:
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle at stage '{name}'")
+            visiting.add(name)
+            for dep in self.upstream[name]:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def fingerprint(self, stage: Stage) -> str:
+        """
+        ステージの入力ファイルの内容・設定値・処理のソースコードから作るフィンガープリント。
+        """
+        code = hashlib.sha256()
+        for obj in [stage.func] + stage.code:
+            try:
+                code.update(inspect.getsource(obj).encode('utf-8'))
+            except (OSError, TypeError):
+                code.update(getattr(obj, '__qualname__', repr(obj)).encode('utf-8'))
+        payload = {
+            'inputs': {path: hash_path(path) for path in stage.inputs},
+            'config': stage.config,
+            'code': code.hexdigest(),
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, ensure_ascii=False, default=repr).encode('utf-8')
+        ).hexdigest()
+
+    def _decide(self, stage: Stage, state: dict, force: set, upstream_ran: bool = False) -> tuple:
+        """
+        ステージを実行するかを判定する（上流のステージは判定済み・実行済みとする）。
+        upstream_ran は上流のステージをこの回に実行したか（実行したら既存の出力は採用しない）。
+
+        Returns:
+            tuple: (RUN / SKIP / ADOPT, 理由)
+        """
+        if stage.name in force:
+            return RUN, "--force で指定"
+        if stage.volatile:
+            return RUN, "毎回実行するステージ"
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            return RUN, f"入力がありません: {', '.join(missing)}"
+        if any(not os.path.exists(path) for path in stage.outputs):
+            return RUN, "出力がありません"
+
+        previous = state.get(stage.name)
+        if previous is None:
+            if stage.source and not upstream_ran:
+                return ADOPT, "既存の出力を採用"
+            return RUN, "前回の実行記録がありません"
+        if previous['fingerprint'] != self.fingerprint(stage):
+            return RUN, "入力・設定・処理が変わりました"
+        if any(previous['outputs'].get(path) != hash_path(path) for path in stage.outputs):
+            if stage.source:
+                return ADOPT, "変更された出力を採用"
+            return RUN, "出力が前回の実行後に変更されました"
+        return SKIP, "変更なし"
+
+    def _record(self, stage: Stage, state: dict, seconds: float) -> None:
+        state[stage.name] = {
+            'fingerprint': self.fingerprint(stage),
+            'outputs': {path: hash_path(path) for path in stage.outputs},
+            'seconds': round(seconds, 3),
+            'finished_at': time.time(),
+        }
+        _save_state(self.state_path, state)
+
+    def plan(self, force: set = None) -> list:
+        """
+        実行せずに、ステージごとの判定を依存順に返す。
+        上流のステージが実行される場合、出力が変わるかは実行するまで分からないため MAYBE とする。
+
+        Returns:
+            list: [(ステージ名, RUN / SKIP / MAYBE, 理由)]
+        """
+        force = set(force or ())
+        state = _load_state(self.state_path)
+        decisions = {}
+        plan = []
+        for name in self.order:
+            stage = self.stages[name]
+            upstream_runs = [dep for dep in self.upstream[name] if decisions[dep] in (RUN, MAYBE)]
+            upstream_ran = any(decisions[dep] == RUN for dep in self.upstream[name])
+            decision, reason = self._decide(stage, state, force, upstream_ran)
+            if decision in (SKIP, ADOPT) and upstream_runs:
+                decision, reason = MAYBE, f"上流 ({', '.join(upstream_runs)}) の出力が変われば実行"
+            decisions[name] = decision
+            plan.append((name, decision, reason))
+        return plan
+
+    def print_plan(self, force: set = None) -> list:
+        plan = self.plan(force)
+        labels = {RUN: '実行', SKIP: 'スキップ', ADOPT: '採用', MAYBE: '上流次第'}
+        print("パイプラインの実行計画:")
+        for name, decision, reason in plan:
+            deps = self.upstream[name]
+            after = f" <- {', '.join(deps)}" if deps else ""
+            print(f"  {name:<18} {labels[decision]:<6} {reason}{after}")
+        return plan
+
+    def _run_stage(self, stage: Stage) -> float:
+        start = time.perf_counter()
+        stage.func()
+        return time.perf_counter() - start
+
+    def run(self, force: set = None) -> dict:
+        """
+        ステージを依存順に実行する。上流のステージがすべて終わったステージから、
+        max_workers 個まで並列に実行する。
+
+        Returns:
+            dict: {ステージ名: (結果 DONE / SKIP / FAILED / BLOCKED, 秒数, 理由)}
+        """
+        force = set(force or ())
+        state = _load_state(self.state_path)
+        results = {}
+        remaining = list(self.order)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while remaining or running:
+                for name in list(remaining):
+                    deps = self.upstream[name]
+                    if any(dep not in results for dep in deps):
+                        continue
+                    remaining.remove(name)
+                    stage = self.stages[name]
+                    failed = [dep for dep in deps if results[dep][0] in (FAILED, BLOCKED)]
+                    if failed:
+                        results[name] = (BLOCKED, 0.0, f"上流 ({', '.join(failed)}) が失敗")
+                        continue
+                    upstream_ran = any(results[dep][0] == DONE for dep in deps)
+                    decision, reason = self._decide(stage, state, force, upstream_ran)
+                    if decision == ADOPT:
+                        self._record(stage, state, 0.0)
+                    if decision in (SKIP, ADOPT):
+                        results[name] = (SKIP, 0.0, reason)
+                        continue
+                    print(f"\n=== {name}: 実行します（{reason}）===")
+                    running[executor.submit(self._run_stage, stage)] = (name, reason)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, reason = running.pop(future)
+                    try:
+                        seconds = future.result()
+                    except Exception as e:
+                        print(f"\n=== {name}: 失敗しました: {e!r} ===")
+                        results[name] = (FAILED, 0.0, repr(e))
+                        continue
+                    self._record(self.stages[name], state, seconds)
+                    results[name] = (DONE, seconds, reason)
+
+        return {name: results[name] for name in self.order}
+
+    def print_report(self, results: dict, wall_seconds: float = None) -> None:
+        """
+        ステージごとの結果と所要時間を表示する。
+        """
+        labels = {DONE: '実行', SKIP: 'スキップ', FAILED: '失敗', BLOCKED: '未実行'}
+        print("\nパイプラインの実行結果:")
+        for name, (status, seconds, reason) in results.items():
+            print(f"  {name:<18} {labels[status]:<6} {seconds:>9.1f}秒  {reason}")
+        total = sum(seconds for _, seconds, _ in results.values())
+        print(f"  ステージの合計: {total:.1f}秒" + (f", 経過時間: {wall_seconds:.1f}秒" if wall_seconds is not None else ""))
@@ -0,0 +1,177 @@
+"""
+駅座標のオフライン補完と外れ値の検出
+
+ジオコーディングで座標が取れなかった駅・誤った座標の駅を、APIを呼ばずに補完する。
+駅マスタ全体（station_address_with_coordinates.csv）をまとめてベクトル演算で処理する。
+
+1. 外れ値の検出: (0, 0)・関東の範囲（STATION_BBOX）の外・同じ路線の両隣の駅から飛び離れた座標
+2. 同じ駅名の補完: 他の路線で分かっている同じ駅名の座標（中央値）を使う。
+   同名の別の駅を拾わないよう、路線の前後の駅と整合する場合だけ採用する
+3. 路線内の補間: 路線の駅の並び（seq列、なければ行の順）で前後の座標が分かっている駅の間を線形補間する
+4. どちらでも補完できなかった外れ値の駅（路線の端の駅など）は駅名を表示する。
+   (0, 0)・範囲外の座標は明らかに誤りなので欠損値にし、
+   両隣から離れているだけの座標（far_from_line）は元の座標のまま残す
+
+結果の coord_source 列は geocode / same_name / interpolated / kept（補完できず元の座標のまま残した外れ値）/
+dropped（補完できず欠損値にした外れ値）/ missing（元から座標なし）、
+coord_flag 列は外れ値として除いた理由（zero / out_of_bbox / far_from_line、なければ空文字）。
+"""
+import numpy as np
+import pandas as pd
+
+from config import STATION_BBOX
+from pipeline.transit_graph import MAX_SEGMENT_RATIO, haversine_km
+
+SOURCE_GEOCODE = 'geocode'
+SOURCE_SAME_NAME = 'same_name'
+SOURCE_INTERPOLATED = 'interpolated'
+SOURCE_KEPT = 'kept'
+SOURCE_DROPPED = 'dropped'
+SOURCE_MISSING = 'missing'
+
+
+def _line_order(df: pd.DataFrame) -> np.ndarray:
+    """
+    路線ごとに駅の並び順に並べたときの行の位置（seq列があればそれを使う）。
+    """
+    if 'seq' in df.columns:
+        return np.lexsort((np.arange(len(df)), df['seq'].to_numpy(), df['line'].to_numpy()))
+    return np.argsort(pd.factorize(df['line'])[0], kind='stable')
+
+
+def _neighbour_coords(lines: pd.Series, lat: pd.Series, lng: pd.Series, pos: pd.Series) -> tuple:
+    """
+    各駅について、同じ路線で座標が分かっている直前・直後の駅の (lat, lng, 位置) を返す。
+    自分自身は含めない。
+    """
+    known = pd.DataFrame({'lat': lat, 'lng': lng, 'pos': pos.where(lat.notna())})
+    grouped = known.groupby(lines.to_numpy(), sort=False)
+    prev = grouped.shift(1)
+    prev = prev.groupby(lines.to_numpy(), sort=False).ffill()
+    following = grouped.shift(-1)
+    following = following.groupby(lines.to_numpy(), sort=False).bfill()
+    return prev, following
+
+
+def _line_median_km(lines: pd.Series, lat: pd.Series, lng: pd.Series, prev: pd.DataFrame) -> np.ndarray:
+    """
+    各駅の路線の区間距離(km)の中央値（座標が分かっている隣り合う駅どうし）。
+    """
+    segment_km = pd.Series(haversine_km(prev['lat'], prev['lng'], lat, lng), index=lat.index)
+    return segment_km.groupby(lines.to_numpy(), sort=False).transform('median').to_numpy()
+
+
+def _segment_limit(prev: pd.DataFrame, following: pd.DataFrame, line_median_km: np.ndarray) -> np.ndarray:
+    """
+    前後の駅との距離の許容値(km)。前後の駅どうしの距離と路線の区間距離の中央値の大きい方の MAX_SEGMENT_RATIO 倍。
+    """
+    span_km = haversine_km(prev['lat'], prev['lng'], following['lat'], following['lng'])
+    return np.fmax(np.asarray(span_km), line_median_km) * MAX_SEGMENT_RATIO
+
+
+def flag_coordinate_outliers(df: pd.DataFrame) -> pd.Series:
+    """
+    使えない座標の理由を返す（路線の駅の並びで並べたDataFrameを渡す）。
+
+    Returns:
+        pd.Series: zero / out_of_bbox / far_from_line、問題なければ空文字
+    """
+    lat, lng = df['lat'].astype(float), df['lng'].astype(float)
+    flag = pd.Series('', index=df.index, dtype=object)
+
+    zero = (lat == 0) & (lng == 0)
+    (lat_min, lat_max), (lng_min, lng_max) = STATION_BBOX['lat'], STATION_BBOX['lng']
+    outside = lat.notna() & ~zero & ~(lat.between(lat_min, lat_max) & lng.between(lng_min, lng_max))
+    flag[zero] = 'zero'
+    flag[outside] = 'out_of_bbox'
+
+    # 範囲内の座標だけで両隣を見て、どちらからも大きく離れている駅を外れ値とする（路線の端の駅は判定しない）
+    usable = lat.notna() & (flag == '')
+    lat, lng = lat.where(usable), lng.where(usable)
+    pos = pd.Series(np.arange(len(df)), index=df.index)
+    prev, following = _neighbour_coords(df['line'], lat, lng, pos)
+    limit = _segment_limit(prev, following, _line_median_km(df['line'], lat, lng, prev))
+    prev_km = haversine_km(prev['lat'], prev['lng'], lat, lng)
+    next_km = haversine_km(lat, lng, following['lat'], following['lng'])
+    far = usable & (prev_km > limit) & (next_km > limit)
+    flag[far] = 'far_from_line'
+    return flag
+
+
+def impute_coordinates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    外れ値を除き、欠損した座標を同じ駅名・路線内の補間で補完する。
+    どちらでも補完できなかった外れ値の駅は、far_from_line なら元の座標のまま残し（coord_source は kept）、
+    zero / out_of_bbox なら欠損値にする（coord_source は dropped）。
+
+    Args:
+        df: 駅マスタDataFrame (line, station, lat, lng列を含む。seq列があれば駅の並びに使う)
+
+    Returns:
+        pd.DataFrame: lat, lng を補完し、coord_source・coord_flag 列を加えたDataFrame（行の順は元のまま）
+    """
+    order = _line_order(df)
+    ordered = df.iloc[order].reset_index(drop=True)
+    ordered['lat'] = pd.to_numeric(ordered['lat'], errors='coerce')
+    ordered['lng'] = pd.to_numeric(ordered['lng'], errors='coerce')
+    lines = ordered['line']
+    pos = pd.Series(np.arange(len(ordered)), index=ordered.index)
+
+    flag = flag_coordinate_outliers(ordered)
+    usable = ordered['lat'].notna() & ordered['lng'].notna() & (flag == '')
+    lat, lng = ordered['lat'].where(usable), ordered['lng'].where(usable)
+    source = pd.Series(np.where(usable, SOURCE_GEOCODE, SOURCE_MISSING), index=ordered.index, dtype=object)
+
+    # 1. 同じ駅名の座標（他の路線の使える座標の中央値）。前後の駅と整合する場合だけ採用
+    by_name = pd.DataFrame({'lat': lat, 'lng': lng}).groupby(ordered['station'].to_numpy()).median()
+    candidate_lat = ordered['station'].map(by_name['lat']).where(~usable)
+    candidate_lng = ordered['station'].map(by_name['lng']).where(~usable)
+    prev, following = _neighbour_coords(lines, lat, lng, pos)
+    limit = _segment_limit(prev, following, _line_median_km(lines, lat, lng, prev))
+    prev_km = haversine_km(prev['lat'], prev['lng'], candidate_lat, candidate_lng)
+    next_km = haversine_km(candidate_lat, candidate_lng, following['lat'], following['lng'])
+    consistent = ~(prev_km > limit) & ~(next_km > limit)
+    reuse = candidate_lat.notna() & consistent
+    lat, lng = lat.where(~reuse, candidate_lat), lng.where(~reuse, candidate_lng)
+    source[reuse] = SOURCE_SAME_NAME
+
+    # 2. 路線内で前後の座標が分かっている駅の間を、駅の並びの位置で線形補間
+    prev, following = _neighbour_coords(lines, lat, lng, pos)
+    ratio = (pos - prev['pos']) / (following['pos'] - prev['pos'])
+    interpolate = lat.isna() & ratio.notna()
+    lat = lat.where(~interpolate, prev['lat'] + (following['lat'] - prev['lat']) * ratio)
+    lng = lng.where(~interpolate, prev['lng'] + (following['lng'] - prev['lng']) * ratio)
+    source[interpolate] = SOURCE_INTERPOLATED
+
+    # 3. 補完できなかった外れ値: 両隣から離れているだけなら元の座標に戻し、(0, 0)・範囲外は欠損値のままにする
+    unresolved = lat.isna() & ordered['lat'].notna() & ordered['lng'].notna()
+    keep = unresolved & (flag == 'far_from_line')
+    lat, lng = lat.where(~keep, ordered['lat']), lng.where(~keep, ordered['lng'])
+    source[keep] = SOURCE_KEPT
+    source[unresolved & ~keep] = SOURCE_DROPPED
+
+    ordered = ordered.assign(lat=lat, lng=lng, coord_source=source, coord_flag=flag)
+    result = ordered.iloc[np.argsort(order)]
+    result.index = df.index
+    return result
+
+
+def print_imputation_summary(df: pd.DataFrame) -> None:
+    """
+    impute_coordinates の結果の件数（補完方法・外れ値の理由ごと）を表示する。
+    """
+    counts = df['coord_source'].value_counts()
+    flags = df.loc[df['coord_flag'] != '', 'coord_flag'].value_counts()
+    print(f"  ジオコーディング: {counts.get(SOURCE_GEOCODE, 0)}駅, "
+          f"同じ駅名から補完: {counts.get(SOURCE_SAME_NAME, 0)}駅, "
+          f"路線内で補間: {counts.get(SOURCE_INTERPOLATED, 0)}駅, "
+          f"座標なし: {counts.get(SOURCE_MISSING, 0)}駅")
+    if not flags.empty:
+        print("  外れ値として除いた座標: " + ", ".join(f"{name} {count}駅" for name, count in flags.items()))
+    for source, label in ((SOURCE_KEPT, '元の座標のまま残した'), (SOURCE_DROPPED, '欠損値にした')):
+        unresolved = df[df['coord_source'] == source]
+        if unresolved.empty:
+            continue
+        print(f"  補完できず{label}外れ値: {len(unresolved)}駅")
+        for line, station, flag in unresolved[['line', 'station', 'coord_flag']].itertuples(index=False):
+            print(f"    {line} {station} ({flag})")
@@ -0,0 +1,438 @@
+"""
+駅・家賃・経路の組み込みデータベース（SQLite）
+
+駅の座標（station_address_with_coordinates.csv）・家賃（station_coord_price_{部屋タイプ}.csv）・
+経路（calculated_routes_{駅名}.csv）を1つのSQLiteファイルにまとめ、整数の駅IDで結びつける。
+フロントエンド用マスター・フィルタリング済みマスターは、CSVの全件読み込みとpandasの結合の代わりに
+インデックスを使ったクエリで作る。
+
+テーブル:
+    stations (id, line, name, line_key, name_key, lat, lng)
+        駅マスタの (路線, 駅) ごとに1行。id は駅マスタの順。
+        line_key / name_key は正規化したキー（pipeline.station_resolver.normalize_name）
+    prices (room_type, station_id, price)
+    sources (path, mtime_ns, size)
+        データベースを作った元のファイル（ディレクトリ名/ファイル名）
+    routes (to_id, from_id, trans, min)
+        from_id は (路線, 駅) の行、to_id は目的駅（同じ駅名の最初の行）
+
+家賃・経路の (路線, 駅名) は、正規化したキーの完全一致 → 駅名だけの一致（最初の行）の順に駅IDに解決する
+（ベンチマークで比べる旧実装のpandasの結合 bench_legacy.add_location_and_price_info と同じ規則）。
+どちらでも解決できない駅は、座標のない駅として stations に追加する。
+
+作ったときの元のファイル（CSV・列指向ファイル）の更新時刻とサイズを sources に保存し、
+open_station_db は元のファイルが変わっていればデータベースを作り直す。
+
+目的駅の徒歩時間（WALK_MINUTES）やフィルタの条件はクエリのパラメータとして渡すため、
+設定を変えてもデータベースを作り直す必要はない。
+"""
+import glob
+import os
+import re
+import sqlite3
+
+import pandas as pd
+
+from config import STATION_DB_PATH
+from pipeline.station_resolver import normalize_name, normalize_names
+from pipeline.storage import FORMATS, columnar_path, read_table
+from pipeline.transit_graph import load_calculated_routes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    id INTEGER PRIMARY KEY,
+    line TEXT NOT NULL,
+    name TEXT NOT NULL,
+    line_key TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    lat REAL,
+    lng REAL,
+    UNIQUE (line, name)
+);
+CREATE INDEX IF NOT EXISTS stations_key ON stations (line_key, name_key);
+CREATE INDEX IF NOT EXISTS stations_name_key ON stations (name_key);
+
+CREATE TABLE IF NOT EXISTS prices (
+    room_type TEXT NOT NULL,
+    station_id INTEGER NOT NULL REFERENCES stations (id),
+    price REAL,
+    PRIMARY KEY (room_type, station_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS routes (
+    to_id INTEGER NOT NULL REFERENCES stations (id),
+    from_id INTEGER NOT NULL REFERENCES stations (id),
+    trans INTEGER NOT NULL,
+    min INTEGER NOT NULL,
+    PRIMARY KEY (to_id, from_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS routes_from ON routes (from_id);
+
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# 家賃・経路の (路線, 駅名) を駅IDに解決する（正規化したキーの完全一致 → 駅名だけの一致）
+_RESOLVE_ID = """
+COALESCE(
+    (SELECT id FROM stations WHERE line_key = {line_key} AND name_key = {name_key}),
+    (SELECT MIN(id) FROM stations WHERE name_key = {name_key})
+)
+"""
+
+_ROOM_TYPE_FROM_FILENAME = re.compile(r'station_coord_price_(.+)\.csv$')
+
+
+def source_files(station_csv: str, station_coord_price_dir: str, route_dir: str) -> dict:
+    """
+    データベースの元のファイル（CSVと、あれば列指向ファイル）の更新時刻とサイズ。
+
+    Returns:
+        dict: {ディレクトリ名/ファイル名: (mtime_ns, size)}
+    """
+    csv_paths = [station_csv]
+    csv_paths += sorted(glob.glob(os.path.join(station_coord_price_dir, "station_coord_price_*.csv")))
+    csv_paths += sorted(glob.glob(os.path.join(route_dir, "calculated_routes_*.csv")))
+    result = {}
+    for csv_path in csv_paths:
+        for path in [csv_path] + [columnar_path(csv_path, fmt) for fmt in FORMATS]:
+            if os.path.exists(path):
+                stat = os.stat(path)
+                name = os.path.basename(os.path.dirname(os.path.abspath(path))) + '/' + os.path.basename(path)
+                result[name] = (stat.st_mtime_ns, stat.st_size)
+    return result
+
+
+def _values(rows: list) -> tuple:
+    """
+    行のリストを VALUES 句（プレースホルダ）とパラメータにする。
+    """
+    placeholders = ', '.join('(' + ', '.join('?' * len(row)) + ')' for row in rows)
+    return placeholders, [value for row in rows for value in row]
+
+
+class StationDB:
+    """
+    駅・家賃・経路のSQLiteデータベース。
+
+    Attributes:
+        db_path: データベースファイルのパス
+    """
+
+    def __init__(self, db_path: str = STATION_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> 'StationDB':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # 読み込み
+    # ------------------------------------------------------------------
+
+    def load_stations(self, station_df: pd.DataFrame) -> None:
+        """
+        駅マスタ（line, station, lat, lng列）を stations に読み込む（既存の (路線, 駅) は上書き）。
+        """
+        rows = zip(
+            station_df['line'].tolist(),
+            station_df['station'].tolist(),
+            normalize_names(station_df['line']).tolist(),
+            normalize_names(station_df['station']).tolist(),
+            station_df['lat'].astype(float).tolist(),
+            station_df['lng'].astype(float).tolist(),
+        )
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO stations (line, name, line_key, name_key, lat, lng) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (line, name) DO UPDATE SET lat = excluded.lat, lng = excluded.lng",
+                ((line, name, line_key, name_key, None if lat != lat else lat, None if lng != lng else lng)
+                 for line, name, line_key, name_key, lat, lng in rows)
+            )
+
+    def _stage(self, table: str, df: pd.DataFrame, name_columns: dict, value_columns: list) -> None:
+        """
+        DataFrameを一時テーブルに入れる。行の順は pos 列に残す。
+
+        Args:
+            table: 一時テーブル名
+            df: DataFrame
+            name_columns: {DataFrameの列: 一時テーブルの列}。路線名・駅名の列で、
+                正規化したキーの列（{一時テーブルの列}_key）も追加する
+            value_columns: そのまま入れる列
+        """
+        columns = {'pos': range(len(df))}
+        for column, name in name_columns.items():
+            columns[name] = df[column].astype(str).tolist()
+            columns[f"{name}_key"] = normalize_names(df[column].astype(str)).tolist()
+        for column in value_columns:
+            columns[column] = [None if value != value else value for value in df[column].tolist()]
+
+        names = list(columns)
+        self._conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        self._conn.execute(f"CREATE TEMP TABLE {table} ({', '.join(names)})")
+        self._conn.executemany(
+            f"INSERT INTO temp.{table} VALUES ({', '.join('?' * len(names))})", zip(*columns.values())
+        )
+
+    def _add_unresolved_stations(self, table: str, line_col: str, name_col: str) -> None:
+        """
+        一時テーブルの (路線, 駅名) のうち駅IDに解決できないものを、座標のない駅として追加する。
+        """
+        self._conn.execute(
+            f"INSERT OR IGNORE INTO stations (line, name, line_key, name_key)"
+            f" SELECT {line_col}, {name_col}, {line_col}_key, {name_col}_key FROM temp.{table} AS s"
+            f" WHERE NOT EXISTS (SELECT 1 FROM stations WHERE name_key = s.{name_col}_key)"
+            f" ORDER BY pos"
+        )
+
+    def load_prices(self, price_df: pd.DataFrame, room_type: str) -> None:
+        """
+        部屋タイプの家賃（line, station, price列）を prices に読み込む（その部屋タイプの既存の行は置き換える）。
+        同じ駅に解決される行が複数あれば最初の行を使う。
+        """
+        with self._conn:
+            self._stage('staging_prices', price_df, {'line': 'line', 'station': 'station'}, ['price'])
+            self._add_unresolved_stations('staging_prices', 'line', 'station')
+            self._conn.execute("DELETE FROM prices WHERE room_type = ?", (room_type,))
+            resolve = _RESOLVE_ID.format(line_key='s.line_key', name_key='s.station_key')
+            self._conn.execute(
+                f"INSERT OR IGNORE INTO prices (room_type, station_id, price)"
+                f" SELECT ?, {resolve}, s.price FROM temp.staging_prices AS s ORDER BY s.pos",
+                (room_type,)
+            )
+            self._conn.execute("DROP TABLE temp.staging_prices")
+
+    def load_routes(self, route_df: pd.DataFrame) -> None:
+        """
+        経路（line, from, to, trans, min列）を routes に読み込む（同じ目的駅の既存の行は置き換える）。
+        同じ (出発駅, 目的駅) に解決される行が複数あれば最初の行を使う。
+        """
+        with self._conn:
+            self._stage('staging_routes', route_df,
+                        {'line': 'line', 'from': 'from_name', 'to': 'to_name'}, ['trans', 'min'])
+            self._add_unresolved_stations('staging_routes', 'line', 'from_name')
+            # 目的駅は駅名だけで解決する（駅マスタにない目的駅は路線名なしで追加）
+            self._conn.execute(
+                "INSERT OR IGNORE INTO stations (line, name, line_key, name_key)"
+                " SELECT '', to_name, '', to_name_key FROM temp.staging_routes AS s"
+                " WHERE NOT EXISTS (SELECT 1 FROM stations WHERE name_key = s.to_name_key)"
+                " ORDER BY pos"
+            )
+            to_id = "(SELECT MIN(id) FROM stations WHERE name_key = s.to_name_key)"
+            self._conn.execute(f"DELETE FROM routes WHERE to_id IN (SELECT {to_id} FROM temp.staging_routes AS s)")
+            resolve = _RESOLVE_ID.format(line_key='s.line_key', name_key='s.from_name_key')
+            self._conn.execute(
+                f"INSERT OR IGNORE INTO routes (to_id, from_id, trans, min)"
+                f" SELECT {to_id}, {resolve}, s.trans, s.min FROM temp.staging_routes AS s ORDER BY s.pos"
+            )
+            self._conn.execute("DROP TABLE temp.staging_routes")
+
+    # ------------------------------------------------------------------
+    # クエリ
+    # ------------------------------------------------------------------
+
+    def analyze(self) -> None:
+        """
+        クエリプランナー用の統計情報を更新する（読み込みの後に1回実行する）。
+        """
+        self._conn.execute("ANALYZE")
+
+    def counts(self) -> dict:
+        """
+        テーブルごとの行数。
+        """
+        return {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('stations', 'prices', 'routes')}
+
+    def room_types(self) -> list:
+        """
+        家賃がある部屋タイプのリスト。
+        """
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT room_type FROM prices ORDER BY room_type")]
+
+    def sources(self) -> dict:
+        """
+        データベースを作った元のファイルの更新時刻とサイズ（source_files と同じ形式）。
+        """
+        return {path: (mtime_ns, size)
+                for path, mtime_ns, size in self._conn.execute("SELECT path, mtime_ns, size FROM sources")}
+
+    def set_sources(self, sources: dict) -> None:
+        """
+        元のファイルの更新時刻とサイズを保存する（source_files の結果を渡す）。
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM sources")
+            self._conn.executemany("INSERT INTO sources (path, mtime_ns, size) VALUES (?, ?, ?)",
+                                   ((path, mtime_ns, size) for path, (mtime_ns, size) in sources.items()))
+
+    def _query(self, sql: str, params: list) -> pd.DataFrame:
+        cursor = self._conn.execute(sql, params)
+        df = pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+        return df.astype({'lat': float, 'lng': float, 'price': float})
+
+    def _destinations(self, offices: dict, walk_minutes: dict) -> tuple:
+        """
+        {オフィス: 目的駅のリスト} を目的駅のCTE（office, pos, to_id, walk_min）にする。
+        pos はオフィス内の目的駅の順（出力の並び順に使う）。
+        """
+        rows = [
+            (office, pos, normalize_name(to_station), walk_minutes.get(to_station))
+            for office, to_stations in offices.items()
+            for pos, to_station in enumerate(to_stations)
+        ]
+        values, params = _values(rows)
+        sql = (
+            f"destination_names (office, pos, name_key, walk_min) AS (VALUES {values}),"
+            f" destinations AS ("
+            f"  SELECT d.office, d.pos, MIN(s.id) AS to_id, d.walk_min"
+            f"  FROM destination_names AS d JOIN stations AS s ON s.name_key = d.name_key"
+            f"  GROUP BY d.office, d.pos)"
+        )
+        return sql, params
+
+    def frontend_master(self, to_stations: list, room_type: str, walk_minutes: dict) -> pd.DataFrame:
+        """
+        目的駅のリストへの経路に座標・家賃・徒歩時間を付けた表（make_frontend_master の出力と同じ形式）。
+        目的駅の順、目的駅の中では駅マスタの順に並べる。
+
+        Args:
+            to_stations: 目的駅のリスト
+            room_type: 部屋タイプ
+            walk_minutes: {目的駅: 徒歩時間（分）}
+
+        Returns:
+            pd.DataFrame: (line, from, to, trans, min, lat, lng, price, walk_min列)
+        """
+        destinations, params = self._destinations({'': to_stations}, walk_minutes)
+        sql = (
+            f"WITH {destinations}"
+            f" SELECT s.line, s.name AS \"from\", t.name AS \"to\", r.trans, r.min, s.lat, s.lng, p.price, d.walk_min"
+            f" FROM destinations AS d"
+            f" JOIN routes AS r ON r.to_id = d.to_id"
+            f" JOIN stations AS s ON s.id = r.from_id"
+            f" JOIN stations AS t ON t.id = r.to_id"
+            f" LEFT JOIN prices AS p ON p.room_type = ? AND p.station_id = r.from_id"
+            f" ORDER BY d.pos, r.from_id"
+        )
+        return self._query(sql, params + [room_type])
+
+    def common_stations(self, offices: dict, transit_min_upper: dict, trans_num_upper: int,
+                        rent_price_upper: float, room_type: str, walk_minutes: dict,
+                        base_office: str) -> pd.DataFrame:
+        """
+        全オフィスで条件（通勤時間・乗り換え回数・家賃の上限）を満たす (路線, 駅) について、
+        base_office への経路を駅名ごとに通勤時間（電車 + 徒歩）が最小の1行にした表
+        （make_filtered_master の出力と同じ形式）。駅名順に並べる。
+
+        Args:
+            offices: {オフィス: 目的駅のリスト}
+            transit_min_upper: {オフィス: 通勤時間の上限（分）}
+            trans_num_upper: 乗り換え回数の上限
+            rent_price_upper: 家賃の上限（万円）
+            room_type: 部屋タイプ
+            walk_minutes: {目的駅: 徒歩時間（分）}
+            base_office: 出力する経路のオフィス
+
+        Returns:
+            pd.DataFrame: (line, from, to, trans, min, lat, lng, price, walk_min列)
+        """
+        destinations, params = self._destinations(offices, walk_minutes)
+        limits, limit_params = _values([(office, transit_min_upper[office]) for office in offices])
+        sql = (
+            f"WITH {destinations},"
+            f" limits (office, upper) AS (VALUES {limits}),"
+            f" candidates AS ("
+            f"  SELECT d.office, d.pos, r.to_id, r.from_id, r.trans, r.min, p.price, d.walk_min"
+            f"  FROM destinations AS d"
+            f"  JOIN limits AS l ON l.office = d.office"
+            f"  JOIN routes AS r ON r.to_id = d.to_id"
+            f"  JOIN prices AS p ON p.room_type = ? AND p.station_id = r.from_id"
+            f"  WHERE r.min + d.walk_min <= l.upper AND r.trans <= ? AND p.price <= ?),"
+            f" common AS ("
+            f"  SELECT from_id FROM candidates GROUP BY from_id HAVING COUNT(DISTINCT office) = ?),"
+            f" ranked AS ("
+            f"  SELECT c.*, s.name, ROW_NUMBER() OVER ("
+            f"   PARTITION BY s.name ORDER BY c.min + c.walk_min, c.pos, c.from_id) AS rank"
+            f"  FROM candidates AS c JOIN common USING (from_id) JOIN stations AS s ON s.id = c.from_id"
+            f"  WHERE c.office = ?)"
+            f" SELECT s.line, s.name AS \"from\", t.name AS \"to\", c.trans, c.min, s.lat, s.lng, c.price, c.walk_min"
+            f" FROM ranked AS c"
+            f" JOIN stations AS s ON s.id = c.from_id"
+            f" JOIN stations AS t ON t.id = c.to_id"
+            f" WHERE c.rank = 1"
+            f" ORDER BY s.name"
+        )
+        return self._query(sql, params + limit_params + [room_type, trans_num_upper, rent_price_upper,
+                                                          len(offices), base_office])
+
+
+def build_station_db(db_path: str, station_csv: str, station_coord_price_dir: str, route_dir: str) -> StationDB:
+    """
+    既存のCSVからデータベースを作り直す（一時ファイルに作ってから置き換える）。
+
+    Args:
+        db_path: データベースファイルのパス
+        station_csv: 座標付き駅マスタのCSV（line, station, lat, lng列）
+        station_coord_price_dir: station_coord_price_{部屋タイプ}.csv のディレクトリ
+        route_dir: calculated_routes_{駅名}.csv のディレクトリ
+
+    Returns:
+        StationDB: 作ったデータベース
+    """
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    # 読み込み中に元のファイルが書き換えられても次回作り直されるよう、読み込む前の状態を保存する
+    sources = source_files(station_csv, station_coord_price_dir, route_dir)
+    with StationDB(tmp_path) as db:
+        db.load_stations(pd.read_csv(station_csv))
+        for path in sorted(glob.glob(os.path.join(station_coord_price_dir, "station_coord_price_*.csv"))):
+            room_type = _ROOM_TYPE_FROM_FILENAME.search(os.path.basename(path)).group(1)
+            db.load_prices(read_table(path, 'station_coord_price'), room_type)
+        db.load_routes(load_calculated_routes(route_dir))
+        db.set_sources(sources)
+        db.analyze()
+    os.replace(tmp_path, db_path)
+    return StationDB(db_path)
+
+
+def open_station_db(data_dir: str, room_type: str, db_path: str = STATION_DB_PATH) -> StationDB:
+    """
+    データベースを開く。ない場合、room_type の家賃がない場合、または元のファイル（data/ のCSV・列指向ファイル）が
+    データベースを作ったときから変わっている（追加・削除・更新された）場合は data/ のCSVから作り直す。
+
+    Args:
+        data_dir: データディレクトリのパス
+        room_type: 使う部屋タイプ
+        db_path: データベースファイルのパス
+
+    Returns:
+        StationDB: データベース
+    """
+    station_csv = os.path.join(data_dir, "station_master", "station_address_with_coordinates.csv")
+    station_coord_price_dir = os.path.join(data_dir, "station_coord_price")
+    route_dir = os.path.join(data_dir, "calculated_routes")
+    if os.path.exists(db_path):
+        db = StationDB(db_path)
+        if room_type not in db.room_types():
+            db.close()
+        elif db.sources() != source_files(station_csv, station_coord_price_dir, route_dir):
+            db.close()
+            print("  - data/ のCSVがデータベースの作成後に変わっています")
+        else:
+            return db
+    print("  - data/ のCSVからデータベースを作成します")
+    return build_station_db(db_path, station_csv, station_coord_price_dir, route_dir)
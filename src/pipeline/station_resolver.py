@@ -0,0 +1,315 @@
+"""
+駅名・路線名の名寄せ（StationResolver）
+
+駅マスタ（station_address.csv）から一度だけ索引を作り、表記の揺れた駅名・路線名を
+駅マスタの表記に解決する。家賃データの結合・経路データへの座標の付与・経路検索・
+ジオコーディングの各段階で同じ解決器を使い、名前の突き合わせを1か所にまとめる。
+
+正規化（normalize_name）:
+- Unicode NFKC（全角英数字・半角カナを揃える。ＪＲ→JR、２→2 など）
+- 空白の除去、括弧（〈〉【】など）を丸括弧に揃える
+- 漢字の間の小書きの「ヶ」「ヵ」「ケ」を「ヶ」、「ノ」を「の」に揃える（市ケ谷/市ヶ谷、御茶ノ水/御茶の水）
+- 末尾の「駅」を除く
+
+解決の順序（駅名）:
+1. 完全一致の索引（正規化したキー → 駅マスタの表記）。路線を指定した場合はその路線の駅を優先する
+2. 別名の表（STATION_ALIASES）
+3. 前置の木（trie）: 駅マスタの駅名の後ろに括弧書きが付いたもの（二重橋前 → 二重橋前〈丸の内〉）、
+   または問い合わせの後ろに括弧書きが付いたもの（新宿(東京都) → 新宿）
+
+路線名は完全一致の索引と別名の表（pipeline.data_cleaning.LINE_NAME_MAPPING）で解決する。
+解決の結果は名前ごとにLRUキャッシュに載せるため、同じ名前の解決は一度だけ行う。
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+from config import STATION_MASTER_CSV, STATION_RESOLVER_CACHE_SIZE
+from pipeline.data_cleaning import LINE_NAME_MAPPING
+
+# 駅名の別名（正規化だけでは揃わない表記 → 駅マスタの表記）。駅マスタが改称前の駅名のもの
+STATION_ALIASES = {
+    '花月総持寺': '花月園前',
+    '京急東神奈川': '仲木戸',
+}
+
+# 駅名の後ろに付く括弧書き（路線・所在地の区別）の括弧。キーでは丸括弧に揃える
+_BRACKETS = str.maketrans({
+    '〈': '(', '【': '(', '《': '(', '[': '(', '〔': '(',
+    '〉': ')', '】': ')', '》': ')', ']': ')', '〕': ')',
+})
+
+_KANJI = r'[々一-鿿]'
+_SMALL_KE = re.compile(rf'(?<={_KANJI})[ヶヵケ](?={_KANJI})')
+_KATAKANA_NO = re.compile(rf'(?<={_KANJI})ノ(?={_KANJI})')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name: str) -> str:
+    """
+    駅名・路線名の突き合わせに使うキーを返す（表示には使わない）。
+
+    Args:
+        name: 駅名または路線名
+
+    Returns:
+        str: 正規化したキー（name が文字列でなければ空文字）
+    """
+    if not isinstance(name, str):
+        return ''
+    key = _WHITESPACE.sub('', unicodedata.normalize('NFKC', name)).translate(_BRACKETS)
+    key = _SMALL_KE.sub('ヶ', key)
+    key = _KATAKANA_NO.sub('の', key)
+    if len(key) > 1 and key.endswith('駅'):
+        key = key[:-1]
+    return key
+
+
+def normalize_names(series: pd.Series) -> pd.Series:
+    """
+    Series の各値を normalize_name で正規化する（一意な値ごとに1回だけ計算する）。
+
+    Args:
+        series: 駅名または路線名のSeries
+
+    Returns:
+        pd.Series: 正規化したキーのSeries（インデックスは入力と同じ）
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    keys = pd.Series([normalize_name(value) for value in uniques], dtype=object)
+    return pd.Series(keys.to_numpy()[codes], index=series.index)
+
+
+class _PrefixTrie:
+    """
+    正規化した駅名の前置の木。
+    """
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, key: str) -> None:
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[None] = key
+
+    def completions(self, prefix: str) -> list:
+        """
+        prefix で始まるキーのリスト。
+        """
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        keys = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is None:
+                    keys.append(child)
+                else:
+                    stack.append(child)
+        return sorted(keys)
+
+    def longest_prefix(self, text: str) -> str or None:
+        """
+        text の前置になっているキーのうち最長のもの。
+        """
+        node = self._root
+        found = None
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found = node[None]
+        return found
+
+
+class StationResolver:
+    """
+    駅マスタの表記への駅名・路線名の解決器。
+
+    Attributes:
+        stations: {正規化した駅名: 駅マスタの表記のリスト（駅マスタの順）}
+        lines: {正規化した路線名: 駅マスタの表記}
+    """
+
+    def __init__(self, station_df: pd.DataFrame, line_aliases: dict = None, station_aliases: dict = None,
+                 cache_size: int = STATION_RESOLVER_CACHE_SIZE):
+        lines = station_df['line'].tolist()
+        stations = station_df['station'].tolist()
+        line_keys = normalize_names(station_df['line']).tolist()
+        station_keys = normalize_names(station_df['station']).tolist()
+
+        self.stations = {}
+        self.lines = {}
+        self._by_line = {}
+        self._trie = _PrefixTrie()
+        for line, station, line_key, station_key in zip(lines, stations, line_keys, station_keys):
+            if not station_key:
+                continue
+            names = self.stations.setdefault(station_key, [])
+            if station not in names:
+                names.append(station)
+                self._trie.add(station_key)
+            self.lines.setdefault(line_key, line)
+            self._by_line.setdefault((line_key, station_key), station)
+
+        aliases = LINE_NAME_MAPPING if line_aliases is None else line_aliases
+        self._line_aliases = {normalize_name(k): v for k, v in aliases.items() if normalize_name(v) in self.lines}
+        aliases = STATION_ALIASES if station_aliases is None else station_aliases
+        self._station_aliases = {normalize_name(k): normalize_name(v) for k, v in aliases.items()
+                                 if normalize_name(v) in self.stations}
+
+        self._resolve_line = lru_cache(maxsize=cache_size)(self._resolve_line_uncached)
+        self._resolve_station_key = lru_cache(maxsize=cache_size)(self._resolve_station_key_uncached)
+
+    @classmethod
+    def from_csv(cls, path: str = STATION_MASTER_CSV, **kwargs) -> 'StationResolver':
+        """
+        駅マスタのCSV（line, station列を含む）から解決器を作る。
+        """
+        return cls(pd.read_csv(path, usecols=['line', 'station']), **kwargs)
+
+    def _resolve_line_uncached(self, name: str) -> str or None:
+        key = normalize_name(name)
+        if key in self.lines:
+            return self.lines[key]
+        alias = self._line_aliases.get(key)
+        return self.lines[normalize_name(alias)] if alias is not None else None
+
+    def _resolve_station_key_uncached(self, name: str) -> str or None:
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self.stations:
+            return key
+        if key in self._station_aliases:
+            return self._station_aliases[key]
+
+        # 駅マスタの駅名に括弧書きが付いている（二重橋前 → 二重橋前〈丸の内〉）
+        qualified = [k for k in self._trie.completions(key) if k[len(key)] == '(']
+        if len(qualified) == 1:
+            return qualified[0]
+
+        # 問い合わせに括弧書きが付いている（新宿(東京都) → 新宿）
+        prefix = self._trie.longest_prefix(key)
+        if prefix is not None and key[len(prefix)] == '(':
+            return prefix
+        return None
+
+    def resolve_line(self, name: str) -> str or None:
+        """
+        路線名を駅マスタの表記に解決する。
+
+        Args:
+            name: 路線名（例: "ＪＲ山手線"）
+
+        Returns:
+            str or None: 駅マスタの路線名（解決できなければNone）
+        """
+        return self._resolve_line(name)
+
+    def station_key(self, name: str) -> str or None:
+        """
+        駅名を解決し、同じ駅を表す名前に共通のキー（正規化した駅マスタの駅名）を返す。
+
+        Args:
+            name: 駅名
+
+        Returns:
+            str or None: キー（解決できなければNone）
+        """
+        return self._resolve_station_key(name)
+
+    def resolve_station(self, name: str, line: str = None) -> str or None:
+        """
+        駅名を駅マスタの表記に解決する。
+
+        駅マスタで同じ駅が路線によって違う表記（市ケ谷/市ヶ谷）の場合、line を指定すれば
+        その路線の表記を、指定しなければ駅マスタで最初に現れる表記を返す。
+
+        Args:
+            name: 駅名（例: "新鎌ケ谷"）
+            line: 路線名（省略可、表記揺れがあってもよい）
+
+        Returns:
+            str or None: 駅マスタの駅名（解決できなければNone）
+        """
+        key = self._resolve_station_key(name)
+        if key is None:
+            return None
+        if line is not None:
+            line_name = self._resolve_line(line)
+            station = self._by_line.get((normalize_name(line_name), key)) if line_name is not None else None
+            if station is not None:
+                return station
+        return self.stations[key][0]
+
+    def candidates(self, prefix: str) -> list:
+        """
+        正規化した駅名が prefix で始まる駅（駅マスタの表記、駅名順）のリスト。
+        """
+        return [name for key in self._trie.completions(normalize_name(prefix)) for name in self.stations[key]]
+
+    def canonicalize(self, df: pd.DataFrame, line_col: str = 'line', station_col: str = 'station') -> pd.DataFrame:
+        """
+        DataFrameの路線名・駅名を駅マスタの表記に置き換える（解決できない名前はそのまま）。
+        駅名は、解決した路線に駅マスタでその駅がある場合だけ置き換える（同じ表記の別の駅に寄せない）。
+        一意な (路線, 駅) ごとに1回だけ解決する。
+
+        Args:
+            df: 路線名・駅名の列を持つDataFrame
+            line_col: 路線名の列
+            station_col: 駅名の列
+
+        Returns:
+            pd.DataFrame: 置き換えたDataFrame（コピー）
+        """
+        df = df.copy()
+        pairs = df[[line_col, station_col]].drop_duplicates()
+        resolved_lines = [self.resolve_line(line) or line for line in pairs[line_col]]
+        resolved_stations = [
+            self._by_line.get((normalize_name(line), self.station_key(station)), station)
+            for line, station in zip(resolved_lines, pairs[station_col])
+        ]
+        lookup = pd.DataFrame({
+            line_col: pairs[line_col].to_numpy(),
+            station_col: pairs[station_col].to_numpy(),
+            '_line': resolved_lines,
+            '_station': resolved_stations,
+        })
+        merged = df[[line_col, station_col]].merge(lookup, on=[line_col, station_col], how='left')
+        df[line_col] = merged['_line'].to_numpy()
+        df[station_col] = merged['_station'].to_numpy()
+        return df
+
+    def cache_info(self) -> dict:
+        """
+        路線名・駅名の解決のLRUキャッシュのヒット・ミス回数を返す。
+        """
+        line_info = self._resolve_line.cache_info()
+        station_info = self._resolve_station_key.cache_info()
+        return {
+            'hits': line_info.hits + station_info.hits,
+            'misses': line_info.misses + station_info.misses,
+        }
+
+
+_resolver = None
+
+
+def get_station_resolver() -> StationResolver:
+    """
+    全段階で共有する解決器（駅マスタは STATION_MASTER_CSV）を返す。
+    """
+    global _resolver
+    if _resolver is None:
+        _resolver = StationResolver.from_csv()
+    return _resolver
@@ -0,0 +1,161 @@
+"""
+data/ の表の保存と読み込み（列指向の Arrow IPC / Parquet、CSVは書き出し用）
+
+表の種類ごとに列の型（スキーマ）を決めておき、CSVの読み込みのたびに型を推定しない。
+
+- 保存: CSV（これまでどおり data/ に置く書き出し用）に加えて、同じ名前で拡張子が .arrow（Arrow IPC、
+  非圧縮でメモリマップで読める）または .parquet の列指向ファイルを保存する（STORAGE_FORMAT）。
+  line / station / from / to 列は辞書エンコード（駅名・路線名を1回だけ保存し、行はコードで持つ）
+- 読み込み: CSVより新しい列指向ファイルがあればそれを読み（Arrow IPC はメモリマップ）、
+  なければCSVをスキーマの型で読む。CSVを手で直した場合は、CSVのほうが新しくなるためCSVを読む
+
+pyarrow は任意依存。インストールされていなければ CSV だけを保存・読み込みする。
+どちらから読んでも同じ型・同じ値のDataFrameになる（bench_storage.py で確認する）。
+"""
+import os
+
+import pandas as pd
+
+from config import STORAGE_FORMAT
+
+try:
+    import pyarrow as pa  # pyarrow は任意依存
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = ('arrow', 'parquet')
+EXTENSIONS = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+# 表の種類ごとの列の型（'str' は文字列。列指向ファイルでは辞書エンコードする）
+SCHEMAS = {
+    'station_coord_price': {
+        'line': 'str', 'station': 'str', 'lat': 'float64', 'lng': 'float64', 'price': 'float64',
+    },
+    'calculated_routes': {
+        'line': 'str', 'from': 'str', 'to': 'str', 'trans': 'int8', 'min': 'int16',
+    },
+    'frontend_master': {
+        'line': 'str', 'from': 'str', 'to': 'str', 'trans': 'int8', 'min': 'int16',
+        'lat': 'float64', 'lng': 'float64', 'price': 'float64', 'walk_min': 'int16',
+    },
+}
+
+
+def columnar_path(csv_path: str, fmt: str = STORAGE_FORMAT) -> str:
+    """
+    CSVのパスに対応する列指向ファイルのパス（拡張子だけを変える）。
+    """
+    return os.path.splitext(csv_path)[0] + EXTENSIONS[fmt]
+
+
+def apply_schema(df: pd.DataFrame, schema: str) -> pd.DataFrame:
+    """
+    DataFrameの列をスキーマの型に揃える（スキーマにない列はそのまま）。
+
+    Args:
+        df: DataFrame
+        schema: 表の種類（SCHEMAS のキー）
+
+    Returns:
+        pd.DataFrame: 型を揃えたDataFrame
+    """
+    dtypes = {column: dtype for column, dtype in SCHEMAS[schema].items() if column in df.columns}
+    return df.astype(dtypes)
+
+
+def _fresh_columnar_path(csv_path: str) -> str or None:
+    """
+    CSVより新しい（またはCSVがない）列指向ファイルのパス。STORAGE_FORMAT を優先する。
+    """
+    if pa is None:
+        return None
+    csv_mtime = os.stat(csv_path).st_mtime_ns if os.path.exists(csv_path) else None
+    for fmt in (STORAGE_FORMAT,) + tuple(f for f in FORMATS if f != STORAGE_FORMAT):
+        path = columnar_path(csv_path, fmt)
+        if os.path.exists(path) and (csv_mtime is None or os.stat(path).st_mtime_ns >= csv_mtime):
+            return path
+    return None
+
+
+def _read_columnar(path: str, schema: str) -> pd.DataFrame:
+    if path.endswith(EXTENSIONS['arrow']):
+        table = feather.read_table(path, memory_map=True)
+    else:
+        table = pq.read_table(path)
+    # 辞書エンコードの列は pandas ではカテゴリ型になるため、CSVから読んだ場合と同じ文字列型に
+    # Arrow のまま戻す（pandas で変換するより速い）
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, pc.cast(table.column(i), field.type.value_type))
+    return apply_schema(table.to_pandas(), schema)
+
+
+def read_table(csv_path: str, schema: str) -> pd.DataFrame:
+    """
+    表を読み込む。CSVより新しい列指向ファイルがあればそれを、なければCSVをスキーマの型で読む。
+
+    Args:
+        csv_path: 表のCSVのパス（列指向ファイルは同じ名前で拡張子が異なるもの）
+        schema: 表の種類（SCHEMAS のキー）
+
+    Returns:
+        pd.DataFrame: 表
+    """
+    path = _fresh_columnar_path(csv_path)
+    if path is not None:
+        return _read_columnar(path, schema)
+    return pd.read_csv(csv_path, dtype=SCHEMAS[schema])
+
+
+def write_columnar(df: pd.DataFrame, csv_path: str, schema: str, fmt: str = STORAGE_FORMAT) -> str or None:
+    """
+    CSVと同じ名前の列指向ファイルを保存する（pyarrow がなければ何もしない）。
+    CSVより後に保存するため、読み込み時にはCSVより新しいものとして使われる。
+
+    Args:
+        df: 保存するDataFrame
+        csv_path: 表のCSVのパス
+        schema: 表の種類（SCHEMAS のキー）
+        fmt: 'arrow' または 'parquet'
+
+    Returns:
+        str or None: 保存したパス
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported storage format: '{fmt}'. Valid options: {', '.join(FORMATS)}")
+    if pa is None:
+        return None
+
+    table = pa.Table.from_pandas(apply_schema(df, schema), preserve_index=False)
+    # 文字列の列を辞書エンコードする
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+
+    path = columnar_path(csv_path, fmt)
+    tmp_path = path + '.tmp'
+    if fmt == 'arrow':
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+    else:
+        pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_table(df: pd.DataFrame, csv_path: str, schema: str) -> None:
+    """
+    表をCSV（書き出し用）と列指向ファイル（STORAGE_FORMAT）に保存する。
+
+    Args:
+        df: 保存するDataFrame
+        csv_path: 表のCSVのパス
+        schema: 表の種類（SCHEMAS のキー）
+    """
+    df = apply_schema(df, schema)
+    tmp_path = csv_path + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, csv_path)
+    write_columnar(df, csv_path, schema)
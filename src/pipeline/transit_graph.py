@@ -0,0 +1,501 @@
+"""
+駅マスタから作るオフラインの路線グラフと最短経路探索
+
+Ekispert APIを呼ばずに、各出発駅から目的駅までの (乗り換え回数, 所要時間) を推定する。
+
+- 駅マスタの路線ごとの駅の並び（seq列、なければ行の順）から、隣り合う駅の間の乗車区間を作る
+- 同じ駅名を持つ路線どうしは乗り換えでつながる
+- 乗車時間は 距離 × 路線ごとの分/km + 停車駅数 × 分/駅、乗り換えは一律の分数で見積もる
+- これらの係数は data/calculated_routes のEkispertの結果から較正する（calibrate）
+
+探索はRAPTOR方式（乗り換え回数ごとのラウンド）で目的駅から逆向きに行い、
+乗り換え k 回以内での最短時間を全駅について求める。Ekispertは速い経路の候補の中から
+乗り換えが最少のものを選ぶため（select_min_transfer_then_time）、最短時間から
+slack_ratio・slack_min 以内に収まる候補のうち乗り換えが最少のものを結果とする。
+"""
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.checkpoint import ROUTE_COLUMNS, route_key
+from pipeline.storage import read_table
+
+EARTH_RADIUS_KM = 6371.0
+
+# 探索する乗り換え回数の上限（calculated_routes の最大は6回）
+MAX_TRANSFERS = 6
+
+# 区間距離の上限（路線の区間距離の中央値に対する倍率）。座標の誤りによる外れ値を抑える
+MAX_SEGMENT_RATIO = 3.0
+
+# 最初と最後の駅がこの距離（区間距離の中央値に対する倍率）以内なら環状線とみなす
+LOOP_SEGMENT_RATIO = 2.0
+LOOP_MIN_STATIONS = 8
+
+# 路線ごとの分/kmを較正するのに必要な直通経路のサンプル数
+MIN_LINE_SAMPLES = 5
+
+# 較正で乗り換え回数の不一致1件を何分の誤差とみなすか
+TRANSFER_MISMATCH_WEIGHT = 10.0
+
+# これより大きい誤差は外れ値とみなす（Ekispertが別の地方の同名駅に解決した結果など）
+OUTLIER_MIN = 60.0
+
+TRANSFER_MIN_GRID = (2.0, 4.0, 6.0, 8.0, 10.0, 12.0, 14.0)
+SLACK_RATIO_GRID = (0.0, 0.2, 0.4, 0.7, 1.0, 1.5, 3.0)
+SLACK_MIN_GRID = (0.0, 10.0, 20.0, 40.0, 60.0)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    2点間の大円距離(km)を返す（配列可）。
+    """
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class TransitParams:
+    """
+    乗車時間・乗り換え時間のモデルの係数。
+
+    Attributes:
+        min_per_km: 全路線共通の分/km
+        line_min_per_km: {路線名: 分/km}（サンプルが足りない路線は min_per_km を使う）
+        min_per_stop: 1駅ごとの停車時間(分)
+        base_min: 経路ごとの固定時間(分)
+        transfer_min: 乗り換え1回あたりの時間(分)
+        slack_ratio, slack_min: 最短時間からこの範囲に収まる候補のうち乗り換え最少のものを選ぶ
+    """
+
+    def __init__(self, min_per_km: float = 1.2, line_min_per_km: dict = None, min_per_stop: float = 0.5,
+                 base_min: float = 0.0, transfer_min: float = 6.0, slack_ratio: float = 0.2,
+                 slack_min: float = 3.0):
+        self.min_per_km = float(min_per_km)
+        self.line_min_per_km = dict(line_min_per_km or {})
+        self.min_per_stop = float(min_per_stop)
+        self.base_min = float(base_min)
+        self.transfer_min = float(transfer_min)
+        self.slack_ratio = float(slack_ratio)
+        self.slack_min = float(slack_min)
+
+    def line_rate(self, line: str) -> float:
+        return self.line_min_per_km.get(line, self.min_per_km)
+
+    def to_dict(self) -> dict:
+        return {
+            'min_per_km': self.min_per_km,
+            'line_min_per_km': self.line_min_per_km,
+            'min_per_stop': self.min_per_stop,
+            'base_min': self.base_min,
+            'transfer_min': self.transfer_min,
+            'slack_ratio': self.slack_ratio,
+            'slack_min': self.slack_min,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'TransitParams':
+        return cls(**d)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'TransitParams':
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+class _Line:
+    """
+    1路線分の駅の並びと、始点からの累積距離・累積駅数。
+    """
+
+    def __init__(self, name: str, station_ids: np.ndarray, segment_km: np.ndarray, loop_km: float or None):
+        self.name = name
+        self.station_ids = station_ids
+        self.cum_km = np.concatenate([[0.0], np.cumsum(segment_km)])
+        self.cum_stops = np.arange(len(station_ids), dtype=np.float64)
+        self.loop_km = loop_km
+        self.position = {int(s): i for i, s in enumerate(station_ids)}
+
+    @property
+    def is_loop(self) -> bool:
+        return self.loop_km is not None
+
+    def along(self, i: int, j: int) -> tuple:
+        """
+        駅 i, j（路線内の位置）の間の (距離, 駅数)。環状線は近い方の向きを使う。
+        """
+        km = abs(self.cum_km[i] - self.cum_km[j])
+        stops = abs(i - j)
+        if self.is_loop:
+            total_km = self.cum_km[-1] + self.loop_km
+            n = len(self.station_ids)
+            if total_km - km < km:
+                return total_km - km, n - stops
+        return km, stops
+
+    def times(self, params: TransitParams) -> tuple:
+        """
+        始点からの累積乗車時間と、環状線なら一周の時間（それ以外はNone）。
+        """
+        rate = params.line_rate(self.name)
+        times = self.cum_km * rate + self.cum_stops * params.min_per_stop
+        if not self.is_loop:
+            return times, None
+        return times, times[-1] + self.loop_km * rate + params.min_per_stop
+
+    @staticmethod
+    def relax(values: np.ndarray, times: np.ndarray, loop_time: float or None) -> np.ndarray:
+        """
+        各駅 s について min_u (values[u] + |times[s] - times[u]|) を求める（1次元の距離変換）。
+        """
+        if loop_time is not None:
+            n = len(values)
+            result = _Line.relax(np.concatenate([values, values]),
+                                 np.concatenate([times, times + loop_time]), None)
+            return np.minimum(result[:n], result[n:])
+        forward = np.minimum.accumulate(values - times) + times
+        backward = np.minimum.accumulate((values + times)[::-1])[::-1] - times
+        return np.minimum(forward, backward)
+
+
+class TransitGraph:
+    """
+    駅マスタから作る路線グラフ。駅は駅名で識別し、同じ駅名の路線どうしは乗り換えでつながる。
+    """
+
+    def __init__(self, station_df: pd.DataFrame):
+        df = station_df
+        if 'seq' in df.columns:
+            df = df.sort_values(['line', 'seq'], kind='stable')
+        df = df.drop_duplicates(subset=['line', 'station'])
+
+        self.station_names = list(dict.fromkeys(df['station'].astype(str)))
+        self.station_index = {name: i for i, name in enumerate(self.station_names)}
+
+        self.lines = []
+        self.lines_by_station = [[] for _ in self.station_names]
+        for line_name, group in df.groupby('line', sort=False):
+            ids = np.array([self.station_index[s] for s in group['station'].astype(str)], dtype=np.int64)
+            if len(ids) < 2:
+                continue
+            segment_km, loop_km = _segment_distances(group['lat'].to_numpy(dtype=np.float64),
+                                                     group['lng'].to_numpy(dtype=np.float64))
+            line = _Line(str(line_name), ids, segment_km, loop_km)
+            for s in ids:
+                self.lines_by_station[s].append(len(self.lines))
+            self.lines.append(line)
+
+    def __contains__(self, station: str) -> bool:
+        return station in self.station_index
+
+    def search_rounds(self, to_station: str, params: TransitParams, max_transfers: int = MAX_TRANSFERS) -> np.ndarray:
+        """
+        目的駅から逆向きに探索し、乗り換え k 回以内での最短乗車時間を全駅について求める。
+        base_min は含まない。
+
+        Args:
+            to_station: 目的駅名
+            params: モデルの係数
+            max_transfers: 探索する乗り換え回数の上限
+
+        Returns:
+            np.ndarray: 形状 (max_transfers + 1, 駅数)。到達できない駅は inf
+        """
+        if to_station not in self.station_index:
+            raise ValueError(f"駅マスタにない駅です: {to_station}")
+
+        line_times = [line.times(params) for line in self.lines]
+        n = len(self.station_names)
+        rounds = np.full((max_transfers + 1, n), np.inf)
+
+        prev = np.full(n, np.inf)
+        prev[self.station_index[to_station]] = 0.0
+        marked = {self.station_index[to_station]}
+        for k in range(max_transfers + 1):
+            penalty = params.transfer_min if k > 0 else 0.0
+            current = prev.copy()
+            for line_idx in {idx for s in marked for idx in self.lines_by_station[s]}:
+                line = self.lines[line_idx]
+                times, loop_time = line_times[line_idx]
+                reached = _Line.relax(prev[line.station_ids] + penalty, times, loop_time)
+                current[line.station_ids] = np.minimum(current[line.station_ids], reached)
+            rounds[k] = current
+            marked = set(np.flatnonzero(current < prev).tolist())
+            prev = current
+            if not marked:
+                rounds[k + 1:] = current
+                break
+        return rounds
+
+    def search(self, to_station: str, params: TransitParams) -> dict:
+        """
+        全駅から to_station までの (乗り換え回数, 所要時間(分)) を推定する。
+
+        Returns:
+            dict: {出発駅名: (乗り換え回数, 所要時間)}（到達できない駅は含まない）
+        """
+        trans, minutes = select_route(self.search_rounds(to_station, params), params)
+        return {
+            name: (int(trans[i]), int(minutes[i]))
+            for i, name in enumerate(self.station_names)
+            if trans[i] >= 0
+        }
+
+    def route_table(self, station_df: pd.DataFrame, to_station: str, params: TransitParams) -> pd.DataFrame:
+        """
+        駅マスタの全行について to_station までの経路を推定し、
+        calculated_routes と同じ形式のDataFrameで返す。
+
+        Returns:
+            pd.DataFrame: 経路情報DataFrame (line, from, to, trans, min列)
+        """
+        results = self.search(to_station, params)
+        records = []
+        for line, station in zip(station_df['line'].tolist(), station_df['station'].tolist()):
+            route_info = results.get(str(station))
+            if route_info is not None:
+                records.append([*route_key(line, station, to_station), *route_info])
+        return pd.DataFrame(records, columns=ROUTE_COLUMNS).drop_duplicates(subset=['line', 'from', 'to'])
+
+
+def load_calculated_routes(route_dir: str) -> pd.DataFrame:
+    """
+    calculated_routes_{駅名}.csv をすべて読み込んで1つのDataFrameにする。
+
+    Returns:
+        pd.DataFrame: 経路情報DataFrame (line, from, to, trans, min列)
+    """
+    paths = sorted(glob.glob(os.path.join(route_dir, "calculated_routes_*.csv")))
+    if not paths:
+        return pd.DataFrame(columns=ROUTE_COLUMNS)
+    return pd.concat([read_table(path, 'calculated_routes') for path in paths], ignore_index=True)
+
+
+def _valid_coordinates(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """
+    座標が使える駅のマスク。欠損・(0, 0)・前後の駅から飛び離れた座標（ジオコーディングの誤り）を除く。
+    """
+    valid = np.isfinite(lat) & np.isfinite(lng) & ~((lat == 0) & (lng == 0))
+    idx = np.flatnonzero(valid)
+    if len(idx) < 3:
+        return valid
+
+    # 両隣との距離がどちらも、両隣どうしの距離より大きく外れている駅は誤りとみなす
+    prev_km = haversine_km(lat[idx[:-2]], lng[idx[:-2]], lat[idx[1:-1]], lng[idx[1:-1]])
+    next_km = haversine_km(lat[idx[1:-1]], lng[idx[1:-1]], lat[idx[2:]], lng[idx[2:]])
+    skip_km = haversine_km(lat[idx[:-2]], lng[idx[:-2]], lat[idx[2:]], lng[idx[2:]])
+    limit = np.maximum(skip_km, np.median(np.concatenate([prev_km, next_km]))) * MAX_SEGMENT_RATIO
+    valid[idx[1:-1][(prev_km > limit) & (next_km > limit)]] = False
+    return valid
+
+
+def _segment_distances(lat: np.ndarray, lng: np.ndarray) -> tuple:
+    """
+    隣り合う駅の区間距離と、環状線なら最後の駅から最初の駅までの距離を返す。
+
+    座標が使えない駅をはさむ区間は、前後の座標が使える駅の間の距離を均等に割り振る。
+    それでも極端に長い区間は路線の中央値の MAX_SEGMENT_RATIO 倍で打ち切る。
+    """
+    valid = _valid_coordinates(lat, lng)
+    idx = np.flatnonzero(valid)
+    segment_km = np.full(len(lat) - 1, np.nan)
+    if len(idx) >= 2:
+        span_km = haversine_km(lat[idx[:-1]], lng[idx[:-1]], lat[idx[1:]], lng[idx[1:]])
+        for start, end, km in zip(idx[:-1], idx[1:], span_km):
+            segment_km[start:end] = km / (end - start)
+
+    known = np.isfinite(segment_km)
+    median = float(np.median(segment_km[known])) if known.any() else 1.0
+    segment_km = np.where(known, np.minimum(segment_km, median * MAX_SEGMENT_RATIO), median)
+
+    loop_km = None
+    if len(lat) >= LOOP_MIN_STATIONS and valid[0] and valid[-1]:
+        closing_km = float(haversine_km(lat[-1], lng[-1], lat[0], lng[0]))
+        if closing_km <= median * LOOP_SEGMENT_RATIO:
+            loop_km = closing_km
+    return segment_km, loop_km
+
+
+def select_route(rounds: np.ndarray, params: TransitParams) -> tuple:
+    """
+    乗り換え回数ごとの最短時間から、Ekispertの選択ルールに合わせて経路を選ぶ。
+    最短時間から slack 以内に収まる候補のうち、乗り換え回数が最少のものを採用する。
+
+    Args:
+        rounds: search_rounds の結果 (乗り換え回数, 駅)
+        params: モデルの係数
+
+    Returns:
+        tuple: (乗り換え回数の配列, 所要時間(分)の配列)。到達できない駅は (-1, -1)
+    """
+    best = rounds[-1]
+    threshold = best * (1 + params.slack_ratio) + params.slack_min
+    trans = np.argmax(rounds <= threshold, axis=0)
+    minutes = rounds[trans, np.arange(rounds.shape[1])] + params.base_min
+
+    reachable = np.isfinite(best)
+    trans = np.where(reachable, trans, -1)
+    minutes = np.where(reachable, np.rint(minutes), -1).astype(np.int64)
+    return trans, minutes
+
+
+def _fit_ride_model(graph: TransitGraph, route_df: pd.DataFrame) -> TransitParams:
+    """
+    乗り換えなしの経路から、距離・停車駅数と所要時間の関係を最小二乗法で求める。
+    出発駅の路線に目的駅もある行だけを使う。
+    """
+    lines = {line.name: line for line in graph.lines}
+    samples = []
+    for line_name, from_station, to_station, minutes in route_df.loc[
+            route_df['trans'] == 0, ['line', 'from', 'to', 'min']].itertuples(index=False):
+        line = lines.get(line_name)
+        if line is None:
+            continue
+        i = line.position.get(graph.station_index.get(str(from_station), -1))
+        j = line.position.get(graph.station_index.get(str(to_station), -1))
+        if i is None or j is None or i == j:
+            continue
+        km, stops = line.along(i, j)
+        samples.append((line_name, km, stops, minutes))
+
+    if not samples:
+        return TransitParams()
+
+    sample_df = pd.DataFrame(samples, columns=['line', 'km', 'stops', 'min'])
+    x = np.column_stack([sample_df['km'], sample_df['stops'], np.ones(len(sample_df))])
+    y = sample_df['min'].to_numpy(dtype=np.float64)
+    coef = np.linalg.lstsq(x, y, rcond=None)[0]
+
+    # 外れ値を除いて当てはめ直す
+    residual = y - x @ coef
+    inlier = np.abs(residual) <= min(OUTLIER_MIN, 3 * np.median(np.abs(residual)) + 1)
+    sample_df = sample_df[inlier]
+    if inlier.sum() >= 3:
+        coef = np.linalg.lstsq(x[inlier], y[inlier], rcond=None)[0]
+    min_per_km, min_per_stop, base_min = np.clip(coef, 0.0, None)
+
+    # 路線ごとの分/kmは、共通の停車時間・固定時間を差し引いた残りから求める
+    line_min_per_km = {}
+    residual = sample_df['min'] - min_per_stop * sample_df['stops'] - base_min
+    for line_name, idx in sample_df.groupby('line').groups.items():
+        if len(idx) < MIN_LINE_SAMPLES:
+            continue
+        km = sample_df.loc[idx, 'km'].to_numpy()
+        rate = float(np.dot(km, residual.loc[idx]) / np.dot(km, km))
+        line_min_per_km[line_name] = float(np.clip(rate, min_per_km / 3, min_per_km * 3))
+
+    return TransitParams(min_per_km=min_per_km, line_min_per_km=line_min_per_km,
+                         min_per_stop=min_per_stop, base_min=base_min)
+
+
+def calibrate(graph: TransitGraph, route_df: pd.DataFrame) -> TransitParams:
+    """
+    Ekispertの経路検索結果（calculated_routes）からモデルの係数を較正する。
+
+    1. 乗り換えなしの経路から乗車時間の係数を最小二乗法で求める
+    2. 乗り換え時間・候補の選択幅をグリッドサーチで決める
+       （所要時間の平均絶対誤差 + 乗り換え回数の不一致率 × TRANSFER_MISMATCH_WEIGHT を最小化。
+       外れ値の影響を抑えるため、所要時間の誤差は OUTLIER_MIN で打ち切る）
+
+    Args:
+        graph: 路線グラフ
+        route_df: 経路情報DataFrame (line, from, to, trans, min列)
+
+    Returns:
+        TransitParams: 較正した係数
+    """
+    params = _fit_ride_model(graph, route_df)
+    pairs = route_df[['from', 'to', 'trans', 'min']].drop_duplicates(subset=['from', 'to'])
+    pairs = pairs[pairs['from'].astype(str).isin(graph.station_index)
+                  & pairs['to'].astype(str).isin(graph.station_index)]
+    if pairs.empty:
+        return params
+
+    from_ids = pairs['from'].astype(str).map(graph.station_index).to_numpy()
+    actual_trans = pairs['trans'].to_numpy()
+    actual_min = pairs['min'].to_numpy(dtype=np.float64)
+
+    best_loss = np.inf
+    best = (params.transfer_min, params.slack_ratio, params.slack_min)
+    for transfer_min in TRANSFER_MIN_GRID:
+        params.transfer_min = transfer_min
+        rounds = np.full((MAX_TRANSFERS + 1, len(pairs)), np.inf)
+        positions = pairs.groupby('to', sort=False).indices
+        for to_station, idx in positions.items():
+            rounds[:, idx] = graph.search_rounds(str(to_station), params)[:, from_ids[idx]]
+
+        for slack_ratio in SLACK_RATIO_GRID:
+            for slack_min in SLACK_MIN_GRID:
+                params.slack_ratio, params.slack_min = slack_ratio, slack_min
+                trans, minutes = select_route(rounds, params)
+                ok = trans >= 0
+                if not ok.any():
+                    continue
+                loss = (np.mean(np.minimum(np.abs(minutes[ok] - actual_min[ok]), OUTLIER_MIN))
+                        + TRANSFER_MISMATCH_WEIGHT * np.mean(trans[ok] != actual_trans[ok]))
+                if loss < best_loss:
+                    best_loss = loss
+                    best = (transfer_min, slack_ratio, slack_min)
+
+    params.transfer_min, params.slack_ratio, params.slack_min = best
+    return params
+
+
+def evaluate(graph: TransitGraph, params: TransitParams, route_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ekispertの経路検索結果とグラフ探索の推定を行ごとに突き合わせる。
+
+    Returns:
+        pd.DataFrame: route_df に pred_trans, pred_min, min_error 列を加えたもの
+            （推定できなかった行は pred_trans, pred_min が NaN）
+    """
+    out = route_df.copy()
+    out['pred_trans'] = np.nan
+    out['pred_min'] = np.nan
+    for to_station, idx in out.groupby('to', sort=False).groups.items():
+        if str(to_station) not in graph:
+            continue
+        results = graph.search(str(to_station), params)
+        predicted = [results.get(str(s), (np.nan, np.nan)) for s in out.loc[idx, 'from']]
+        out.loc[idx, ['pred_trans', 'pred_min']] = np.array(predicted, dtype=np.float64)
+    out['min_error'] = out['pred_min'] - out['min']
+    return out
+
+
+def error_report(evaluated: pd.DataFrame) -> pd.DataFrame:
+    """
+    evaluate の結果から目的駅ごと・全体の誤差レポートを作る。
+
+    Returns:
+        pd.DataFrame: to, rows, coverage, trans_accuracy, trans_within_1,
+            mae_min, median_abs_min, p90_abs_min, within_5min, bias_min, outliers 列（最終行が全体）
+    """
+    def summarize(name, group):
+        ok = group['pred_min'].notna()
+        g = group[ok]
+        abs_error = g['min_error'].abs()
+        return {
+            'to': name,
+            'rows': len(group),
+            'coverage': ok.mean() if len(group) else np.nan,
+            'trans_accuracy': (g['pred_trans'] == g['trans']).mean(),
+            'trans_within_1': ((g['pred_trans'] - g['trans']).abs() <= 1).mean(),
+            'mae_min': abs_error.mean(),
+            'median_abs_min': abs_error.median(),
+            'p90_abs_min': abs_error.quantile(0.9),
+            'within_5min': (abs_error <= 5).mean(),
+            'bias_min': g['min_error'].mean(),
+            'outliers': int((abs_error > OUTLIER_MIN).sum()),
+        }
+
+    rows = [summarize(to_station, group) for to_station, group in evaluated.groupby('to', sort=False)]
+    rows.append(summarize('(全体)', evaluated))
+    return pd.DataFrame(rows)
@@ -0,0 +1,43 @@
+"""
+スクレイピングしたページの解析
+
+- lxml がインストールされていれば BeautifulSoup のパーサに lxml を使う（html.parser より速い）
+- SoupStrainer で対象の表（table）だけを木にする。表の外の要素は木を作らないため、解析が速くなる
+
+抽出処理（各スクレイパーの _parse_* 関数）は BeautifulSoup の find / find_all のままで、
+どのパーサ・絞り込みでも同じ結果になる（bench_html_parser.py で確認する）。
+"""
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401  lxml は任意依存
+    HTML_BACKEND = 'lxml'
+except ImportError:
+    HTML_BACKEND = 'html.parser'
+
+
+def table_strainer(class_name: str = None) -> SoupStrainer:
+    """
+    table 要素（class_name を指定した場合はそのクラスを持つもの）だけを解析する SoupStrainer を返す。
+    """
+    if class_name is None:
+        return SoupStrainer('table')
+    # 複数のクラスを持つ要素も拾えるよう、class属性を空白区切りの単語として照合する
+    return SoupStrainer('table', class_=re.compile(r'(^|\s)' + re.escape(class_name) + r'(\s|$)'))
+
+
+def make_soup(text: str, parse_only: SoupStrainer = None, backend: str = None) -> BeautifulSoup:
+    """
+    ページのHTMLを解析する。
+
+    Args:
+        text: HTML
+        parse_only: 解析する要素を絞り込む SoupStrainer（省略時はページ全体）
+        backend: BeautifulSoup のパーサ（省略時は HTML_BACKEND）
+
+    Returns:
+        BeautifulSoup: 解析結果
+    """
+    return BeautifulSoup(text, backend or HTML_BACKEND, parse_only=parse_only)
@@ -0,0 +1,236 @@
+"""
+スクレイピング用のHTTPページキャッシュ
+
+取得したページの本文をハッシュ（SHA-256）をファイル名にして保存し（同じ内容は1つだけ）、
+URLごとの ETag・Last-Modified・本文のハッシュをSQLiteの索引に記録する。
+
+- refresh モード（既定）: 保存済みのページは If-None-Match / If-Modified-Since 付きで取得し、
+  304 Not Modified なら本文をダウンロードせず保存済みのものを使う
+- replay モード: ネットワークにアクセスせず、保存済みのページだけで動かす（開発・ベンチマーク用）。
+  保存されていないページは RuntimeError
+
+ページを解析した結果も本文のハッシュごとに保存するため（parse_page）、
+内容が変わっていないページ（304 や同じ本文の200）は解析もしない。
+
+ネットワークへのリクエストの間隔は SCRAPING_SLEEP_SEC 秒以上空ける（キャッシュから返す場合は待たない）。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import requests
+
+from config import SCRAPING_SLEEP_SEC, SCRAPING_RETRY_COUNT, SCRAPING_CACHE_DIR, SCRAPING_CACHE_MODE
+from scrapers.html_parser import make_soup
+
+MODES = ('refresh', 'replay')
+
+
+class PageCache:
+    """
+    URLごとのページ本文・検証子（ETag, Last-Modified）と、本文ごとの解析結果を保存するキャッシュ。
+    """
+
+    def __init__(self, cache_dir: str, mode: str = 'refresh', min_interval_sec: float = SCRAPING_SLEEP_SEC,
+                 retry_count: int = SCRAPING_RETRY_COUNT):
+        if mode not in MODES:
+            raise ValueError(f"Unsupported cache mode: '{mode}'. Valid options: {', '.join(MODES)}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.min_interval_sec = min_interval_sec
+        self.retry_count = retry_count
+
+        self._session = requests.Session()
+        self._conn = None
+        self._last_request = None
+        self._stats = {'requests': 0, 'downloaded': 0, 'changed': 0, 'not_modified': 0, 'replayed': 0,
+                       'parse_hits': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite3'))
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY,"
+                " body_hash TEXT NOT NULL,"
+                " encoding TEXT,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " fetched_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parsed ("
+                " body_hash TEXT NOT NULL,"
+                " parser TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " PRIMARY KEY (body_hash, parser))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.cache_dir, 'objects', body_hash[:2], body_hash)
+
+    def _read_body(self, body_hash: str) -> bytes:
+        with open(self._body_path(body_hash), 'rb') as f:
+            return f.read()
+
+    def _write_body(self, body: bytes) -> str:
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._body_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        return body_hash
+
+    def _wait(self) -> None:
+        # 前回のリクエストから min_interval_sec 秒経つまで待つ
+        if self._last_request is not None:
+            remaining = self.min_interval_sec - (time.monotonic() - self._last_request)
+            if remaining > 0:
+                time.sleep(remaining)
+        self._last_request = time.monotonic()
+
+    def _request(self, url: str, headers: dict) -> requests.Response:
+        for _ in range(self.retry_count):
+            self._wait()
+            self._stats['requests'] += 1
+            try:
+                res = self._session.get(url, headers=headers, timeout=10)
+                if res.status_code in (200, 304):
+                    return res
+            except Exception as e:
+                print(f"リクエストに失敗: {e}")
+        raise RuntimeError(f"リトライ上限に達しました: {url}")
+
+    def _fetch(self, url: str) -> tuple:
+        """
+        ページを取得して索引を更新する。304・replay のときは本文を読まない。
+
+        Returns:
+            tuple: (本文のハッシュ, エンコーディング, 本文のbytes or None)
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT body_hash, encoding, etag, last_modified FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+
+        if self.mode == 'replay':
+            if row is None:
+                raise RuntimeError(f"キャッシュにないページです（replay モード）: {url}")
+            self._stats['replayed'] += 1
+            return row[0], row[1], None
+
+        headers = {}
+        if row is not None:
+            if row[2]:
+                headers['If-None-Match'] = row[2]
+            if row[3]:
+                headers['If-Modified-Since'] = row[3]
+
+        res = self._request(url, headers)
+        if res.status_code == 304 and row is not None:
+            self._stats['not_modified'] += 1
+            body_hash, encoding, body = row[0], row[1], None
+            # 304 で検証子が更新されることがある
+            etag = res.headers.get('ETag', row[2])
+            last_modified = res.headers.get('Last-Modified', row[3])
+        else:
+            self._stats['downloaded'] += 1
+            body, encoding = res.content, res.encoding
+            body_hash = self._write_body(body)
+            if row is None or row[0] != body_hash:
+                self._stats['changed'] += 1
+            etag = res.headers.get('ETag')
+            last_modified = res.headers.get('Last-Modified')
+
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (url, body_hash, encoding, etag, last_modified, fetched_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (url, body_hash, encoding, etag, last_modified, time.time())
+        )
+        conn.commit()
+        return body_hash, encoding, body
+
+    def fetch(self, url: str) -> tuple:
+        """
+        ページを取得する（保存済みなら条件付きリクエスト、replay モードならネットワークを使わない）。
+
+        Returns:
+            tuple: (本文のハッシュ, 本文のテキスト)
+        """
+        body_hash, encoding, body = self._fetch(url)
+        if body is None:
+            body = self._read_body(body_hash)
+        return body_hash, body.decode(encoding or 'utf-8', errors='replace')
+
+    def parse(self, url: str, parser: str, parse_func, parse_only=None):
+        """
+        ページを取得して parse_func(soup) で解析する。同じ本文の解析結果は保存済みのものを返す。
+
+        Args:
+            url: ページのURL
+            parser: 解析処理の名前（解析の仕方を変えたら名前も変えて、古い結果を使わないようにする）
+            parse_func: BeautifulSoup を受け取り、JSONに変換できる値を返す関数
+            parse_only: 解析する要素を絞り込む SoupStrainer（scrapers.html_parser.table_strainer）
+
+        Returns:
+            parse_func の戻り値（JSONから復元した値）
+        """
+        body_hash, encoding, body = self._fetch(url)
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT result FROM parsed WHERE body_hash = ? AND parser = ?", (body_hash, parser)
+        ).fetchone()
+        if row is not None:
+            self._stats['parse_hits'] += 1
+            return json.loads(row[0])
+
+        if body is None:
+            body = self._read_body(body_hash)
+        result = parse_func(make_soup(body.decode(encoding or 'utf-8', errors='replace'), parse_only))
+        conn.execute(
+            "INSERT OR REPLACE INTO parsed (body_hash, parser, result) VALUES (?, ?, ?)",
+            (body_hash, parser, json.dumps(result, ensure_ascii=False))
+        )
+        conn.commit()
+        return json.loads(json.dumps(result, ensure_ascii=False))
+
+    def stats(self) -> dict:
+        """
+        リクエスト数・ダウンロード数・内容が変わったページ数・304の数・replay の数・解析を省略した数を返す。
+        """
+        return dict(self._stats)
+
+
+_page_cache = None
+
+
+def get_page_cache() -> PageCache:
+    """
+    スクレイパーで共有するページキャッシュ（モードは SCRAPING_CACHE_MODE）を返す。
+    """
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache(SCRAPING_CACHE_DIR, mode=SCRAPING_CACHE_MODE)
+    return _page_cache
+
+
+def parse_page(url: str, parser: str, parse_func, parse_only=None):
+    """
+    共有のページキャッシュでページを取得・解析する（PageCache.parse を参照）。
+    """
+    return get_page_cache().parse(url, parser, parse_func, parse_only)
+
+
+def print_cache_stats() -> None:
+    stats = get_page_cache().stats()
+    print(f"ページキャッシュ: リクエスト {stats['requests']}, ダウンロード {stats['downloaded']} "
+          f"(内容の変更 {stats['changed']}), "
+          f"304 {stats['not_modified']}, replay {stats['replayed']}, 解析の省略 {stats['parse_hits']}")
@@ -1,10 +1,31 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+
 import pandas as pd
-import time
 
 from tqdm import tqdm
-from config import SCRAPING_SLEEP_SEC, SCRAPING_RETRY_COUNT
+from scrapers.page_cache import parse_page, print_cache_stats
+from scrapers.html_parser import table_strainer
+
+# 解析する表（それ以外の要素は木にしない）
+PREF_LINES_ONLY = table_strainer('searchtable')
+LINE_PRICES_ONLY = table_strainer('graphpanel_matrix')
+
+
+PRICE_COLUMNS = ['line', 'station', 'price']
+LONG_PRICE_COLUMNS = ['line', 'station', 'room_type', 'price']
+CHANGE_COLUMNS = ['change', 'line', 'station', 'old_price', 'new_price']
+
+ROOM_TYPE_INDEX = {'one_room': '01',
+                   '1k': '02',
+                   '1dk': '02',
+                   '1ldk': '03',
+                   '2k': '03',
+                   '2dk': '03',
+                   '2ldk': '04',
+                   '3k': '04',
+                   '3dk': '04',
+                   '3ldk': '05',
+                   '4k': '05'}
 
 
 def scrape_suumo_rent(pref_list, output_csv_path, room_type='one_room'):
@@ -12,78 +33,163 @@ def scrape_suumo_rent(pref_list, output_csv_path, room_type='one_room'):
     SUUMOの沿線×駅の家賃相場情報をスクレイピングしてCSVに保存する。
     pref_list: ['tokyo', 'kanagawa', 'saitama', 'chiba'] のような都道府県URL識別子リスト
     output_csv_path: 保存先CSVファイル
+    ページは scrapers.page_cache でキャッシュし、変わっていないページは再取得・再解析しない。
+    """
+    df = select_room_type(_scrape_prices(pref_list, [room_type]), room_type)
+    df.to_csv(output_csv_path, index=False)
+    print(f"SUUMOスクレイピング完了: {output_csv_path}")
+
+
+def scrape_suumo_rent_multi(pref_list, output_csv_path, room_types):
+    """
+    複数の部屋タイプの家賃相場を1回の巡回でスクレイピングし、縦持ちの表としてCSVに保存する。
+    路線一覧は共有し、各路線ページは異なる mdKbn ごとに1回だけ取得する（1k と 1dk のように
+    mdKbn が同じ部屋タイプは同じページの結果を使う）。
+    pref_list: ['tokyo', 'kanagawa', 'saitama', 'chiba'] のような都道府県URL識別子リスト
+    output_csv_path: 保存先CSVファイル (line, station, room_type, price)
+    room_types: ['one_room', '1k', '2k'] のような部屋タイプのリスト
+    戻り値: 縦持ちの家賃相場DataFrame
+    """
+    df = _scrape_prices(pref_list, room_types)
+    df.to_csv(output_csv_path, index=False)
+    print(f"SUUMOスクレイピング完了（{', '.join(room_types)}）: {output_csv_path}")
+    return df
+
+
+def select_room_type(long_df: pd.DataFrame, room_type: str) -> pd.DataFrame:
+    """
+    縦持ちの家賃相場表から1つの部屋タイプの表 (line, station, price) を取り出す。
+    """
+    df = long_df.loc[long_df['room_type'] == room_type, PRICE_COLUMNS]
+    return df.reset_index(drop=True)
+
+
+def refresh_suumo_rent(pref_list, output_csv_path, changelog_csv_path, room_type='one_room'):
+    """
+    既存の家賃相場CSVを差分で更新し、変更履歴（追加・削除・家賃の変更）をCSVに保存する。
+    路線ページは本文のハッシュで変更を判定し（scrapers.page_cache）、変わったページだけ解析する。
+    既存の行は元の順番のまま家賃を更新し、新しい駅は末尾に追加する。
+    pref_list: ['tokyo', 'kanagawa', 'saitama', 'chiba'] のような都道府県URL識別子リスト
+    output_csv_path: 更新する家賃相場CSVファイル
+    changelog_csv_path: 変更履歴CSVファイル (change, line, station, old_price, new_price)
+    戻り値: 変更履歴のDataFrame
     """
-    room_type_index = {'one_room': '01',
-                       '1k': '02',
-                       '1dk': '02',
-                       '1ldk': '03',
-                       '2k': '03',
-                       '2dk': '03',
-                       '2ldk': '04',
-                       '3k': '04',
-                       '3dk': '04',
-                       '3ldk': '05',
-                       '4k': '05'}
+    old_df = pd.read_csv(output_csv_path) if os.path.exists(output_csv_path) else pd.DataFrame(columns=PRICE_COLUMNS)
+    new_df = select_room_type(_scrape_prices(pref_list, [room_type]), room_type)
+    merged, changes = merge_price_table(old_df, new_df)
 
+    tmp_path = output_csv_path + '.tmp'
+    merged.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_csv_path)
+    changes.to_csv(changelog_csv_path, index=False)
+
+    counts = changes['change'].value_counts()
+    print(f"SUUMO差分更新完了: {output_csv_path}")
+    print(f"  追加 {counts.get('added', 0)}駅, 削除 {counts.get('removed', 0)}駅, "
+          f"家賃の変更 {counts.get('repriced', 0)}駅 → {changelog_csv_path}")
+    return changes
+
+
+def merge_price_table(old_df: pd.DataFrame, new_df: pd.DataFrame) -> tuple:
+    """
+    既存の家賃相場表に新しい表を (line, station) で突き合わせてマージする。
+    戻り値: (マージ後の表, 変更履歴)。変更履歴の change は added / removed / repriced
+    """
+    key = ['line', 'station']
+    old_df = old_df[PRICE_COLUMNS].drop_duplicates(subset=key)
+    new_df = new_df[PRICE_COLUMNS].drop_duplicates(subset=key)
+    joined = old_df.merge(new_df, on=key, how='outer', suffixes=('_old', '_new'), indicator=True)
+
+    added = joined['_merge'] == 'right_only'
+    removed = joined['_merge'] == 'left_only'
+    repriced = (joined['_merge'] == 'both') & (joined['price_old'] != joined['price_new'])
+    joined['change'] = None
+    joined.loc[added, 'change'] = 'added'
+    joined.loc[removed, 'change'] = 'removed'
+    joined.loc[repriced, 'change'] = 'repriced'
+    changes = joined[joined['change'].notna()].rename(columns={'price_old': 'old_price', 'price_new': 'new_price'})
+    changes = changes[CHANGE_COLUMNS].reset_index(drop=True)
+
+    # 既存の行は元の順番のまま新しい家賃に置き換え、新しい駅は新しい表の順番で末尾に追加する
+    kept = old_df.merge(new_df, on=key, how='inner', suffixes=('_old', ''))[PRICE_COLUMNS]
+    appended = new_df.merge(old_df[key], on=key, how='left', indicator=True)
+    appended = appended[appended['_merge'] == 'left_only'][PRICE_COLUMNS]
+    merged = pd.concat([kept, appended], ignore_index=True)
+    return merged, changes
+
+
+def _scrape_prices(pref_list, room_types) -> pd.DataFrame:
+    """
+    全都道府県の路線ページから、部屋タイプごとの家賃相場の縦持ちの表 (line, station, room_type, price) を作る。
+    """
     # 辞書に無いroom_typeが指定された場合はエラーを出す
-    if room_type not in room_type_index:
-        valid_keys = ", ".join(room_type_index.keys())
-        raise ValueError(f"Unsupported room_type: '{room_type}'. Valid options: {valid_keys}")
+    for room_type in room_types:
+        if room_type not in ROOM_TYPE_INDEX:
+            valid_keys = ", ".join(ROOM_TYPE_INDEX.keys())
+            raise ValueError(f"Unsupported room_type: '{room_type}'. Valid options: {valid_keys}")
+
+    # mdKbn ごとに、その値を使う部屋タイプをまとめる
+    room_types_by_index = {}
+    for room_type in room_types:
+        room_types_by_index.setdefault(ROOM_TYPE_INDEX[room_type], []).append(room_type)
 
     base_url = 'https://suumo.jp/chintai/soba/{}/ensen/'
 
     result = []
     for pref in pref_list:
         url = base_url.format(pref)
-        soup = _safe_get_soup(url)
-        master_table = soup.find('table', class_='searchtable')
-        if not master_table:
+        lines = parse_page(url, 'suumo_pref_lines_v1', _parse_pref_lines, PREF_LINES_ONLY)
+        if lines is None:
             print(f"想定外の構造です: {url}")
             continue
 
-        lines = master_table.find_all('a')
-        for line in tqdm(lines):
-            line_name = line.text.strip()
-            line_href = line.get('href', '')
-            if not line_href:
-                continue
-
-            full_url = 'https://suumo.jp' + line_href + '?mdKbn=' + room_type_index[room_type]
-            line_soup = _safe_get_soup(full_url)
-            table = line_soup.find('table', class_='graphpanel_matrix')
-            if not table:
-                continue
-
-            stations = table.find_all('tr', class_='js-graph-data')
-            for st in stations:
-                tds = st.find_all('td')
-                if len(tds) < 2:
-                    continue
-                station_name = tds[0].text.strip()
-                price_str = tds[1].text.strip().replace('万円', '')
-                try:
-                    price = float(price_str)
-                    result.append([line_name, station_name, price])
-                except ValueError:
-                    pass
-            time.sleep(SCRAPING_SLEEP_SEC)
-
-    df = pd.DataFrame(result, columns=['line', 'station', 'price'])
+        for line_name, line_href in tqdm(lines):
+            for index, index_room_types in room_types_by_index.items():
+                full_url = 'https://suumo.jp' + line_href + '?mdKbn=' + index
+                prices = parse_page(full_url, 'suumo_line_prices_v1', _parse_line_prices, LINE_PRICES_ONLY)
+                for station_name, price in prices:
+                    for room_type in index_room_types:
+                        result.append([line_name, station_name, room_type, price])
+
+    print_cache_stats()
+    df = pd.DataFrame(result, columns=LONG_PRICE_COLUMNS)
     df.drop_duplicates(inplace=True)
-    df.to_csv(output_csv_path, index=False)
-    print(f"SUUMOスクレイピング完了: {output_csv_path}")
+    return df
 
 
-def _safe_get_soup(url: str):
+def _parse_pref_lines(soup) -> list:
     """
-    requests + BeautifulSoupを安全に実行する簡易ユーティリティ
+    都道府県ページから [路線名, 路線ページのhref] のリストを取り出す（表がなければNone）
     """
-    for _ in range(SCRAPING_RETRY_COUNT):
+    master_table = soup.find('table', class_='searchtable')
+    if not master_table:
+        return None
+
+    lines = []
+    for line in master_table.find_all('a'):
+        line_href = line.get('href', '')
+        if line_href:
+            lines.append([line.text.strip(), line_href])
+    return lines
+
+
+def _parse_line_prices(soup) -> list:
+    """
+    路線ページから [駅名, 家賃相場(万円)] のリストを取り出す
+    """
+    table = soup.find('table', class_='graphpanel_matrix')
+    if not table:
+        return []
+
+    prices = []
+    for st in table.find_all('tr', class_='js-graph-data'):
+        tds = st.find_all('td')
+        if len(tds) < 2:
+            continue
+        station_name = tds[0].text.strip()
+        price_str = tds[1].text.strip().replace('万円', '')
         try:
-            res = requests.get(url, timeout=10)
-            if res.status_code == 200:
-                return BeautifulSoup(res.text, "html.parser")
-        except Exception as e:
-            print(f"リクエストに失敗: {e}")
-        time.sleep(SCRAPING_SLEEP_SEC)
-    raise RuntimeError(f"リトライ上限に達しました: {url}")
\ No newline at end of file
+            prices.append([station_name, float(price_str)])
+        except ValueError:
+            pass
+    return prices
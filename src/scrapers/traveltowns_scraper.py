@@ -1,25 +1,51 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-import time
 
 from tqdm import tqdm
-from config import SCRAPING_SLEEP_SEC, SCRAPING_RETRY_COUNT
+from scrapers.page_cache import parse_page, print_cache_stats
+from scrapers.html_parser import table_strainer
+
+# 路線一覧・路線ページとも表だけを解析する
+TABLES_ONLY = table_strainer()
 
 
 def scrape_traveltowns_kanto(output_csv_path: str) -> None:
     """
     関東の鉄道路線URLと路線名を取得し、さらに各路線ページから駅一覧をスクレイピングしてCSVに保存する。
+    路線ページの駅の並び順を seq 列（路線内で0始まり）として保存する（オフライン経路推定で区間を作るのに使う）。
     output_csv_path: 最終的に駅名を保存するCSVのパス
+    ページは scrapers.page_cache でキャッシュし、変わっていないページは再取得・再解析しない。
     """
     base_url = 'https://www.traveltowns.jp/railwaylines/kanto/'
-    res = _safe_get(base_url)
-    soup = BeautifulSoup(res.text, "html.parser")
+    line_info = parse_page(base_url, 'traveltowns_lines_v1', _parse_line_links, TABLES_ONLY)
+    if line_info is None:
+        print("想定外のHTML構造です。テーブルが不足しています。")
+        return
+
+    # 各路線ページにアクセスして駅名を取得
+    station_data = []
+    for (line_url, line_name) in tqdm(line_info):
+        try:
+            stations = parse_page(line_url, 'traveltowns_stations_v1', _parse_stations, TABLES_ONLY)
+            for seq, station_name in enumerate(stations):
+                station_data.append([line_name, station_name, seq])
+        except Exception as e:
+            print(f"エラーが発生しました: {e}")
+
+    print_cache_stats()
+    df = pd.DataFrame(station_data, columns=['line', 'station', 'seq'])
+    # 同じ路線に同じ駅が複数回現れる場合は最初の位置を残す
+    df.drop_duplicates(subset=['line', 'station'], keep='first', inplace=True)
+    df.to_csv(output_csv_path, index=False)
+    print(f"スクレイピングが完了しました: {output_csv_path}")
+
 
+def _parse_line_links(soup) -> list:
+    """
+    関東の路線一覧ページから [路線ページのURL, 路線名] のリストを取り出す（テーブルが不足していればNone）
+    """
     tables = soup.find_all('table')
     if len(tables) < 5:
-        print("想定外のHTML構造です。テーブルが不足しています。")
-        return
+        return None
 
     # それぞれのテーブルから路線のリンクを取得（JR、私鉄、地下鉄、ローカルなど）
     jr_west_table = tables[1]
@@ -38,44 +64,21 @@ def scrape_traveltowns_kanto(output_csv_path: str) -> None:
     for link in jr_links + shitetsu_links + subway_links + local_links:
         line_url = 'https://www.traveltowns.jp' + link.get('href', '')
         line_name = link.text.strip()
-        line_info.append((line_url, line_name))
-
-    # 各路線ページにアクセスして駅名を取得
-    station_data = []
-    for (line_url, line_name) in tqdm(line_info):
-        try:
-            line_page = _safe_get(line_url)
-            lsoup = BeautifulSoup(line_page.text, "html.parser")
-            line_table = lsoup.find('table')
-            if not line_table:
-                continue
-
-            trs = line_table.find_all('tr')[1:]
-            for tr in trs:
-                a_tag = tr.find('a')
-                if a_tag:
-                    station_name = a_tag.text.strip()
-                    station_data.append([line_name, station_name])
-        except Exception as e:
-            print(f"エラーが発生しました: {e}")
-        time.sleep(SCRAPING_SLEEP_SEC)
-
-    df = pd.DataFrame(station_data, columns=['line', 'station'])
-    df.drop_duplicates(inplace=True)
-    df.to_csv(output_csv_path, index=False)
-    print(f"スクレイピングが完了しました: {output_csv_path}")
+        line_info.append([line_url, line_name])
+    return line_info
 
 
-def _safe_get(url: str):
+def _parse_stations(soup) -> list:
     """
-    requests.getを安全に行い、必要ならリトライを実行する簡易ユーティリティ
+    路線ページから駅名を並び順のまま取り出す
     """
-    for _ in range(SCRAPING_RETRY_COUNT):
-        try:
-            res = requests.get(url, timeout=10)
-            if res.status_code == 200:
-                return res
-        except Exception as e:
-            print(f"リクエストに失敗しました: {e}")
-        time.sleep(SCRAPING_SLEEP_SEC)
-    raise RuntimeError(f"リトライ上限に達しました: {url}")
+    line_table = soup.find('table')
+    if not line_table:
+        return []
+
+    stations = []
+    for tr in line_table.find_all('tr')[1:]:
+        a_tag = tr.find('a')
+        if a_tag:
+            stations.append(a_tag.text.strip())
+    return stations
@@ -0,0 +1,76 @@
+"""
+オフライン経路推定（transit_graph）の検証スクリプト
+
+data/calculated_routes にあるEkispertの経路検索結果を正解として、
+駅マスタから作った路線グラフの推定 (乗り換え回数, 所要時間) の誤差を目的駅ごとに集計する。
+
+- 目的駅ごとに、その目的駅を除いたデータで較正し、その目的駅で評価する（leave-one-out）
+- 誤差の大半が外れ値の目的駅は、正解データ側の駅名解決の誤り（別の地方の同名駅）を疑って表示する
+- 最後に、疑わしい目的駅を除いた全データで較正した係数を TRANSIT_PARAMS_PATH に保存する
+
+出力:
+- data/transit_graph/transit_params.json
+- data/transit_graph/validation_report.csv
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import TRANSIT_PARAMS_PATH
+from pipeline.transit_graph import (
+    TransitGraph,
+    calibrate,
+    error_report,
+    evaluate,
+    load_calculated_routes,
+)
+
+# 外れ値がこの割合を超える目的駅は正解データを疑う
+SUSPECT_OUTLIER_SHARE = 0.5
+
+
+def main():
+    data_dir = "../data"
+    station_df = pd.read_csv(os.path.join(data_dir, "station_master", "station_address_with_coordinates.csv"))
+    route_df = load_calculated_routes(os.path.join(data_dir, "calculated_routes"))
+
+    start = time.perf_counter()
+    graph = TransitGraph(station_df)
+    print(f"路線グラフ: {len(graph.station_names)}駅, {len(graph.lines)}路線 "
+          f"({(time.perf_counter() - start) * 1000:.0f}ms)")
+
+    evaluated = []
+    search_times = []
+    for to_station in route_df['to'].unique():
+        params = calibrate(graph, route_df[route_df['to'] != to_station])
+        target = route_df[route_df['to'] == to_station]
+
+        start = time.perf_counter()
+        graph.search(str(to_station), params)
+        search_times.append(time.perf_counter() - start)
+
+        evaluated.append(evaluate(graph, params, target))
+
+    report = error_report(pd.concat(evaluated, ignore_index=True))
+    pd.set_option('display.width', 200)
+    print("\n誤差レポート（leave-one-out、所要時間の誤差は分）")
+    print(report.round(3).to_string(index=False))
+    print(f"\n探索時間: 中央値 {np.median(search_times) * 1000:.1f}ms, 最大 {np.max(search_times) * 1000:.1f}ms")
+
+    per_destination = report.iloc[:-1]
+    suspects = per_destination.loc[per_destination['outliers'] > per_destination['rows'] * SUSPECT_OUTLIER_SHARE, 'to']
+    for to_station in suspects:
+        print(f"警告: {to_station} は誤差の大半が外れ値です。calculated_routes の駅名解決を確認してください")
+
+    params = calibrate(graph, route_df[~route_df['to'].isin(suspects)])
+    params.save(TRANSIT_PARAMS_PATH)
+    report_path = os.path.join(os.path.dirname(TRANSIT_PARAMS_PATH), "validation_report.csv")
+    report.to_csv(report_path, index=False)
+    print(f"\n較正済み係数を保存しました: {TRANSIT_PARAMS_PATH}")
+    print(f"誤差レポートを保存しました: {report_path}")
+
+
+if __name__ == '__main__':
+    main()